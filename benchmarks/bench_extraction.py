@@ -0,0 +1,92 @@
+"""
+HTML-to-text extraction under concurrency: inline on the event loop versus the thread
+and process pools of tools/extraction.py.
+
+`--concurrency` simulated searches extract the saved pages at the same time while a
+heartbeat coroutine measures how late the event loop wakes up, which is the extra
+latency every other in-flight request sees.
+
+    uv run python benchmarks/bench_extraction.py path/to/saved_html/ --concurrency 4
+"""
+
+import argparse
+import asyncio
+import glob
+import os
+import statistics
+import time
+
+from nabu_agent.tools.extraction import create_executor, extract, extract_text
+
+
+def load_pages(directory: str) -> list[str]:
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.htm*"))):
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            pages.append(f.read())
+    if not pages:
+        raise SystemExit(f"No .html files found in {directory}")
+    return pages
+
+
+async def heartbeat(lags: list[float], stop: asyncio.Event, interval: float = 0.01):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run_mode(mode: str, pages: list[str], concurrency: int, workers: int):
+    executor = None if mode == "inline" else create_executor(mode, workers)
+    latencies: list[float] = []
+
+    async def one_search(offset: int):
+        for i in range(len(pages)):
+            html = pages[(offset + i) % len(pages)]
+            start = time.perf_counter()
+            if executor is None:
+                extract_text(html)
+            else:
+                await extract(html, executor=executor)
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0)
+
+    if executor is not None:  # warm the workers up
+        await asyncio.gather(*(extract(pages[0], executor=executor) for _ in range(workers)))
+
+    lags: list[float] = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one_search(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    if executor is not None:
+        executor.shutdown()
+
+    latencies_ms = sorted(x * 1000 for x in latencies)
+    lags_ms = sorted(x * 1000 for x in lags) or [0.0]
+    p95 = latencies_ms[int(len(latencies_ms) * 0.95) - 1]
+    print(
+        f"{mode:<8} {len(latencies) / elapsed:8.1f} pages/s  "
+        f"extract p50 {statistics.median(latencies_ms):7.1f} ms  p95 {p95:7.1f} ms  "
+        f"loop lag p95 {lags_ms[int(len(lags_ms) * 0.95) - 1]:7.1f} ms  "
+        f"max {lags_ms[-1]:7.1f} ms"
+    )
+
+
+async def main(directory: str, concurrency: int, workers: int):
+    pages = load_pages(directory)
+    print(f"{len(pages)} pages, {concurrency} concurrent searches, {workers} workers\n")
+    for mode in ("inline", "thread", "process"):
+        await run_mode(mode, pages, concurrency, workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory", help="Directory of saved .html pages")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    asyncio.run(main(args.directory, args.concurrency, args.workers))
@@ -0,0 +1,154 @@
+"""
+Simple Home Assistant commands ("turn on the kitchen light") through the tool agent
+versus the fast path: grammar + fuzzy entity match on the state mirror and one
+call_service over the websocket.
+
+The stub server (benchmarks/stub_ha_mcp.py) is started on a free port. The agent is
+the real create_agent loop over the MCP tools, with a scripted chat model that
+sleeps `--llm-ms` per turn instead of calling an LLM: one turn to call the tool and
+one to summarize, the best case of the agent path.
+
+    uv run python benchmarks/bench_ha_fastpath.py --iterations 20 --llm-ms 600
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from bench_ha_mcp import free_port, wait_for_server
+from langchain.agents import create_agent
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from nabu_agent.tools.agents import HA_SYSTEM_PROMPT
+from nabu_agent.tools.ha_commands import (
+    execute_ha_match,
+    match_ha_command,
+    parse_ha_command,
+)
+from nabu_agent.tools.ha_mcp import MCPSessionManager
+from nabu_agent.tools.ha_state import HAStateMirror
+
+COMMANDS = ["Turn on the kitchen light", "Turn off the kitchen light"]
+# Shown with their match confidence; the ambiguous or unsupported ones go to the agent
+SAMPLES = [
+    "Turn on the kitchen light",
+    "switch the living room lamp off",
+    "turn on the kitchen lights please",
+    "turn off the livin room lamp",
+    "toggle the fan",
+    "set the fan to 40 percent",
+    "turn on the light",
+    "turn off all the lights",
+]
+_ids = itertools.count()
+
+
+class ScriptedModel(BaseChatModel):
+    """Calls the tool the command asks for, then summarizes, `latency` s per turn."""
+
+    latency: float = 0.6
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError("only async")
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            message = AIMessage(content=f"Done: {last.content}")
+        else:
+            command = parse_ha_command(last.content.splitlines()[0])
+            tool = "HassTurnOn" if command["action"] == "turn_on" else "HassTurnOff"
+            call = {
+                "name": tool,
+                "args": {"name": command["target"]},
+                "id": f"call_{next(_ids)}",
+            }
+            message = AIMessage(content="", tool_calls=[call])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+async def measure(name: str, run, iterations: int) -> None:
+    await run(COMMANDS[0])  # warm-up
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        await run(COMMANDS[i % len(COMMANDS)])
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(
+        f"{name:<22} p50 {statistics.median(timings):7.1f} ms  "
+        f"p95 {timings[int(len(timings) * 0.95) - 1]:7.1f} ms"
+    )
+
+
+async def main(iterations: int, llm_ms: float, delay_ms: float) -> None:
+    port = free_port()
+    stub = os.path.join(os.path.dirname(__file__), "stub_ha_mcp.py")
+    server = subprocess.Popen(
+        [sys.executable, stub, "--port", str(port), "--delay-ms", str(delay_ms)]
+    )
+    url = f"http://127.0.0.1:{port}"
+    model = ScriptedModel(latency=llm_ms / 1000)
+    manager = MCPSessionManager(
+        {"url": f"{url}/mcp_server/sse", "transport": "sse"},
+        agent_factory=lambda tools: create_agent(
+            model=model, tools=tools, system_prompt=HA_SYSTEM_PROMPT
+        ),
+    )
+    mirror = HAStateMirror(url, "stub")
+    try:
+        await wait_for_server(port)
+        if not await mirror.wait_ready(timeout=10):
+            raise RuntimeError(f"State mirror not ready: {mirror.stats()}")
+        print(
+            f"{iterations} commands, {llm_ms} ms per LLM turn, "
+            f"{delay_ms} ms per request to Home Assistant\n"
+        )
+
+        for text in SAMPLES:
+            match = match_ha_command(text, mirror.entities.values())
+            target = match and match["entity"] and match["entity"]["entity_id"]
+            confidence = match["confidence"] if match else "-"
+            print(f"  {text:<36} -> {target or 'agent'} (confidence {confidence})")
+        print()
+
+        async def agent_path(command: str) -> None:
+            agent = await manager.agent()
+            await agent.ainvoke({"messages": [{"role": "user", "content": command}]})
+
+        async def fast_path(command: str) -> None:
+            match = match_ha_command(command, mirror.entities.values())
+            await execute_ha_match(mirror, match)
+
+        await measure("agent (2 LLM turns)", agent_path, iterations)
+        await measure("fast path", fast_path, iterations)
+        print(f"\nmirror stats: {mirror.stats()}")
+    finally:
+        await manager.close()
+        await mirror.close()
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--llm-ms", type=float, default=600)
+    parser.add_argument("--delay-ms", type=float, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.llm_ms, args.delay_ms))
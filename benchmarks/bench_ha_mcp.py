@@ -0,0 +1,106 @@
+"""
+Per-command Home Assistant MCP overhead: a new MultiServerMCPClient, SSE connection
+and get_tools() for every command (the previous execute_ha_command) versus the
+persistent MCPSessionManager. Each command lists the tools and calls HassTurnOn.
+
+The stub server (benchmarks/stub_ha_mcp.py) is started on a free port. No LLM is
+involved, so the numbers are the setup and tool-call cost that every domotics
+command pays on top of the agent.
+
+    uv run python benchmarks/bench_ha_mcp.py --iterations 30 --delay-ms 20
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from langchain_mcp_adapters.client import MultiServerMCPClient
+
+from nabu_agent.tools.ha_mcp import MCPSessionManager
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_for_server(port: int, timeout: float = 15) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Stub MCP server did not start")
+
+
+async def per_command_client(connection: dict) -> None:
+    client = MultiServerMCPClient({"homeassistant": connection})
+    tools = await client.get_tools()
+    turn_on = next(t for t in tools if t.name == "HassTurnOn")
+    await turn_on.ainvoke({"name": "kitchen light"})
+
+
+async def persistent_session(manager: MCPSessionManager) -> None:
+    tools = await manager.tools()
+    turn_on = next(t for t in tools if t.name == "HassTurnOn")
+    await turn_on.ainvoke({"name": "kitchen light"})
+
+
+async def measure(name: str, command, iterations: int) -> None:
+    await command()  # warm-up
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await command()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(
+        f"{name:<28} p50 {statistics.median(timings):7.1f} ms  "
+        f"p95 {timings[int(len(timings) * 0.95) - 1]:7.1f} ms"
+    )
+
+
+async def main(iterations: int, delay_ms: float) -> None:
+    port = free_port()
+    stub = os.path.join(os.path.dirname(__file__), "stub_ha_mcp.py")
+    server = subprocess.Popen(
+        [sys.executable, stub, "--port", str(port), "--delay-ms", str(delay_ms)]
+    )
+    try:
+        await wait_for_server(port)
+        connection = {
+            "url": f"http://127.0.0.1:{port}/mcp_server/sse",
+            "transport": "sse",
+        }
+        print(f"{iterations} commands, {delay_ms} ms per HTTP request\n")
+        await measure(
+            "new client per command",
+            lambda: per_command_client(connection),
+            iterations,
+        )
+        manager = MCPSessionManager(connection)
+        await measure(
+            "persistent session", lambda: persistent_session(manager), iterations
+        )
+        print(f"\npersistent session stats: {manager.stats()}")
+        await manager.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--delay-ms", type=float, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.delay_ms))
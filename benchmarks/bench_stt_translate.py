@@ -0,0 +1,80 @@
+"""
+Latency of the speech-to-english paths, to pick FASTER_WHISPER_TASK per deployment.
+
+- transcribe + LLM: Whisper transcription followed by the Translator LLM node
+  (only measured when LLM_BASE_URL is configured)
+- translate: Whisper translate task only
+- both: transcription and Whisper translation on the same decoded audio
+
+    uv run python benchmarks/bench_stt_translate.py tests/samples/*.m4a
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from nabu_agent.tools.agents import (
+    execute_stt,
+    execute_stt_translation,
+    execute_translator,
+)
+from nabu_agent.tools.stt import get_stt_engine
+
+load_dotenv()
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def transcribe_and_llm(audio: bytes):
+    segments, info = execute_stt(audio)
+    text = "".join(s.text for s in segments)
+    return execute_translator(
+        text=text, destination_language="english", original_language="catalan"
+    )
+
+
+def run(paths: list[str], repeat: int) -> None:
+    engine = get_stt_engine()
+    _, load_seconds = timed(engine.load)
+    print(f"Model load: {load_seconds:.2f}s (paid once per process)\n")
+
+    paths_to_measure = {
+        "transcribe": lambda a: execute_stt(a),
+        "translate": lambda a: execute_stt_translation(a, keep_original=False)[1],
+        "both": lambda a: execute_stt_translation(a, keep_original=True)[1],
+    }
+    if os.getenv("LLM_BASE_URL"):
+        paths_to_measure["transcribe + LLM"] = transcribe_and_llm
+
+    results = {name: [] for name in paths_to_measure}
+    for path in paths:
+        with open(path, "rb") as f:
+            audio = f.read()
+        for name, fn in paths_to_measure.items():
+            for _ in range(repeat):
+                output, seconds = timed(fn, audio)
+                results[name].append(seconds)
+            if isinstance(output, str):
+                print(f"{os.path.basename(path):<24} {name:<18} {output.strip()}")
+
+    print()
+    for name, samples in results.items():
+        print(
+            f"{name:<18} mean {statistics.mean(samples):6.2f}s  "
+            f"median {statistics.median(samples):6.2f}s  max {max(samples):6.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("audio", nargs="+", help="Audio files")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.audio, args.repeat)
@@ -0,0 +1,88 @@
+"""
+Micro-benchmark: per-request cost of building and compiling the LangGraph workflow
+versus invoking an already compiled one.
+
+Every node is replaced by a no-op stub before the graph is built, so the numbers
+isolate the framework overhead (no STT, no LLM, no network).
+
+    uv run python benchmarks/bench_workflow.py --iterations 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from nabu_agent.utils.schemas import QuestionType, SpotifyAction
+from nabu_agent.workflows.main import nodes as main_nodes
+from nabu_agent.workflows.main import workflow
+from nabu_agent.workflows.spotify_agent import nodes as spotify_nodes
+
+
+def _stub(**updates):
+    def node(state):
+        state.update(updates)
+        return state
+
+    return node
+
+
+def install_stubs() -> None:
+    main_nodes.stt = _stub(stt_output="posa musica", original_language="catalan")
+    main_nodes.translate_to_english = _stub(english_command="play music")
+    main_nodes.enroute_question = _stub(question_type=QuestionType.spotify)
+    main_nodes.verify_routing = _stub(routing_ok=True, retries=1)
+    main_nodes.pre_established_commands = _stub(final_answer="party")
+    main_nodes.knowledge_answerer = _stub(final_answer="knowledge")
+    main_nodes.api_call = _stub(final_answer="api")
+    main_nodes.homeassistant = _stub(final_answer="ha")
+    main_nodes.finish_action = _stub(final_answer_translated="fet")
+    spotify_nodes.decide_action = _stub(spotify_action=SpotifyAction.OTHER)
+    spotify_nodes.other_functionalities = _stub(final_answer="Done")
+    spotify_nodes.decide_music_type = _stub()
+    spotify_nodes.search_and_play_music = _stub()
+
+
+def report(name: str, samples: list[float]) -> None:
+    samples_ms = sorted(s * 1000 for s in samples)
+    p95 = samples_ms[int(len(samples_ms) * 0.95) - 1]
+    print(
+        f"{name:<32} mean {statistics.mean(samples_ms):8.3f} ms  "
+        f"median {statistics.median(samples_ms):8.3f} ms  p95 {p95:8.3f} ms"
+    )
+
+
+async def run(iterations: int) -> None:
+    build, build_and_invoke, cached_invoke = [], [], []
+
+    for _ in range(iterations):
+        start = time.perf_counter()
+        workflow.build_main_workflow()
+        build.append(time.perf_counter() - start)
+
+    for _ in range(iterations):
+        start = time.perf_counter()
+        app = workflow.build_main_workflow()
+        await app.ainvoke({"input": b""})
+        build_and_invoke.append(time.perf_counter() - start)
+
+    app = workflow.get_main_workflow()
+    await app.ainvoke({"input": b""})  # first call warms lazy internals
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await workflow.get_main_workflow().ainvoke({"input": b""})
+        cached_invoke.append(time.perf_counter() - start)
+
+    report("build + compile", build)
+    report("build + compile + invoke", build_and_invoke)
+    report("cached graph invoke", cached_invoke)
+    saved = statistics.mean(build_and_invoke) - statistics.mean(cached_invoke)
+    print(f"\nPer-request overhead removed by caching: {saved * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+    install_stubs()
+    asyncio.run(run(args.iterations))
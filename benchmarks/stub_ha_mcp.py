@@ -0,0 +1,207 @@
+"""
+Stand-in for Home Assistant, for benchmarks and local testing without a real
+instance: the MCP server (SSE transport at /mcp_server/sse) with a few Assist-like
+tools, and the websocket API (/api/websocket) with authentication, get_states, the
+area and entity registries, call_service (on/off/toggle, brightness and fan speed)
+and state_changed events. Any token is accepted.
+
+`--delay-ms` adds a fixed delay to every HTTP request and websocket command to mimic
+the network round trip to a real Home Assistant instance.
+
+    uv run python benchmarks/stub_ha_mcp.py --port 8123 --delay-ms 20
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timezone
+
+import uvicorn
+from mcp.server.fastmcp import FastMCP
+from starlette.routing import WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+AREAS = {"kitchen": "Kitchen", "living_room": "Living room", "bedroom": "Bedroom"}
+ENTITIES = {
+    "light.kitchen": {"name": "kitchen light", "area_id": "kitchen", "state": "off"},
+    "light.living_room_lamp": {
+        "name": "living room lamp",
+        "area_id": "living_room",
+        "state": "on",
+    },
+    "fan.bedroom": {"name": "fan", "area_id": "bedroom", "state": "off"},
+    "sensor.potus_soil_moisture": {
+        "name": "Potus soil moisture",
+        "area_id": "living_room",
+        "state": "41",
+        "attributes": {"unit_of_measurement": "%", "device_class": "moisture"},
+    },
+}
+# Seconds added to every HTTP request and websocket command, see --delay-ms
+DELAY = 0.0
+# Websockets subscribed to state_changed, with their subscription id
+SUBSCRIBERS: dict[WebSocket, int] = {}
+
+mcp = FastMCP(
+    "Home Assistant stub",
+    sse_path="/mcp_server/sse",
+    message_path="/mcp_server/messages/",
+    log_level="WARNING",
+)
+
+
+def state_object(entity_id: str) -> dict:
+    entity = ENTITIES[entity_id]
+    return {
+        "entity_id": entity_id,
+        "state": entity["state"],
+        "attributes": {"friendly_name": entity["name"], **entity.get("attributes", {})},
+        "last_changed": entity.get("last_changed", "2025-01-01T00:00:00+00:00"),
+        "last_updated": entity.get("last_changed", "2025-01-01T00:00:00+00:00"),
+    }
+
+
+def find_entity(name: str) -> str:
+    for entity_id, entity in ENTITIES.items():
+        if name.lower() in (entity_id, entity["name"].lower()):
+            return entity_id
+    raise ValueError(f"Unknown device {name}")
+
+
+async def set_state(entity_id: str, state: str, **attributes) -> None:
+    old_state = state_object(entity_id)
+    ENTITIES[entity_id]["state"] = state
+    ENTITIES[entity_id].setdefault("attributes", {}).update(attributes)
+    ENTITIES[entity_id]["last_changed"] = datetime.now(timezone.utc).isoformat()
+    event = {
+        "event_type": "state_changed",
+        "data": {
+            "entity_id": entity_id,
+            "old_state": old_state,
+            "new_state": state_object(entity_id),
+        },
+    }
+    for websocket, subscription in list(SUBSCRIBERS.items()):
+        try:
+            await websocket.send_json(
+                {"id": subscription, "type": "event", "event": event}
+            )
+        except Exception:
+            SUBSCRIBERS.pop(websocket, None)
+
+
+@mcp.tool()
+def GetLiveContext() -> str:
+    """Current state of every exposed device."""
+    return "\n".join(
+        f"- {entity['name']}: {entity['state']}" for entity in ENTITIES.values()
+    )
+
+
+@mcp.tool()
+async def HassTurnOn(name: str) -> str:
+    """Turns on a device."""
+    await set_state(find_entity(name), "on")
+    return f"Turned on {name}"
+
+
+@mcp.tool()
+async def HassTurnOff(name: str) -> str:
+    """Turns off a device."""
+    await set_state(find_entity(name), "off")
+    return f"Turned off {name}"
+
+
+async def call_service(domain: str, service: str, entity_id: str, data: dict) -> None:
+    if not entity_id.startswith(f"{domain}.") or entity_id not in ENTITIES:
+        raise ValueError(f"Entity {entity_id} not found")
+    if service == "toggle":
+        service = "turn_off" if ENTITIES[entity_id]["state"] == "on" else "turn_on"
+    if service == "turn_on" and "brightness_pct" in data:
+        brightness = round(data["brightness_pct"] * 2.55)
+        await set_state(entity_id, "on", brightness=brightness)
+    elif service in ("turn_on", "turn_off"):
+        await set_state(entity_id, service.removeprefix("turn_"))
+    elif service == "set_percentage":
+        state = "on" if data["percentage"] else "off"
+        await set_state(entity_id, state, percentage=data["percentage"])
+    else:
+        raise ValueError(f"Service {domain}.{service} not found")
+
+
+async def handle(message: dict, websocket: WebSocket):
+    kind = message["type"]
+    if kind == "get_states":
+        return [state_object(entity_id) for entity_id in ENTITIES]
+    if kind == "config/area_registry/list":
+        return [{"area_id": a, "name": name} for a, name in AREAS.items()]
+    if kind == "config/device_registry/list":
+        return []
+    if kind == "config/entity_registry/list":
+        return [
+            {"entity_id": entity_id, "area_id": entity["area_id"], "device_id": None}
+            for entity_id, entity in ENTITIES.items()
+        ]
+    if kind == "subscribe_events":
+        if message.get("event_type") == "state_changed":
+            SUBSCRIBERS[websocket] = message["id"]
+        return None
+    if kind == "call_service":
+        entity_id = message["target"]["entity_id"]
+        data = message.get("service_data", {})
+        await call_service(message["domain"], message["service"], entity_id, data)
+        return {"context": {"id": "stub"}}
+    raise ValueError(f"Unknown command {kind}")
+
+
+async def websocket_api(websocket: WebSocket) -> None:
+    await websocket.accept()
+    await websocket.send_json({"type": "auth_required", "ha_version": "stub"})
+    if (await websocket.receive_json()).get("type") != "auth":
+        await websocket.send_json({"type": "auth_invalid", "message": "No auth"})
+        await websocket.close()
+        return
+    await websocket.send_json({"type": "auth_ok", "ha_version": "stub"})
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if message["type"] == "ping":
+                await websocket.send_json({"id": message["id"], "type": "pong"})
+                continue
+            await asyncio.sleep(DELAY)
+            try:
+                result = await handle(message, websocket)
+                reply = {"success": True, "result": result}
+            except (KeyError, ValueError) as e:
+                reply = {
+                    "success": False,
+                    "error": {"code": "invalid_format", "message": str(e)},
+                }
+            await websocket.send_json({"id": message["id"], "type": "result", **reply})
+    except WebSocketDisconnect:
+        SUBSCRIBERS.pop(websocket, None)
+
+
+def with_delay(app):
+    async def delayed(scope, receive, send):
+        if scope["type"] == "http" and DELAY:
+            await asyncio.sleep(DELAY)
+        await app(scope, receive, send)
+
+    return delayed
+
+
+def create_app():
+    app = mcp.sse_app()
+    app.router.routes.append(WebSocketRoute("/api/websocket", websocket_api))
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--delay-ms", type=float, default=0)
+    args = parser.parse_args()
+    DELAY = args.delay_ms / 1000
+    app = with_delay(create_app())
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
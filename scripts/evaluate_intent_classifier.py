@@ -0,0 +1,115 @@
+"""
+Train and evaluate the local intent classifier (tools/intent.py).
+
+Without arguments it runs k-fold cross-validation over the bundled corpus
+(data/intent_corpus.py). With --corpus it fits on the bundled corpus and evaluates
+on a JSONL file of {"text": ..., "label": <QuestionType value>} lines.
+
+For every threshold it reports coverage (share of commands that skip the LLM router)
+and accuracy on the covered commands, which is what LOCAL_CLASSIFIER_THRESHOLD trades.
+
+    uv run python scripts/evaluate_intent_classifier.py --folds 5
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from collections import Counter
+
+from nabu_agent.data.intent_corpus import intent_corpus
+from nabu_agent.data.preestablished_commands import party_commands
+from nabu_agent.tools.intent import LocalIntentClassifier
+from nabu_agent.utils.schemas import QuestionType
+
+THRESHOLDS = [0.0, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95]
+
+
+def load_jsonl(path: str) -> list[tuple[str, QuestionType]]:
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row["text"], QuestionType(row["label"])) for row in rows]
+
+
+def flatten(corpus: dict) -> list[tuple[str, QuestionType]]:
+    return [(text, qt) for qt, texts in corpus.items() for text in texts]
+
+
+def group(samples: list[tuple[str, QuestionType]]) -> dict:
+    corpus: dict[QuestionType, list[str]] = {}
+    for text, qt in samples:
+        corpus.setdefault(qt, []).append(text)
+    return corpus
+
+
+def predict(classifier: LocalIntentClassifier, samples) -> list[tuple]:
+    predictions = []
+    for text, label in samples:
+        start = time.perf_counter()
+        result = classifier.classify(text)
+        elapsed = time.perf_counter() - start
+        predictions.append((label, result.classification, result.confidence, elapsed))
+    return predictions
+
+
+def cross_validate(samples, folds: int, seed: int) -> list[tuple]:
+    samples = samples[:]
+    random.Random(seed).shuffle(samples)
+    predictions = []
+    for fold in range(folds):
+        test = samples[fold::folds]
+        train = [s for i, s in enumerate(samples) if i % folds != fold]
+        classifier = LocalIntentClassifier(
+            group(train), party_triggers=list(party_commands)
+        )
+        predictions += predict(classifier, test)
+    return predictions
+
+
+def report(predictions: list[tuple]) -> None:
+    total = len(predictions)
+    correct = sum(label == pred for label, pred, _, _ in predictions)
+    print(f"Samples: {total}  accuracy: {correct / total:.3f}")
+
+    print("\nPer class (precision / recall):")
+    predicted = Counter(pred for _, pred, _, _ in predictions)
+    actual = Counter(label for label, _, _, _ in predictions)
+    hits = Counter(label for label, pred, _, _ in predictions if label == pred)
+    for qt in QuestionType:
+        if not actual[qt] and not predicted[qt]:
+            continue
+        precision = hits[qt] / predicted[qt] if predicted[qt] else 0.0
+        recall = hits[qt] / actual[qt] if actual[qt] else 0.0
+        print(f"  {qt.value:<20} {precision:.3f} / {recall:.3f}  (n={actual[qt]})")
+
+    print("\nThreshold  coverage  accuracy-on-covered")
+    for threshold in THRESHOLDS:
+        covered = [p for p in predictions if p[2] >= threshold]
+        if not covered:
+            print(f"  {threshold:<8} {0:>8.3f}  -")
+            continue
+        accuracy = sum(label == pred for label, pred, _, _ in covered) / len(covered)
+        print(f"  {threshold:<8} {len(covered) / total:>8.3f}  {accuracy:.3f}")
+
+    latencies = sorted(p[3] * 1000 for p in predictions)
+    print(
+        f"\nLatency: median {statistics.median(latencies):.3f} ms, "
+        f"max {latencies[-1]:.3f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", type=str, default=None, help="JSONL test set")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.corpus:
+        classifier = LocalIntentClassifier(
+            intent_corpus, party_triggers=list(party_commands)
+        )
+        report(predict(classifier, load_jsonl(args.corpus)))
+    else:
+        report(cross_validate(flatten(intent_corpus), args.folds, args.seed))
@@ -1,3 +1,13 @@
-from .workflows.main.workflow import execute_main_workflow
+from .workflows.main.workflow import (
+    draw_main_workflow,
+    execute_main_workflow,
+    execute_main_workflow_stream,
+    get_main_workflow,
+)
 
-__all__ = ["execute_main_workflow"]
+__all__ = [
+    "execute_main_workflow",
+    "execute_main_workflow_stream",
+    "get_main_workflow",
+    "draw_main_workflow",
+]
@@ -0,0 +1,84 @@
+# Places resolved by get_weather without calling Nominatim (tools/geocode.py).
+# name: (latitude, longitude, aliases). Names and aliases are matched ignoring case,
+# accents and punctuation. More places can be loaded from GAZETTEER_FILE.
+gazetteer = {
+    # Maresme
+    "Mataró": (41.5381, 2.4445, ["Mataro"]),
+    "Argentona": (41.5530, 2.4010, []),
+    "Cabrera de Mar": (41.5275, 2.3953, ["Cabrera"]),
+    "Vilassar de Mar": (41.5058, 2.3925, ["Vilassar"]),
+    "Premià de Mar": (41.4920, 2.3620, ["Premia"]),
+    "El Masnou": (41.4800, 2.3190, ["Masnou"]),
+    "Arenys de Mar": (41.5819, 2.5497, ["Arenys"]),
+    "Canet de Mar": (41.5906, 2.5808, ["Canet"]),
+    "Calella": (41.6137, 2.6547, []),
+    "Pineda de Mar": (41.6274, 2.6894, ["Pineda"]),
+    "Malgrat de Mar": (41.6456, 2.7418, ["Malgrat"]),
+    # Catalonia
+    "Barcelona": (41.3874, 2.1686, ["BCN", "Barna"]),
+    "L'Hospitalet de Llobregat": (41.3596, 2.0997, ["Hospitalet", "L'Hospitalet"]),
+    "Badalona": (41.4500, 2.2474, []),
+    "Sabadell": (41.5463, 2.1086, []),
+    "Terrassa": (41.5610, 2.0089, ["Tarrasa"]),
+    "Granollers": (41.6083, 2.2874, []),
+    "Sitges": (41.2372, 1.8059, []),
+    "Vic": (41.9304, 2.2546, []),
+    "Manresa": (41.7251, 1.8266, []),
+    "Girona": (41.9794, 2.8214, ["Gerona"]),
+    "Blanes": (41.6740, 2.7903, []),
+    "Lloret de Mar": (41.6996, 2.8456, ["Lloret"]),
+    "Figueres": (42.2676, 2.9611, ["Figueras"]),
+    "Tarragona": (41.1189, 1.2445, []),
+    "Reus": (41.1557, 1.1066, []),
+    "Lleida": (41.6176, 0.6200, ["Lérida", "Lerida"]),
+    "Andorra la Vella": (42.5078, 1.5211, ["Andorra"]),
+    # Spain and Europe
+    "Madrid": (40.4168, -3.7038, []),
+    "València": (39.4699, -0.3763, ["Valencia"]),
+    "Sevilla": (37.3891, -5.9845, ["Seville"]),
+    "Zaragoza": (41.6488, -0.8891, ["Saragossa"]),
+    "Bilbao": (43.2630, -2.9350, ["Bilbo"]),
+    "Palma": (39.5696, 2.6502, ["Palma de Mallorca", "Mallorca"]),
+    "Paris": (48.8566, 2.3522, ["París"]),
+    "London": (51.5074, -0.1278, ["Londres"]),
+}
+
+# Countries and regions the bundled places are in. "Mataró, Spain" is looked up as
+# "Mataró" only because Spain is one of them; "Paris, Texas" goes to Nominatim.
+regions = [
+    "Maresme",
+    "Barcelonès",
+    "Vallès",
+    "Catalonia",
+    "Catalunya",
+    "Cataluña",
+    "Balearic Islands",
+    "Illes Balears",
+    "Mallorca",
+    "Basque Country",
+    "País Basc",
+    "País Vasco",
+    "Andalusia",
+    "Andalucía",
+    "Aragon",
+    "Aragó",
+    "Aragón",
+    "Comunitat Valenciana",
+    "Comunidad Valenciana",
+    "Barcelona",
+    "Girona",
+    "Tarragona",
+    "Lleida",
+    "Spain",
+    "Espanya",
+    "España",
+    "Andorra",
+    "France",
+    "França",
+    "Francia",
+    "Île-de-France",
+    "England",
+    "United Kingdom",
+    "UK",
+    "Europe",
+]
@@ -0,0 +1,123 @@
+from ..utils.schemas import QuestionType
+
+# Labelled English commands used to fit the local intent classifier (tools/intent.py).
+# Keep them close to what the translator node produces from the transcribed commands.
+intent_corpus = {
+    QuestionType.spotify: [
+        "play music",
+        "play some music",
+        "put on some music",
+        "play a song by mika",
+        "play the song bohemian rhapsody",
+        "play music by the beatles",
+        "play the album dark side of the moon",
+        "play my discover weekly playlist",
+        "play the playlist chill vibes",
+        "play radio for pink floyd",
+        "put the radio of crim",
+        "play something by la oreja de van gogh",
+        "play the latest album of rosalia",
+        "put a song of manel",
+        "play the artist queen",
+        "pause the music",
+        "pause",
+        "stop the music",
+        "resume the music",
+        "next song",
+        "skip this song",
+        "play the next track",
+        "previous song",
+        "go back to the previous track",
+        "turn up the volume",
+        "volume up",
+        "turn the music up",
+        "turn down the volume",
+        "lower the volume",
+        "volume down",
+        "add this song to the queue",
+        "play songs of estopa on spotify",
+    ],
+    QuestionType.knowledge: [
+        "why is the sky blue",
+        "who is the current president of the usa",
+        "who are the current top spotify artists",
+        "in which year was the french revolution",
+        "what is the capital of australia",
+        "how tall is the eiffel tower",
+        "who won the match yesterday",
+        "who won the football game last night",
+        "what time is sunset today",
+        "what is the latest news",
+        "tell me the news",
+        "how many people live in barcelona",
+        "who wrote don quixote",
+        "what is the price of bitcoin",
+        "when is the next barça match",
+        "how do you make a spanish omelette",
+        "what does photosynthesis mean",
+        "who is the ceo of apple",
+        "how far is the moon from the earth",
+        "search the internet for python tutorials",
+        "what is the meaning of life",
+        "how old is the universe",
+        "who discovered penicillin",
+        "what happened in the news today",
+        # Questions using the words of the other intents
+        "when was spotify founded",
+        "how many subscribers does spotify have",
+        "what is the most streamed song on spotify",
+        "how many albums did the beatles release",
+        "what was the best selling album of all time",
+        "who sang the song yesterday",
+        "what is the temperature on mars",
+        "why does it rain",
+        "how does the light in a fridge switch off",
+        "how does a thermostat work",
+        "who invented the light bulb",
+        "how do ceiling fans cool a room",
+    ],
+    QuestionType.api_call: [
+        "what's the weather today",
+        "what is the weather like in mataro",
+        "what's the weather in barcelona",
+        "will it rain today",
+        "will it rain tomorrow in calella",
+        "is it going to be sunny tomorrow",
+        "is it cloudy outside",
+        "what temperature is it outside",
+        "how hot will it be tomorrow",
+        "what's the forecast for tomorrow",
+        "weather forecast",
+        "can i hang the clothes outside today",
+        "will i be able to tend the clothes outside tomorrow",
+        "should i take an umbrella",
+        "is it windy today",
+        "will it snow tomorrow",
+        "how cold is it today",
+        "what's the temperature in girona",
+    ],
+    QuestionType.homeassistant: [
+        "turn on the light",
+        "turn off the light",
+        "turn on the living room lights",
+        "turn off the kitchen light",
+        "switch off all the lights",
+        "turn on the fan",
+        "turn off the fan",
+        "set the thermostat to 21 degrees",
+        "dim the bedroom lights to 30 percent",
+        "is the potus watered",
+        "what devices do i have",
+        "list all devices at home",
+        "turn on the plug",
+        "switch off the socket",
+        "is the light in the kitchen on",
+        "open the blinds",
+        "close the shutters",
+        "turn on the heating",
+        "turn off the air conditioning",
+        "what is the humidity of the plant",
+        "toggle the hallway light",
+        "turn on the tv",
+    ],
+}
@@ -19,9 +19,33 @@ def app():
     parser.add_argument(
         "input",
         type=str,
-        help="Input",
+        help="Input audio file, or 'serve' to start the long-running server",
+    )
+    parser.add_argument("--host", type=str, default=None, help="Server host")
+    parser.add_argument("--port", type=int, default=None, help="Server port")
+    parser.add_argument(
+        "--unix-socket", type=str, default=None, help="Serve on a unix socket instead"
+    )
+    parser.add_argument(
+        "--queue-size", type=int, default=None, help="Max queued commands"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Commands processed concurrently"
     )
     args = parser.parse_args()
+
+    if args.input == "serve":
+        from .server import serve
+
+        serve(
+            host=args.host,
+            port=args.port,
+            unix_socket=args.unix_socket,
+            queue_size=args.queue_size,
+            workers=args.workers,
+        )
+        return
+
     with open(args.input, "rb") as f:
         res = asyncio.run(execute_main_workflow(f.read()))
     logger.info(res)
@@ -0,0 +1,416 @@
+import asyncio
+import hmac
+import ipaddress
+import json
+import logging
+import os
+from http import HTTPStatus
+from typing import AsyncIterator, Optional
+from urllib.parse import unquote_plus
+
+from dotenv import load_dotenv
+
+from .tools.answer_cache import get_knowledge_cache
+from .tools.ha_state import get_ha_state_mirror
+from .tools.llm import llm_pool_stats
+from .tools.page_cache import get_page_cache
+from .tools.spotify import get_spotify_session
+from .tools.stt import MAX_STREAM_SAMPLE_RATE, MIN_STREAM_SAMPLE_RATE, get_stt_engine
+from .tools.web_client import get_domain_timings
+from .workflows.main.workflow import (
+    execute_main_workflow,
+    execute_main_workflow_stream,
+    get_main_workflow,
+)
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 16 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str = ""):
+        super().__init__(message or status.phrase)
+        self.status = status
+        self.message = message or status.phrase
+
+
+class Request:
+    def __init__(
+        self,
+        method: str,
+        path: str,
+        headers: dict,
+        body: bytes,
+        chunks: Optional[AsyncIterator[bytes]] = None,
+        peer: Optional[str] = None,
+    ):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+        self.chunks = chunks
+        self.peer = peer
+
+
+class NabuServer:
+    """
+    Long-running asyncio HTTP server around the main workflow.
+
+    Models and the compiled graph are loaded once on start-up and reused by every
+    request. Commands go through a bounded queue consumed by a fixed number of
+    workers; when the queue is full the server answers 503 straight away instead of
+    piling up latency. Streams share the same `workers` slots, so no more than
+    `workers` workflows run at once. `request_timeout` counts from the moment a
+    workflow starts running, which is then cancelled when it runs out.
+
+    Endpoints:
+    - POST /command: body is the raw audio file, answers {"final_answer_translated": ...}
+    - POST /stream: chunked body of 16-bit mono PCM (?rate=16000), transcribed while
+      it arrives; same answer as /command
+    - GET /health: queue and STT engine status
+    - GET /admin/knowledge-cache: cached knowledge answers
+    - DELETE /admin/knowledge-cache(?match=...): purge all or matching answers
+
+    Admin endpoints need `Authorization: Bearer <admin_token>` when a token is set,
+    otherwise they only answer connections from localhost or the unix socket.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        unix_socket: Optional[str] = None,
+        queue_size: int = 8,
+        workers: int = 1,
+        max_body_bytes: int = 10 * 1024 * 1024,
+        request_timeout: float = 60.0,
+        admin_token: Optional[str] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self.queue_size = queue_size
+        self.workers = workers
+        self.max_body_bytes = max_body_bytes
+        self.request_timeout = request_timeout
+        self.admin_token = admin_token
+
+        self.app = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: list[asyncio.Task] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._streams: Optional[asyncio.Semaphore] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.ha_state = None
+        self.processed = 0
+        self.rejected = 0
+
+    async def warm_up(self) -> None:
+        logger.info("Warming up models and workflow")
+        await asyncio.to_thread(get_stt_engine().load)
+        self.app = get_main_workflow()
+        if os.getenv("SPOTIPY_CLIENT_ID"):
+            try:
+                await asyncio.to_thread(get_spotify_session)
+            except Exception as e:
+                logger.warning(f"Spotify session not started: {e}")
+        if os.getenv("HA_URL") and os.getenv("HA_TOKEN"):
+            # Seeded in the background, commands do not wait for it past HA_STATE_WAIT
+            self.ha_state = get_ha_state_mirror()
+
+    async def start(self) -> None:
+        await self.warm_up()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._streams = asyncio.Semaphore(self.queue_size)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        if self.unix_socket:
+            self._server = await asyncio.start_unix_server(
+                self._handle_connection, path=self.unix_socket, limit=MAX_HEADER_BYTES
+            )
+            logger.info(f"Listening on unix socket {self.unix_socket}")
+        else:
+            self._server = await asyncio.start_server(
+                self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES
+            )
+            logger.info(f"Listening on http://{self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    def status(self) -> dict:
+        return {
+            "status": "ok",
+            "queued": self._queue.qsize() if self._queue else 0,
+            "queue_size": self.queue_size,
+            "workers": self.workers,
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "stt": get_stt_engine().stats(),
+            "llm": llm_pool_stats(),
+            "page_cache": get_page_cache().stats(),
+            "search_domains": get_domain_timings().stats(),
+            "ha_state": self.ha_state.stats() if self.ha_state else None,
+        }
+
+    async def submit(self, audio: bytes) -> str:
+        """Queue a command and wait for its answer. Raises HTTPError(503) when full."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((audio, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Request queue is full")
+        # Cancelled if the connection goes away: the worker skips or cancels the job
+        return await future
+
+    async def submit_stream(
+        self, chunks: AsyncIterator[bytes], sample_rate: int = 16000
+    ) -> str:
+        """
+        Streams take one of `queue_size` stream slots or are rejected, then wait for
+        one of the worker slots shared with the queued commands.
+        """
+        if self._streams.locked():
+            self.rejected += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Too many open streams")
+        async with self._streams, self._slots:
+            result = await asyncio.wait_for(
+                execute_main_workflow_stream(
+                    chunks, app=self.app, sample_rate=sample_rate
+                ),
+                timeout=self.request_timeout,
+            )
+        self.processed += 1
+        return result
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            audio, future = await self._queue.get()
+            try:
+                async with self._slots:
+                    if future.cancelled():
+                        continue
+                    job = asyncio.create_task(
+                        asyncio.wait_for(
+                            execute_main_workflow(audio, app=self.app),
+                            timeout=self.request_timeout,
+                        )
+                    )
+                    future.add_done_callback(lambda _, job=job: job.cancel())
+                    try:
+                        result = await job
+                    except asyncio.CancelledError:
+                        if future.cancelled():  # nobody is waiting for it anymore
+                            continue
+                        raise
+                if not future.done():
+                    future.set_result(result)
+                self.processed += 1
+            except Exception as e:
+                logger.exception(f"Worker {worker_id} failed to process a command")
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader, peer: Optional[str] = None
+    ) -> Request:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, path, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = self._read_chunks(reader)
+            return Request(method.upper(), path, headers, b"", chunks, peer)
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed Content-Length")
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed Content-Length")
+        if length > self.max_body_bytes:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), path, headers, body, peer=peer)
+
+    async def _read_chunks(self, reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
+        received = 0
+        while True:
+            try:
+                size_line = await reader.readuntil(b"\r\n")
+            except asyncio.LimitOverrunError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed chunk size")
+            try:
+                size = int(size_line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed chunk size")
+            if size < 0:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed chunk size")
+            if size == 0:
+                # Trailer fields, if any, up to the empty line
+                try:
+                    while await reader.readuntil(b"\r\n") != b"\r\n":
+                        pass
+                except asyncio.LimitOverrunError:
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed trailer")
+                return
+            received += size
+            if received > self.max_body_bytes:
+                raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+            chunk = await reader.readexactly(size)
+            if await reader.readexactly(2) != b"\r\n":
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed chunk")
+            yield chunk
+
+    @staticmethod
+    def _query(path: str) -> dict:
+        if "?" not in path:
+            return {}
+        return dict(
+            part.split("=", 1) for part in path.split("?", 1)[1].split("&") if "=" in part
+        )
+
+    def _admin_allowed(self, request: Request) -> bool:
+        if self.admin_token:
+            given = request.headers.get("authorization", "")
+            return hmac.compare_digest(given, f"Bearer {self.admin_token}")
+        if not request.peer:  # unix socket
+            return True
+        try:
+            return ipaddress.ip_address(request.peer).is_loopback
+        except ValueError:
+            return False
+
+    async def _dispatch(self, request: Request) -> tuple[HTTPStatus, dict]:
+        path = request.path.split("?", 1)[0]
+        if path == "/health" and request.method == "GET":
+            # The cache stats query SQLite
+            return HTTPStatus.OK, await asyncio.to_thread(self.status)
+        if path == "/command" and request.method == "POST":
+            if not request.body:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Empty audio body")
+            answer = await self.submit(request.body)
+            return HTTPStatus.OK, {"final_answer_translated": answer}
+        if path == "/stream" and request.method == "POST":
+            if request.chunks is None:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a chunked body")
+            sample_rate = self._query(request.path).get("rate", "16000")
+            if not sample_rate.isdigit() or not (
+                MIN_STREAM_SAMPLE_RATE <= int(sample_rate) <= MAX_STREAM_SAMPLE_RATE
+            ):
+                raise HTTPError(
+                    HTTPStatus.BAD_REQUEST,
+                    f"rate must be between {MIN_STREAM_SAMPLE_RATE} and "
+                    f"{MAX_STREAM_SAMPLE_RATE} Hz",
+                )
+            sample_rate = int(sample_rate)
+            answer = await self.submit_stream(request.chunks, sample_rate=sample_rate)
+            return HTTPStatus.OK, {"final_answer_translated": answer}
+        if path.startswith("/admin/") and not self._admin_allowed(request):
+            raise HTTPError(HTTPStatus.FORBIDDEN, "Admin endpoints are restricted")
+        if path == "/admin/knowledge-cache":
+            knowledge_cache = get_knowledge_cache()
+            if request.method == "GET":
+                return HTTPStatus.OK, {
+                    "stats": knowledge_cache.stats(),
+                    "entries": knowledge_cache.entries(),
+                }
+            if request.method == "DELETE":
+                match = self._query(request.path).get("match")
+                if match:
+                    match = unquote_plus(match)
+                return HTTPStatus.OK, {"removed": knowledge_cache.purge(match)}
+        raise HTTPError(HTTPStatus.NOT_FOUND)
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        headers = {}
+        peername = writer.get_extra_info("peername")
+        peer = peername[0] if isinstance(peername, tuple) else None
+        try:
+            request = await self._read_request(reader, peer)
+            status, payload = await self._dispatch(request)
+        except HTTPError as e:
+            status, payload = e.status, {"error": e.message}
+            if e.status == HTTPStatus.SERVICE_UNAVAILABLE:
+                headers["Retry-After"] = "1"
+        except asyncio.TimeoutError:
+            status, payload = HTTPStatus.GATEWAY_TIMEOUT, {"error": "Timed out"}
+        except asyncio.IncompleteReadError:
+            writer.close()
+            return
+        except Exception as e:
+            logger.exception("Unhandled error while serving request")
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{e}"}
+
+        await self._write_response(writer, status, payload, headers)
+
+    async def _write_response(
+        self,
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        payload: dict,
+        extra_headers: dict,
+    ) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            "Connection: close",
+        ]
+        head += [f"{key}: {value}" for key, value in extra_headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+def server_from_env(**overrides) -> NabuServer:
+    config = {
+        "host": os.getenv("NABU_SERVER_HOST", "127.0.0.1"),
+        "port": int(os.getenv("NABU_SERVER_PORT", "8765")),
+        "unix_socket": os.getenv("NABU_SERVER_SOCKET") or None,
+        "queue_size": int(os.getenv("NABU_SERVER_QUEUE_SIZE", "8")),
+        "workers": int(os.getenv("NABU_SERVER_WORKERS", "1")),
+        "request_timeout": float(os.getenv("NABU_SERVER_REQUEST_TIMEOUT", "60")),
+        "admin_token": os.getenv("NABU_ADMIN_TOKEN") or None,
+    }
+    config.update({k: v for k, v in overrides.items() if v is not None})
+    return NabuServer(**config)
+
+
+def serve(**overrides) -> None:
+    asyncio.run(server_from_env(**overrides).serve_forever())
@@ -1,17 +1,35 @@
+import asyncio
+import json
 import logging
 import os
 from datetime import datetime
-from io import BytesIO
+from functools import cache
+from typing import Optional
 
 from dotenv import load_dotenv
-from faster_whisper import WhisperModel
 from langchain.agents import create_agent
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableSequence
-from langchain_mcp_adapters.client import MultiServerMCPClient
-from langchain_openai import ChatOpenAI
 
+from ..tools.answer_cache import get_knowledge_cache
+from ..tools.ha_commands import (
+    HA_FAST_PATH,
+    execute_ha_match,
+    failure,
+    match_ha_command,
+)
+from ..tools.ha_mcp import get_ha_mcp_session
+from ..tools.ha_state import (
+    CommandNotSentError,
+    HAStateMirror,
+    format_entities,
+    get_ha_state_mirror,
+    is_status_question,
+)
+from ..tools.llm import get_model
+from ..tools.stt import STT_LANGUAGE, get_stt_engine, transcribe_passes
 from ..tools.web_loader import search_internet
+from ..utils.cache import PersistentCache
 from ..utils.schemas import (
     Classifier,
     Evaluator,
@@ -21,36 +39,36 @@ from ..utils.schemas import (
     SpotifyActionClassifier,
     SpotifyClassifier,
     Translator,
+    Understanding,
 )
 
 logger = logging.getLogger(__name__)
-model_size = os.getenv("FASTER_WHISPER_MODEL")
 load_dotenv()
 
 
-def get_model() -> ChatOpenAI:
-    # model = ChatOllama(model="qwen3:4b", temperature=0.15, top_p=0.5, num_ctx=16192)
-    model = ChatOpenAI(
-        # model="GPT-OSS-20B",
-        model=os.environ["LLM_MODEL"],
-        api_key=os.environ["LLM_API_KEY"],
-        base_url=os.environ["LLM_BASE_URL"],
-        temperature=0.1,
-        top_p=0.5,
-    )
-    return model
-
-
 def execute_stt(input: bytes):
-    # Run on GPU with FP16
-    if os.getenv("FASTER_WHISPER_USE_CUDA") == "true":
-        model = WhisperModel(model_size, device="cuda", compute_type="float16")
-    else:
-        model = WhisperModel(model_size, device="cpu", compute_type="int8")
-    result, info = model.transcribe(BytesIO(input), beam_size=5, language="ca")
+    # The model stays resident in the process-wide engine, see tools/stt.py
+    result, info = get_stt_engine().transcribe(input, beam_size=5, language=STT_LANGUAGE)
     return result, info
 
 
+def execute_stt_translation(input: bytes, keep_original: bool = True):
+    """
+    English text straight from Whisper's translate task, on the resident model.
+
+    With `keep_original` the audio is decoded once and decoded by two passes
+    (transcribe, then translate). Returns (original_text, english_text, info, timings).
+    """
+    engine = get_stt_engine()
+    return transcribe_passes(
+        engine,
+        engine.decode(input),
+        keep_original=keep_original,
+        language=STT_LANGUAGE,
+        beam_size=5,
+    )
+
+
 def execute_classifier_agent(
     english_command: str, preestablished_commands_schema: dict, feedback: str
 ) -> Classifier:
@@ -157,6 +175,12 @@ def execute_evaluator_agent(
 
 
 async def execute_knowdledge_agent(english_command):
+    knowledge_cache = get_knowledge_cache()
+    cached = knowledge_cache.get(english_command)
+    if cached is not None:
+        logger.info("Knowledge answer served from cache")
+        return cached["answer"]
+
     system_prompt = f"""
     You are a knowledgeable and reliable expert assistant with access to an internet search tool for retrieving up-to-date information. 
     Currently we are at {datetime.today()}, if the knowledge for the question is time dependant, use the tool.
@@ -179,8 +203,14 @@ async def execute_knowdledge_agent(english_command):
     result = await agent.ainvoke(
         {"messages": [{"role": "user", "content": english_command}]}
     )
+    answer = result["messages"][-1].content
+    searched = any(
+        getattr(message, "name", None) == search_internet.name
+        for message in result["messages"]
+    )
+    knowledge_cache.set(english_command, answer, searched=searched)
 
-    return result["messages"][-1].content
+    return answer
 
 
 def execute_party_sentence(text, preestablished_commands_schema) -> PartySentence:
@@ -215,9 +245,39 @@ def execute_party_sentence(text, preestablished_commands_schema) -> PartySentenc
     return result
 
 
+@cache
+def get_translation_cache() -> PersistentCache:
+    return PersistentCache(
+        "translations",
+        memory_size=int(os.getenv("TRANSLATION_CACHE_MEMORY_SIZE", "512")),
+        max_entries=int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "20000")),
+        max_age=float(os.getenv("TRANSLATION_CACHE_MAX_AGE", str(30 * 24 * 3600))),
+    )
+
+
+def translation_cache_key(
+    text: str, original_language: str, destination_language: str
+) -> str:
+    normalized = " ".join(text.split()).casefold()
+    return json.dumps(
+        [
+            normalized,
+            original_language.casefold(),
+            destination_language.casefold(),
+            os.environ["LLM_MODEL"],
+        ]
+    )
+
+
 def execute_translator(
     text: str, destination_language: str, original_language: str = "english"
 ) -> str:
+    cache_key = translation_cache_key(text, original_language, destination_language)
+    cached = get_translation_cache().get(cache_key)
+    if cached is not None:
+        logger.info("Translation served from cache")
+        return cached
+
     llm = get_model()
     translator_llm = llm.with_structured_output(Translator)
     system = f"""
@@ -251,9 +311,63 @@ def execute_translator(
             "text": text,
         }
     )
+    get_translation_cache().set(cache_key, result.translated_command)
     return result.translated_command
 
 
+def execute_understand_agent(
+    text: str, original_language: str, preestablished_commands_schema: dict
+) -> Understanding:
+    llm = get_model()
+    structured_llm = llm.with_structured_output(Understanding)
+
+    system = f"""
+    You are an expert translator and command router for a voice assistant. In one step, translate the command and classify it.
+    - The possible question types are the following:
+        {[q.value for q in QuestionType]}
+    ## Categories:
+    - Spotify Command: Command is related to playing music, pausing music , playing the radio or turining up or down the volume.
+    - Knowledge Question: Commands asking about information. It does not include weather related questions.
+    - Home Assistantg: Commands asking about a homeassistant or a domotic related task. Related to turning on or off lights or the fan.
+    - API Call: Commands asking about the weather, if it will be sunny, rainy, cloudy. Route here if it is asking about hanging the clothes.
+    - Party Mode: Commands in the list of preestablished commands. These are easter eggs.
+
+    ## Task
+    - Translate the command from {original_language} to english. Do not translate people's, artists' or albums names.
+    - Route the command into the most appropiate category type.
+    - Only for Spotify commands: decide the action, PLAY (search and play given music) or OTHER (pause, next track, previous track, volume...).
+    - Only for Spotify PLAY commands: decide the type [track, artist, album, playlist or radio] (if radio mentioned, type is radio) and the key word(s) to search for.
+
+    ## Output Format
+    - english_command: the translated command.
+    - classification: Question type category.
+    - spotify_action, spotify_type, key_word: only for Spotify commands, otherwise empty.
+    """
+
+    answer_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", system),
+            (
+                "human",
+                """
+                  - Command:  {text}
+                  - Prestablished commands: {preestablished_commands_schema}
+                  """,
+            ),
+        ]
+    )
+
+    understand: RunnableSequence = answer_prompt | structured_llm
+
+    result: Understanding = understand.invoke(
+        {
+            "text": text,
+            "preestablished_commands_schema": preestablished_commands_schema,
+        }
+    )
+    return result
+
+
 def execute_spotify_classifier_agent(text) -> SpotifyClassifier:
     llm = get_model()
     structured_llm_grader = llm.with_structured_output(SpotifyClassifier)
@@ -363,38 +477,111 @@ def execute_tool_agent(
     return response["messages"][-1].content
 
 
-async def execute_ha_command(english_command: str) -> str:
-    ha_token = os.environ["HA_TOKEN"]
-    ha_url = os.environ["HA_URL"]
-    client = MultiServerMCPClient(
-        {
-            "homeassistant": {
-                "url": f"{ha_url}/mcp_server/sse",
-                "transport": "sse",
-                "headers": {
-                    "Authorization": f"Bearer {ha_token}",
-                },
-            },
-        }
-    )
-    tools = await client.get_tools()
-    system_prompt = """
+HA_SYSTEM_PROMPT = """
     You are a tool calling agent. You are a given set of tools and should choose the most adient one.
-    If you have to interact with a device, first list all the current devices and their status, to know the name and status.
+    Commands come with the current state of the devices they most likely refer to (entity_id | name | area | state).
+    Use those names and states. Only list all the current devices and their status when the device you need is not among them or no devices are given.
     
     ## Task: 
     - Given a command, decide which tool should be called.
     - If none matches the command, use the most similar one.
     - Call the tool and provide a short summary of the result.
     """
-    agent = create_agent(
+
+
+def build_ha_agent(tools: list):
+    return create_agent(
         model=get_model(),
         tools=tools,
-        system_prompt=system_prompt,
+        system_prompt=HA_SYSTEM_PROMPT,
     )
 
-    result = await agent.ainvoke(
-        {"messages": [{"role": "user", "content": english_command}]}
+
+async def ready_ha_state_mirror() -> Optional[HAStateMirror]:
+    """
+    The Home Assistant state mirror, None if it is not configured or not ready. Only
+    the first connection is waited for; while Home Assistant is unreachable or being
+    reconnected to, commands go without the mirror at once.
+    """
+    if not os.getenv("HA_URL"):
+        return None
+    mirror = get_ha_state_mirror()
+    if not await mirror.wait_ready():
+        logger.info("Home Assistant state mirror not ready, going without it")
+        return None
+    return mirror
+
+
+async def execute_ha_status_answer(question: str, entities: list[dict]) -> str:
+    system = """
+    You answer questions about a smart home from the current state of its devices.
+    
+    ## Task:
+    - Use only the device states given (entity_id | name | area | state).
+    - Answer with one or two short sentences, mentioning the device by its name.
+    - If the states do not answer the question, say so.
+    """
+    answer_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", system),
+            (
+                "human",
+                """
+                - Question: {question}
+                - Devices:
+                {devices}
+                """,
+            ),
+        ]
+    )
+    status_agent: RunnableSequence = answer_prompt | get_model()
+    result = await status_agent.ainvoke(
+        {"question": question, "devices": format_entities(entities)}
     )
+    return result.content
+
+
+async def execute_ha_command(english_command: str) -> str:
+    mirror = await ready_ha_state_mirror()
+    entities = []
+    if mirror is not None:
+        match = match_ha_command(english_command, mirror.entities.values())
+        if match is not None:
+            logger.info(
+                f"Home Assistant fast path: {match['action']} '{match['target']}', "
+                f"confidence {match['confidence']}, candidates {match['candidates']}"
+            )
+        if HA_FAST_PATH and match is not None and match["entity"] is not None:
+            try:
+                return await execute_ha_match(mirror, match)
+            except CommandNotSentError as e:
+                logger.warning(f"HA fast path failed ({e}), falling back to the agent")
+            except (ConnectionError, RuntimeError, asyncio.TimeoutError) as e:
+                # The service call went out, the agent could run the action twice
+                logger.warning(f"HA fast path failed after sending the command: {e!r}")
+                return failure(match, e)
+        entities = mirror.relevant(english_command)
+
+    if entities and is_status_question(english_command):
+        # Answered from the mirrored states, without the agent or any tool call
+        logger.info(f"Home Assistant status answered from {len(entities)} entities")
+        return await execute_ha_status_answer(english_command, entities)
+
+    content = english_command
+    if entities:
+        content += f"\n\nRelated devices:\n{format_entities(entities)}"
+
+    # The MCP session, its tools and the agent are kept across commands
+    ha_session = get_ha_mcp_session(build_ha_agent)
+    messages = {"messages": [{"role": "user", "content": content}]}
+    try:
+        agent = await ha_session.agent()
+    except ConnectionError as e:
+        # Nothing was sent to Home Assistant yet, so a fresh session can retry
+        logger.warning(f"Home Assistant MCP session failed ({e}), reconnecting")
+        ha_session.reconnect()
+        agent = await ha_session.agent()
+    # Not retried: the agent may already have called a tool when the stream broke
+    result = await ha_session.call(agent.ainvoke(messages))
 
     return result["messages"][-1].content
@@ -0,0 +1,138 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+from functools import cache
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from ..tools.intent import normalize, tokenize
+from ..utils.cache import PersistentCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_CACHE_SIMILARITY = float(os.getenv("KNOWLEDGE_CACHE_SIMILARITY", "0.9"))
+# Answers that needed an internet search are time-sensitive
+KNOWLEDGE_CACHE_SEARCH_TTL = float(os.getenv("KNOWLEDGE_CACHE_SEARCH_TTL", "3600"))
+KNOWLEDGE_CACHE_TTL = float(os.getenv("KNOWLEDGE_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+def _vector(text: str) -> dict[str, float]:
+    counts = Counter(tokenize(text))
+    norm = math.sqrt(sum(c * c for c in counts.values()))
+    return {t: c / norm for t, c in counts.items()} if norm else {}
+
+
+def _similarity(a: dict[str, float], b: dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(t, 0.0) for t, w in a.items())
+
+
+class KnowledgeCache:
+    """
+    Answers of the knowledge agent keyed on the normalized english command.
+
+    Lookups try the exact normalized question first and then the most similar cached
+    question above `similarity` (cosine over word uni/bigrams). Entries persist in
+    SQLite with a TTL that depends on whether the answer used `search_internet`.
+    """
+
+    def __init__(
+        self,
+        store: PersistentCache,
+        similarity: float = KNOWLEDGE_CACHE_SIMILARITY,
+        search_ttl: float = KNOWLEDGE_CACHE_SEARCH_TTL,
+        ttl: float = KNOWLEDGE_CACHE_TTL,
+    ):
+        self.store = store
+        self.similarity = similarity
+        self.search_ttl = search_ttl
+        self.ttl = ttl
+        self._index: Optional[dict[str, dict[str, float]]] = None
+        self._lock = threading.Lock()
+
+    def _load_index(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            if self._index is None:
+                self._index = {key: _vector(key) for key, *_ in self.store.items()}
+            return self._index
+
+    def get(self, english_command: str) -> Optional[dict]:
+        key = normalize(english_command)
+        entry = self.store.get(key)
+        if entry is not None:
+            return entry
+
+        vector = _vector(key)
+        index = self._load_index()
+        with self._lock:
+            candidates = sorted(
+                ((_similarity(vector, v), k) for k, v in index.items() if k != key),
+                reverse=True,
+            )
+        for score, candidate in candidates:
+            if score < self.similarity:
+                break
+            entry = self.store.get(candidate)
+            if entry is not None:
+                logger.info(f"Knowledge cache: '{key}' ~ '{candidate}' ({score:.2f})")
+                return entry
+            with self._lock:
+                index.pop(candidate, None)  # expired
+        return None
+
+    def set(self, english_command: str, answer: str, searched: bool) -> None:
+        key = normalize(english_command)
+        self.store.set(
+            key,
+            {
+                "question": english_command,
+                "answer": answer,
+                "searched": searched,
+                "created_at": time.time(),
+            },
+            ttl=self.search_ttl if searched else self.ttl,
+        )
+        index = self._load_index()
+        with self._lock:
+            index[key] = _vector(key)
+
+    def entries(self) -> list[dict]:
+        return [
+            {"key": key, **value, "expires_at": expires_at}
+            for key, value, _, expires_at in self.store.items()
+        ]
+
+    def purge(self, match: Optional[str] = None) -> int:
+        """Remove every entry, or those whose question contains `match`."""
+        if match is None:
+            removed = len(self.store.items())
+            self.store.clear()
+        else:
+            match = normalize(match)
+            keys = [key for key, *_ in self.store.items() if match in key]
+            for key in keys:
+                self.store.delete(key)
+            removed = len(keys)
+        with self._lock:
+            self._index = None
+        return removed
+
+    def stats(self) -> dict:
+        return self.store.stats()
+
+
+@cache
+def get_knowledge_cache() -> KnowledgeCache:
+    return KnowledgeCache(
+        PersistentCache(
+            "knowledge_answers",
+            max_entries=int(os.getenv("KNOWLEDGE_CACHE_MAX_ENTRIES", "2000")),
+        )
+    )
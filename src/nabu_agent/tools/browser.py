@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from dotenv import load_dotenv
+from playwright.async_api import Browser, BrowserContext, Page, Playwright, Route
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import async_playwright
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_IDLE_TIMEOUT = float(os.getenv("BROWSER_IDLE_TIMEOUT", "300"))
+BROWSER_BLOCKED_RESOURCES = frozenset(
+    r.strip()
+    for r in os.getenv("BROWSER_BLOCKED_RESOURCES", "image,font,media").split(",")
+    if r.strip()
+)
+
+
+class BrowserPool:
+    """
+    One long-lived headless Chromium with a bounded pool of reusable pages.
+
+    Each page lives in its own context, with images, fonts and media blocked by
+    default. Idle pages are closed after `idle_timeout` seconds, and so is the browser
+    once nothing uses it. If Chromium crashes the pool forgets it and the next
+    request launches a new one.
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        idle_timeout: float = BROWSER_IDLE_TIMEOUT,
+        blocked_resources: frozenset = BROWSER_BLOCKED_RESOURCES,
+    ):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.blocked_resources = blocked_resources
+
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._idle: list[tuple[BrowserContext, Page, float]] = []
+        self._in_use = 0
+        self._slots = asyncio.Semaphore(size)
+        self._lock = asyncio.Lock()
+        self._reaper: Optional[asyncio.Task] = None
+
+        self.launches = 0
+        self.pages_created = 0
+        self.reuses = 0
+
+    async def _ensure_browser(self) -> Browser:
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=True)
+                self._browser.on("disconnected", self._on_disconnected)
+                self._idle.clear()
+                self.launches += 1
+                logger.info("Chromium launched for the browser pool")
+            if self._reaper is None or self._reaper.done():
+                self._reaper = asyncio.create_task(self._reap_idle())
+            return self._browser
+
+    def _on_disconnected(self, browser: Browser) -> None:
+        if browser is self._browser:
+            logger.warning("Chromium disconnected, it will be relaunched on demand")
+            self._browser = None
+            self._idle.clear()
+
+    async def _block(self, route: Route) -> None:
+        if route.request.resource_type in self.blocked_resources:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _new_page(self) -> tuple[BrowserContext, Page]:
+        browser = await self._ensure_browser()
+        context = await browser.new_context()
+        if self.blocked_resources:
+            await context.route("**/*", self._block)
+        page = await context.new_page()
+        self.pages_created += 1
+        return context, page
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        async with self._slots:
+            context, page = None, None
+            while self._idle:
+                context, page, _ = self._idle.pop()
+                if not page.is_closed() and self._browser is not None:
+                    self.reuses += 1
+                    break
+                context, page = None, None
+            if page is None:
+                context, page = await self._new_page()
+
+            self._in_use += 1
+            healthy = False
+            try:
+                yield page
+                healthy = True
+            finally:
+                self._in_use -= 1
+                if healthy and not page.is_closed() and self._browser is not None:
+                    self._idle.append((context, page, time.monotonic()))
+                else:
+                    await self._close_context(context)
+
+    async def fetch_html(self, url: str, timeout: int = 15000) -> str:
+        for attempt in range(2):
+            try:
+                async with self.page() as page:
+                    await page.goto(url, timeout=timeout)
+                    return await page.content()
+            except PlaywrightError as e:
+                # A crashed browser gets one retry on a fresh instance
+                if attempt == 0 and self._browser is None:
+                    continue
+                raise e
+        return ""
+
+    @staticmethod
+    async def _close_context(context: Optional[BrowserContext]) -> None:
+        if context is None:
+            return
+        try:
+            await context.close()
+        except PlaywrightError:
+            pass
+
+    async def _reap_idle(self) -> None:
+        while self._browser is not None:
+            await asyncio.sleep(max(self.idle_timeout / 2, 1))
+            now = time.monotonic()
+            expired = [i for i in self._idle if now - i[2] >= self.idle_timeout]
+            self._idle = [i for i in self._idle if now - i[2] < self.idle_timeout]
+            for context, _, _ in expired:
+                await self._close_context(context)
+            if not self._idle and not self._in_use:
+                logger.info("Browser pool idle, closing Chromium")
+                await self.close()
+                return
+
+    async def close(self) -> None:
+        async with self._lock:
+            for context, _, _ in self._idle:
+                await self._close_context(context)
+            self._idle.clear()
+            browser, self._browser = self._browser, None
+            if browser is not None:
+                try:
+                    await browser.close()
+                except PlaywrightError:
+                    pass
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "browser_running": self._browser is not None,
+            "idle_pages": len(self._idle),
+            "in_use": self._in_use,
+            "launches": self.launches,
+            "pages_created": self.pages_created,
+            "reuses": self.reuses,
+        }
+
+
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, BrowserPool]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_browser_pool() -> BrowserPool:
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = BrowserPool()
+    return pool
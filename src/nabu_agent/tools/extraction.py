@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Optional
+
+import trafilatura
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "process" keeps the CPU-heavy parsing off the interpreter running the event loop,
+# "thread" is lighter and enough when lxml releases the GIL for most of the work.
+EXTRACT_EXECUTOR = os.getenv("EXTRACT_EXECUTOR", "process")
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Workers are never forked from the running server: a fork copies the event loop,
+# the open sockets and any lock a thread holds at that moment
+EXTRACT_START_METHOD = os.getenv(
+    "EXTRACT_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn",
+)
+# Pages are cut to this many characters before parsing
+EXTRACT_MAX_CHARS = int(os.getenv("EXTRACT_MAX_CHARS", "1000000"))
+
+
+def extract_text(html: str, max_chars: int = EXTRACT_MAX_CHARS, **kwargs) -> str:
+    if not html:
+        return ""
+    text = trafilatura.extract(html[:max_chars], **kwargs)
+    return text.strip() if text else ""
+
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+def create_executor(kind: str = EXTRACT_EXECUTOR, workers: int = EXTRACT_WORKERS):
+    if kind == "process":
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(EXTRACT_START_METHOD),
+        )
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract")
+
+
+def get_extraction_executor() -> Executor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = create_executor()
+        return _executor
+
+
+def _reset_executor(broken: Executor) -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+async def extract(html: str, executor: Optional[Executor] = None, **kwargs) -> str:
+    """HTML to text on the extraction pool, without blocking the event loop."""
+    executor = executor or get_extraction_executor()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(executor, partial(extract_text, html, **kwargs))
+    except BrokenProcessPool:
+        logger.warning("Extraction process pool broke, recreating it")
+        _reset_executor(executor)
+        return await asyncio.to_thread(extract_text, html, **kwargs)
@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+import time
+from functools import cache
+
+import niquests
+import openmeteo_requests
+from dotenv import load_dotenv
+
+from ..utils.cache import PersistentCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+OPEN_METEO_TIMEOUT = float(os.getenv("OPEN_METEO_TIMEOUT", "5"))
+# Decimals kept of the coordinates in the cache key, 2 is about 1 km
+FORECAST_COORD_PRECISION = int(os.getenv("FORECAST_COORD_PRECISION", "2"))
+
+CURRENT_VARIABLES = [
+    "temperature_2m",
+    "precipitation",
+    "weather_code",
+    "cloud_cover",
+    "wind_speed_10m",
+]
+DAILY_VARIABLES = [
+    "weather_code",
+    "temperature_2m_max",
+    "temperature_2m_min",
+    "precipitation_sum",
+    "precipitation_probability_max",
+    "precipitation_hours",
+]
+
+
+@cache
+def get_openmeteo_client() -> openmeteo_requests.Client:
+    """One Open-Meteo client over a keep-alive session for the whole process."""
+    return openmeteo_requests.Client(session=niquests.Session())
+
+
+class ForecastStore:
+    """
+    Current conditions and the daily forecast of a location, fetched together in one
+    Open-Meteo request and kept until the hour changes.
+
+    Entries are keyed by the coordinates rounded to `precision` decimals and the
+    current UTC hour, so every weather question about a place within the same hour
+    is answered from the store.
+    """
+
+    def __init__(
+        self,
+        store: PersistentCache,
+        client_factory=get_openmeteo_client,
+        precision: int = FORECAST_COORD_PRECISION,
+    ):
+        self.store = store
+        self.client_factory = client_factory
+        self.precision = precision
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def key(self, lat: float, lon: float) -> str:
+        hour = time.strftime("%Y-%m-%dT%H", time.gmtime())
+        return f"{round(lat, self.precision)},{round(lon, self.precision)}@{hour}"
+
+    def _lock(self, key: str) -> threading.Lock:
+        with self._locks_lock:
+            if len(self._locks) > 256:
+                self._locks = {k: v for k, v in self._locks.items() if v.locked()}
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, lat: float, lon: float) -> dict:
+        key = self.key(lat, lon)
+        forecast = self.store.get(key)
+        if forecast is not None:
+            return forecast
+        # Concurrent questions about the same place wait for a single request
+        with self._lock(key):
+            forecast = self.store.get(key)
+            if forecast is None:
+                forecast = self.fetch(
+                    round(lat, self.precision), round(lon, self.precision)
+                )
+                self.store.set(key, forecast, ttl=3600)
+        return forecast
+
+    def fetch(self, lat: float, lon: float) -> dict:
+        params = {
+            "latitude": lat,
+            "longitude": lon,
+            "current": CURRENT_VARIABLES,
+            "daily": DAILY_VARIABLES,
+            "timezone": "Europe/Berlin",
+            "forecast_days": 3,
+        }
+        start = time.perf_counter()
+        response = self.client_factory().weather_api(
+            OPEN_METEO_URL, params=params, timeout=OPEN_METEO_TIMEOUT
+        )[0]
+        logger.info(f"Open-Meteo forecast in {time.perf_counter() - start:.2f}s")
+
+        current = response.Current()
+        daily = response.Daily()
+        return {
+            "current": {
+                name: current.Variables(i).Value()
+                for i, name in enumerate(CURRENT_VARIABLES)
+            },
+            "daily": {
+                name: daily.Variables(i).ValuesAsNumpy().tolist()
+                for i, name in enumerate(DAILY_VARIABLES)
+            },
+        }
+
+
+@cache
+def get_forecast_store() -> ForecastStore:
+    return ForecastStore(PersistentCache("forecasts", memory_size=64, max_entries=500))
@@ -0,0 +1,137 @@
+import csv
+import logging
+import os
+from functools import cache
+from typing import Optional
+
+from dotenv import load_dotenv
+from geopy.geocoders import Nominatim
+
+from ..data.gazetteer import gazetteer, regions
+from ..tools.intent import normalize
+from ..utils.cache import PersistentCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Optional extra places: a CSV with name,lat,lon[,aliases separated by |] columns or a
+# GeoNames dump (cities500.txt, cities15000.txt...)
+GAZETTEER_FILE = os.getenv("GAZETTEER_FILE")
+GEOCODE_TIMEOUT = float(os.getenv("GEOCODE_TIMEOUT", "5"))
+GEOCODE_CACHE_MAX_AGE = float(os.getenv("GEOCODE_CACHE_MAX_AGE", str(90 * 24 * 3600)))
+# Places Nominatim does not know are not asked for again for this long
+GEOCODE_NEGATIVE_TTL = float(os.getenv("GEOCODE_NEGATIVE_TTL", "86400"))
+
+
+REGIONS = frozenset(normalize(region) for region in regions)
+
+
+def place_keys(name: str) -> list[str]:
+    """
+    Lookup keys for a place name: 'Mataró, Barcelona, Spain' -> ['mataro barcelona
+    spain', 'mataro barcelona', 'mataro']. Only known countries and regions are
+    dropped, 'Paris, Texas' -> ['paris texas'] is not taken for Paris, France.
+    """
+    parts = [part for part in (normalize(p) for p in name.split(",")) if part]
+    keys = [" ".join(parts)] if parts else []
+    while len(parts) > 1 and parts[-1] in REGIONS:
+        parts.pop()
+        keys.append(" ".join(parts))
+    return keys
+
+
+class Gazetteer:
+    """In-memory index from normalized place names and aliases to coordinates."""
+
+    def __init__(self):
+        self._index: dict[str, tuple[float, float, int]] = {}
+
+    def add(
+        self, name: str, lat: float, lon: float, aliases=(), population: int = 0
+    ) -> None:
+        for key in [normalize(name), *(normalize(a) for a in aliases)]:
+            # Homonyms resolve to the most populated place
+            if key and (key not in self._index or self._index[key][2] < population):
+                self._index[key] = (lat, lon, population)
+
+    def load_file(self, path: str) -> None:
+        with open(path, encoding="utf-8", newline="") as f:
+            if path.endswith(".txt"):  # GeoNames tab separated dump
+                for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+                    self.add(
+                        row[1],
+                        float(row[4]),
+                        float(row[5]),
+                        aliases=[row[2], *row[3].split(",")],
+                        population=int(row[14] or 0),
+                    )
+            else:
+                for row in csv.DictReader(f):
+                    self.add(
+                        row["name"],
+                        float(row["lat"]),
+                        float(row["lon"]),
+                        aliases=(row.get("aliases") or "").split("|"),
+                    )
+        logger.info(f"Gazetteer loaded from {path}: {len(self)} names")
+
+    def lookup(self, name: str) -> Optional[dict]:
+        for key in place_keys(name):
+            if key in self._index:
+                lat, lon, _ = self._index[key]
+                return {"lat": lat, "lon": lon}
+        return None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+@cache
+def get_gazetteer() -> Gazetteer:
+    index = Gazetteer()
+    if GAZETTEER_FILE:
+        try:
+            index.load_file(GAZETTEER_FILE)
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            logger.warning(f"Could not load gazetteer {GAZETTEER_FILE}: {e}")
+    # The bundled places win over homonyms in the file
+    for name, (lat, lon, aliases) in gazetteer.items():
+        index.add(name, lat, lon, aliases, population=10**9)
+    return index
+
+
+@cache
+def get_geocode_cache() -> PersistentCache:
+    return PersistentCache("geocode", max_age=GEOCODE_CACHE_MAX_AGE)
+
+
+@cache
+def get_geolocator() -> Nominatim:
+    return Nominatim(user_agent="city_locator", timeout=GEOCODE_TIMEOUT)
+
+
+def geocode(city_name: str) -> Optional[dict]:
+    """
+    Coordinates of a place from the local gazetteer, then the geocode cache and only
+    then Nominatim. Returns None when the place cannot be found.
+    """
+    coords = get_gazetteer().lookup(city_name)
+    if coords is not None:
+        return coords
+
+    geocode_cache = get_geocode_cache()
+    keys = place_keys(city_name)
+    if not keys:
+        return None
+    cached = geocode_cache.get(keys[0])
+    if cached is not None:
+        return cached if cached.get("lat") is not None else None
+
+    location = get_geolocator().geocode(city_name)
+    if location is None:
+        geocode_cache.set(keys[0], {"lat": None, "lon": None}, ttl=GEOCODE_NEGATIVE_TTL)
+        return None
+    coords = {"lat": location.latitude, "lon": location.longitude}
+    geocode_cache.set(keys[0], coords)
+    return coords
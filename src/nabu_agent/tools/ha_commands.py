@@ -0,0 +1,180 @@
+import logging
+import os
+import re
+from difflib import SequenceMatcher
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+
+from ..tools.ha_state import DOMAIN_WORDS, HAStateMirror
+from ..tools.intent import normalize
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+HA_FAST_PATH = os.getenv("HA_FAST_PATH", "true") == "true"
+# Fuzzy score (0-1) the named device needs to be acted on without the agent
+HA_FAST_PATH_MIN_SCORE = float(os.getenv("HA_FAST_PATH_MIN_SCORE", "0.85"))
+# Lead the best device needs over the second one, below it the command is ambiguous
+HA_FAST_PATH_MIN_MARGIN = float(os.getenv("HA_FAST_PATH_MIN_MARGIN", "0.1"))
+
+# Naming a device by its area and kind ("kitchen light") counts for less than its
+# own name, so a device named that way wins over others of the same kind and area
+KIND_WEIGHT = 0.85
+
+# Domains each action is run on directly; anything else (locks, alarms, covers
+# turned on/off...) is left to the agent
+ON_OFF_DOMAINS = ("light", "switch", "fan", "input_boolean", "media_player")
+LEVEL_SERVICES = {
+    "light": ("turn_on", "brightness_pct", 1),
+    "fan": ("set_percentage", "percentage", 1),
+    "cover": ("set_cover_position", "position", 1),
+    "media_player": ("volume_set", "volume_level", 0.01),
+}
+
+ARTICLES = ("the", "my")
+_TARGET = r"(?:the |my )?(?P<target>(?!all\b|every\b)[a-z0-9 ]+?)"
+_LEVEL = r"(?P<level>\d{1,3})(?: ?(?:percent|per cent))?"
+COMMAND_PATTERNS = {
+    "turn_on": [
+        rf"(?:turn|switch|power) on {_TARGET}",
+        rf"(?:turn|switch|power) {_TARGET} on",
+    ],
+    "turn_off": [
+        rf"(?:turn|switch|power) off {_TARGET}",
+        rf"(?:turn|switch|power) {_TARGET} off",
+    ],
+    "toggle": [rf"toggle {_TARGET}"],
+    "set_level": [
+        rf"(?:set|change) the (?:brightness|volume|speed|position|level) "
+        rf"(?:of|on|for) {_TARGET} to {_LEVEL}",
+        rf"(?:set|dim|put|turn) {_TARGET} (?:brightness |level |volume )?to {_LEVEL}",
+    ],
+}
+_PREFIX = r"(?:(?:hey |ok )?nabu |please |(?:can|could|would) you )*"
+_SUFFIX = r"(?: please| now| for me)*"
+COMMANDS = [
+    (action, re.compile(rf"^{_PREFIX}{pattern}{_SUFFIX}$"))
+    for action, patterns in COMMAND_PATTERNS.items()
+    for pattern in patterns
+]
+
+
+def parse_ha_command(text: str) -> Optional[dict]:
+    """
+    The action ("turn_on", "turn_off", "toggle", "set_level"), the device named and
+    the level (0-100) of a simple English command, or None for anything else.
+    """
+    text = normalize(text)
+    for action, pattern in COMMANDS:
+        found = pattern.match(text)
+        if found is None:
+            continue
+        groups = {k: v for k, v in found.groupdict().items() if v is not None}
+        level = int(groups["level"]) if "level" in groups else None
+        if level is not None and level > 100:
+            return None
+        target = " ".join(w for w in groups["target"].split() if w not in ARTICLES)
+        return {"action": action, "target": target, "level": level}
+    return None
+
+
+def entity_names(entity: dict) -> list[tuple[str, float]]:
+    """
+    Normalized ways of naming an entity, with their weight: its name, its name with
+    its area and its area with its kind.
+    """
+    name = normalize(entity["name"])
+    names = [(name, 1.0)]
+    area = normalize(entity["area"] or "")
+    if area:
+        names += [(f"{area} {name}", 1.0), (f"{name} in {area}", 1.0)]
+        for kind in DOMAIN_WORDS.get(entity["domain"], entity["domain"]).split():
+            names += [(f"{area} {kind}", KIND_WEIGHT)]
+            names += [(f"{kind} in {area}", KIND_WEIGHT)]
+    return names
+
+
+def entity_score(target: str, entity: dict) -> float:
+    return max(
+        SequenceMatcher(None, target, name).ratio() * weight
+        for name, weight in entity_names(entity)
+    )
+
+
+def supports(action: str, domain: str) -> bool:
+    if action == "set_level":
+        return domain in LEVEL_SERVICES
+    return domain in ON_OFF_DOMAINS
+
+
+def match_ha_command(text: str, entities: Iterable[dict]) -> Optional[dict]:
+    """
+    Resolve a simple command against the mirrored entities.
+
+    Returns None when the command is not a simple on/off/toggle/set-level one.
+    Otherwise the parsed command plus `confidence` (fuzzy score of the best entity)
+    and `candidates` (the best three, entity_id and score); `entity` is the entity
+    to act on, or None when the best one scores below the minimum or not clearly
+    above the next, in which case the command goes to the agent.
+    """
+    command = parse_ha_command(text)
+    if command is None:
+        return None
+    scored = sorted(
+        (
+            (entity_score(command["target"], entity), entity)
+            for entity in entities
+            if supports(command["action"], entity["domain"])
+        ),
+        key=lambda pair: -pair[0],
+    )
+    best_score = scored[0][0] if scored else 0.0
+    margin = best_score - (scored[1][0] if len(scored) > 1 else 0.0)
+    confident = (
+        best_score >= HA_FAST_PATH_MIN_SCORE and margin >= HA_FAST_PATH_MIN_MARGIN
+    )
+    return {
+        **command,
+        "entity": scored[0][1] if confident else None,
+        "confidence": round(best_score, 3),
+        "candidates": [(e["entity_id"], round(s, 3)) for s, e in scored[:3]],
+    }
+
+
+def service_call(match: dict) -> tuple[str, str, dict]:
+    """Domain, service and service data that carry out a resolved command."""
+    domain = match["entity"]["domain"]
+    if match["action"] == "set_level":
+        service, field, scale = LEVEL_SERVICES[domain]
+        return domain, service, {field: match["level"] * scale}
+    return domain, match["action"], {}
+
+
+def confirmation(match: dict) -> str:
+    name = match["entity"]["name"]
+    if match["action"] == "set_level":
+        return f"Set the {name} to {match['level']}%."
+    if match["action"] == "toggle":
+        return f"Toggled the {name}."
+    return f"Turned {match['action'].removeprefix('turn_')} the {name}."
+
+
+def failure(match: dict, error: Exception) -> str:
+    name = match["entity"]["name"]
+    if isinstance(error, RuntimeError):
+        return f"Home Assistant could not do that with the {name}: {error}."
+    return f"I sent the command to the {name}, but Home Assistant did not confirm it."
+
+
+async def execute_ha_match(mirror: HAStateMirror, match: dict) -> str:
+    """Call the Home Assistant service of a resolved command over the websocket."""
+    domain, service, data = service_call(match)
+    entity_id = match["entity"]["entity_id"]
+    await mirror.call_service(domain, service, entity_id, data)
+    logger.info(
+        f"Home Assistant fast path: {domain}.{service} on {entity_id} "
+        f"(confidence {match['confidence']})"
+    )
+    return confirmation(match)
@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+import anyio
+from dotenv import load_dotenv
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.sessions import create_session
+from langchain_mcp_adapters.tools import load_mcp_tools
+from mcp import ClientSession
+from mcp.shared.exceptions import McpError
+from mcp.types import (
+    CONNECTION_CLOSED,
+    ServerNotification,
+    ToolListChangedNotification,
+)
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+HA_MCP_CONNECT_TIMEOUT = float(os.getenv("HA_MCP_CONNECT_TIMEOUT", "10"))
+# A ping every this many seconds keeps the SSE stream open and detects a dead one
+HA_MCP_PING_INTERVAL = float(os.getenv("HA_MCP_PING_INTERVAL", "30"))
+# The tool list is reloaded after this long even without a list_changed notification
+HA_MCP_TOOLS_TTL = float(os.getenv("HA_MCP_TOOLS_TTL", "3600"))
+HA_MCP_MAX_BACKOFF = float(os.getenv("HA_MCP_MAX_BACKOFF", "60"))
+
+T = TypeVar("T")
+
+# What a call on a dropped stream raises, depending on where the stream broke
+STREAM_ERRORS = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+)
+
+
+def is_stream_error(error: BaseException) -> bool:
+    if isinstance(error, McpError):
+        return error.error.code == CONNECTION_CLOSED
+    return isinstance(error, STREAM_ERRORS)
+
+
+def ha_connection() -> dict:
+    return {
+        "url": f"{os.environ['HA_URL']}/mcp_server/sse",
+        "transport": "sse",
+        "headers": {"Authorization": f"Bearer {os.environ['HA_TOKEN']}"},
+    }
+
+
+class MCPSessionManager:
+    """
+    One long-lived MCP session to a server, owned by a background task.
+
+    The task connects, keeps the SSE stream alive with pings and reconnects with
+    exponential backoff when it drops. The server's tools are loaded once, bound to
+    the live session, and reloaded when the server sends `tools/list_changed`, after
+    `tools_ttl` seconds or after `invalidate()`. `agent()` returns the agent built by
+    `agent_factory` for the current tool list, so it is reused across commands.
+    Work on the session goes through `call()`, which turns a dropped stream into a
+    ConnectionError instead of an anyio/MCP error or a call waiting forever; so does
+    waiting for a session that does not connect in time.
+    """
+
+    def __init__(
+        self,
+        connection: dict,
+        agent_factory: Optional[Callable[[list[BaseTool]], Any]] = None,
+        ping_interval: float = HA_MCP_PING_INTERVAL,
+        tools_ttl: float = HA_MCP_TOOLS_TTL,
+        max_backoff: float = HA_MCP_MAX_BACKOFF,
+        server_name: str = "homeassistant",
+    ):
+        self.connection = {
+            **connection,
+            "session_kwargs": {"message_handler": self._on_message},
+        }
+        self.agent_factory = agent_factory
+        self.ping_interval = ping_interval
+        self.tools_ttl = tools_ttl
+        self.max_backoff = max_backoff
+        self.server_name = server_name
+
+        self.session: Optional[ClientSession] = None
+        self._connected = asyncio.Event()
+        self._disconnect = asyncio.Event()
+        # Set when the current session ends, calls still waiting on it are failed
+        self._lost = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._closing = False
+        self._tools: Optional[list[BaseTool]] = None
+        self._tools_loaded_at = 0.0
+        self._tools_lock = asyncio.Lock()
+        self._agent = None
+
+        self.connects = 0
+        self.tool_loads = 0
+        self.last_error: Optional[str] = None
+
+    async def _on_message(self, message) -> None:
+        if isinstance(message, ServerNotification) and isinstance(
+            message.root, ToolListChangedNotification
+        ):
+            logger.info("MCP tool list changed, it will be reloaded")
+            self.invalidate()
+        elif isinstance(message, Exception):
+            logger.warning(f"MCP stream error: {message}")
+            self._disconnect.set()
+
+    def start(self) -> None:
+        if self._runner is None or self._runner.done():
+            self._closing = False
+            self._runner = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while not self._closing:
+            try:
+                async with create_session(self.connection) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._lost = asyncio.Event()
+                    self.connects += 1
+                    self.invalidate()
+                    self._disconnect.clear()
+                    self._connected.set()
+                    logger.info(f"MCP session to {self.server_name} connected")
+                    backoff = 1.0
+                    await self._keep_alive(session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                while isinstance(e, ExceptionGroup) and len(e.exceptions) == 1:
+                    e = e.exceptions[0]
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.warning(f"MCP session to {self.server_name} failed: {e}")
+            finally:
+                self._connected.clear()
+                self._lost.set()
+                self.session = None
+            if self._closing:
+                break
+            delay = backoff * random.uniform(0.8, 1.2)
+            logger.info(f"Reconnecting to {self.server_name} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def _keep_alive(self, session: ClientSession) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(
+                    self._disconnect.wait(), timeout=self.ping_interval
+                )
+                raise ConnectionError("MCP stream closed")
+            except asyncio.TimeoutError:
+                await asyncio.wait_for(session.send_ping(), timeout=self.ping_interval)
+
+    async def connected_session(
+        self, timeout: float = HA_MCP_CONNECT_TIMEOUT
+    ) -> ClientSession:
+        self.start()
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionError(
+                f"MCP session to {self.server_name} not connected after {timeout}s"
+                f" (last error: {self.last_error})"
+            ) from None
+        return self.session
+
+    def invalidate(self) -> None:
+        self._tools = None
+        self._agent = None
+
+    async def tools(self) -> list[BaseTool]:
+        async with self._tools_lock:
+            session = await self.connected_session()
+            expired = time.monotonic() - self._tools_loaded_at > self.tools_ttl
+            if self._tools is None or expired:
+                self._tools = await self.call(
+                    load_mcp_tools(session, server_name=self.server_name)
+                )
+                self._tools_loaded_at = time.monotonic()
+                self._agent = None
+                self.tool_loads += 1
+                logger.info(f"Loaded {len(self._tools)} MCP tools")
+            return self._tools
+
+    async def agent(self):
+        tools = await self.tools()
+        if self._agent is None:
+            self._agent = self.agent_factory(tools)
+        return self._agent
+
+    async def call(self, awaitable: Awaitable[T]) -> T:
+        """
+        Await a use of the session (a tool call, an agent run). Raises ConnectionError
+        when the stream breaks or the session ends before it is done.
+        """
+        lost = self._lost
+        task = asyncio.ensure_future(awaitable)
+        session_lost = asyncio.ensure_future(lost.wait())
+        try:
+            done, _ = await asyncio.wait(
+                {task, session_lost}, return_when=asyncio.FIRST_COMPLETED
+            )
+        except BaseException:
+            task.cancel()
+            raise
+        finally:
+            session_lost.cancel()
+        if task not in done:
+            task.cancel()
+            raise ConnectionError(f"MCP session to {self.server_name} lost")
+        error = task.exception()
+        if error is not None and is_stream_error(error):
+            message = f"MCP stream to {self.server_name} broke"
+            raise ConnectionError(message) from error
+        return task.result()
+
+    def reconnect(self) -> None:
+        """Drop the current stream, e.g. after a call failed on it."""
+        self._connected.clear()
+        self.invalidate()
+        self._disconnect.set()
+
+    async def close(self) -> None:
+        self._closing = True
+        self._disconnect.set()
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "connected": self._connected.is_set(),
+            "connects": self.connects,
+            "tool_loads": self.tool_loads,
+            "tools": len(self._tools) if self._tools is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+_managers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, MCPSessionManager]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_ha_mcp_session(
+    agent_factory: Callable[[list[BaseTool]], Any],
+) -> MCPSessionManager:
+    """The Home Assistant MCP session of the running event loop."""
+    loop = asyncio.get_running_loop()
+    manager = _managers.get(loop)
+    if manager is None:
+        manager = _managers[loop] = MCPSessionManager(ha_connection(), agent_factory)
+        manager.start()
+    return manager
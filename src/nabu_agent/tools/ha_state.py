@@ -0,0 +1,474 @@
+import asyncio
+import itertools
+import logging
+import os
+import random
+import re
+import weakref
+from difflib import get_close_matches
+from typing import Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+from ..tools.intent import normalize
+from ..tools.passages import bm25_scores, terms
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Seconds a command waits for the first snapshot of the states before going without;
+# once a connection attempt failed, commands go without it at once until it is back
+HA_STATE_WAIT = float(os.getenv("HA_STATE_WAIT", "2"))
+HA_STATE_TIMEOUT = float(os.getenv("HA_STATE_TIMEOUT", "10"))
+HA_STATE_HEARTBEAT = float(os.getenv("HA_STATE_HEARTBEAT", "30"))
+HA_STATE_MAX_BACKOFF = float(os.getenv("HA_STATE_MAX_BACKOFF", "60"))
+# Most entities given to the agent along with a command
+HA_STATE_CONTEXT_ENTITIES = int(os.getenv("HA_STATE_CONTEXT_ENTITIES", "12"))
+HA_STATE_EXCLUDE_DOMAINS = frozenset(
+    os.getenv(
+        "HA_STATE_EXCLUDE_DOMAINS", "conversation,event,image,stt,tts,update,zone"
+    ).split(",")
+)
+
+# Attributes kept next to the state, the rest of each state object is dropped
+KEPT_ATTRIBUTES = (
+    "unit_of_measurement",
+    "device_class",
+    "brightness",
+    "current_temperature",
+    "temperature",
+    "percentage",
+    "current_position",
+    "media_title",
+    "media_artist",
+)
+# Words that name a kind of device, so "the lights" finds every light
+DOMAIN_WORDS = {
+    "light": "light lights lamp lamps",
+    "switch": "switch switches plug plugs",
+    "fan": "fan fans",
+    "cover": "blind blinds shutter shutters curtain curtains",
+    "climate": "thermostat heating heater air conditioning",
+    "media_player": "tv television speaker player",
+    "lock": "lock door",
+    "vacuum": "vacuum robot",
+    "sensor": "sensor",
+    "binary_sensor": "sensor",
+}
+REGISTRY_EVENTS = (
+    "area_registry_updated",
+    "device_registry_updated",
+    "entity_registry_updated",
+)
+# Entities scoring below this fraction of the best match are left out of the context
+RELEVANCE_CUTOFF = 0.3
+
+_STATUS_QUESTION = re.compile(
+    r"^(?:is|are|was|were|what|whats|which|how|does|do|did|has|have|who|when|"
+    r"where|tell me|list|show|check)\b"
+)
+_ACTION = re.compile(
+    r"\b(?:turn|switch|set|open|close|lock|unlock|start|stop|toggle|dim|brighten|"
+    r"activate|deactivate|increase|decrease|raise|lower|put|play|pause)\b"
+)
+
+
+def is_status_question(text: str) -> bool:
+    """Whether an English command asks about the home instead of changing it."""
+    text = normalize(text)
+    return bool(_STATUS_QUESTION.match(text)) and not _ACTION.search(text)
+
+
+def websocket_url(url: str) -> str:
+    return re.sub(r"^http", "ws", url.rstrip("/")) + "/api/websocket"
+
+
+def format_entities(entities: list[dict]) -> str:
+    """One compact line per entity: entity_id | name | area | state."""
+    lines = []
+    for entity in entities:
+        attributes = dict(entity["attributes"])
+        state = f"{entity['state']}{attributes.pop('unit_of_measurement', '')}"
+        attributes.pop("device_class", None)
+        extra = ", ".join(f"{k} {v}" for k, v in attributes.items())
+        lines.append(
+            f"- {entity['entity_id']} | {entity['name']} | {entity['area'] or '-'} | "
+            f"{state}{f' ({extra})' if extra else ''}"
+        )
+    return "\n".join(lines)
+
+
+class CommandNotSentError(ConnectionError):
+    """The websocket was down, so Home Assistant never received the command."""
+
+
+class HAStateMirror:
+    """
+    Local copy of the Home Assistant entity states, names and areas.
+
+    A background task opens the websocket API, subscribes to `state_changed` (and to
+    the registry updates), then builds a snapshot from `get_states` and the area,
+    device and entity registries and swaps it in, applying the events that arrived
+    meanwhile if they are newer; from then on every event updates it in place, so
+    reading it costs no request. The connection is kept open with heartbeats and
+    reopened with exponential backoff, and the copy is seeded again after each
+    reconnection.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        token: str,
+        timeout: float = HA_STATE_TIMEOUT,
+        heartbeat: float = HA_STATE_HEARTBEAT,
+        max_backoff: float = HA_STATE_MAX_BACKOFF,
+        exclude_domains=HA_STATE_EXCLUDE_DOMAINS,
+    ):
+        self.url = websocket_url(url)
+        self.token = token
+        self.timeout = timeout
+        self.heartbeat = heartbeat
+        self.max_backoff = max_backoff
+        self.exclude_domains = frozenset(exclude_domains)
+
+        self.entities: dict[str, dict] = {}
+        self._entity_areas: dict[str, str] = {}
+        self._docs: Optional[tuple[list[str], list[str], set[str]]] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future] = {}
+        self._ready = asyncio.Event()
+        # Set by the first seed or the first failed connection, whichever comes first
+        self._settled = asyncio.Event()
+        # Events received while a snapshot is being built
+        self._buffer: Optional[list[dict]] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.connects = 0
+        self.events = 0
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        if self._runner is None or self._runner.done():
+            self._closing = False
+            self._runner = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while not self._closing:
+            try:
+                await self._connect()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.ready:  # the connection had been up, retry quickly
+                    backoff = 1.0
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.warning(f"Home Assistant websocket failed: {e}")
+            finally:
+                self._ready.clear()
+                self._settled.set()
+                self._ws = None
+                self._fail_pending()
+            if self._closing:
+                break
+            delay = backoff * random.uniform(0.8, 1.2)
+            logger.info(f"Reconnecting to the Home Assistant websocket in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def _connect(self) -> None:
+        timeout = aiohttp.ClientTimeout(connect=self.timeout)
+        async with (
+            aiohttp.ClientSession(timeout=timeout) as http,
+            http.ws_connect(self.url, heartbeat=self.heartbeat) as ws,
+        ):
+            await self._authenticate(ws)
+            self._ws = ws
+            self.connects += 1
+            reader = asyncio.create_task(self._read(ws))
+            try:
+                await self._seed()
+                self._ready.set()
+                self._settled.set()
+                logger.info(
+                    f"Home Assistant state mirror seeded with "
+                    f"{len(self.entities)} entities"
+                )
+                await reader
+            finally:
+                reader.cancel()
+
+    async def _authenticate(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        message = await ws.receive_json(timeout=self.timeout)
+        if message.get("type") == "auth_required":
+            await ws.send_json({"type": "auth", "access_token": self.token})
+            message = await ws.receive_json(timeout=self.timeout)
+        if message.get("type") != "auth_ok":
+            raise PermissionError(message.get("message", "authentication failed"))
+
+    def _fail_pending(self) -> None:
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Home Assistant websocket closed"))
+        self._pending.clear()
+
+    async def _read(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                break
+            message = msg.json()
+            if message.get("type") == "event":
+                self._on_event(message["event"])
+                continue
+            future = self._pending.pop(message.get("id"), None)
+            if future is None or future.done():
+                continue
+            if message.get("success", True):
+                future.set_result(message.get("result"))
+            else:
+                error = message.get("error") or {}
+                future.set_exception(RuntimeError(error.get("message", "HA error")))
+        self._fail_pending()
+        raise ConnectionError("Home Assistant websocket closed")
+
+    async def call(self, message: dict):
+        """
+        Send a websocket command and wait for its result. CommandNotSentError means
+        the command did not go out; any other error may come after Home Assistant
+        received (and ran) it.
+        """
+        if self._ws is None:
+            raise CommandNotSentError("Home Assistant websocket not connected")
+        message_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            await self._ws.send_json({"id": message_id, **message})
+        except (ConnectionError, RuntimeError) as e:
+            # aiohttp refuses to write to a closing websocket
+            self._pending.pop(message_id, None)
+            raise CommandNotSentError(f"Home Assistant websocket closing: {e}") from e
+        return await asyncio.wait_for(future, timeout=self.timeout)
+
+    async def call_service(
+        self, domain: str, service: str, entity_id: str, data: Optional[dict] = None
+    ):
+        return await self.call(
+            {
+                "type": "call_service",
+                "domain": domain,
+                "service": service,
+                "service_data": data or {},
+                "target": {"entity_id": entity_id},
+            }
+        )
+
+    async def _seed(self) -> None:
+        # Subscribing first means no change between the snapshot and the events is
+        # lost; they are buffered while the snapshot is built, the copy in use (and
+        # read by commands meanwhile) is replaced at once
+        self._buffer = []
+        try:
+            for event_type in ("state_changed", *REGISTRY_EVENTS):
+                await self.call({"type": "subscribe_events", "event_type": event_type})
+            entity_areas = await self._fetch_entity_areas()
+            states = await self.call({"type": "get_states"})
+            self._entity_areas = entity_areas
+            self.load_states(states)
+            buffered = self._buffer
+        finally:
+            self._buffer = None
+        for event in buffered:
+            self._apply_event(event, newer_only=True)
+
+    async def _fetch_entity_areas(self) -> dict[str, str]:
+        areas = await self.call({"type": "config/area_registry/list"})
+        devices = await self.call({"type": "config/device_registry/list"})
+        entities = await self.call({"type": "config/entity_registry/list"})
+        area_names = {a["area_id"]: a["name"] for a in areas}
+        device_areas = {d["id"]: d.get("area_id") for d in devices}
+        entity_areas = {}
+        for entry in entities:
+            area_id = entry.get("area_id") or device_areas.get(entry.get("device_id"))
+            if area_id in area_names:
+                entity_areas[entry["entity_id"]] = area_names[area_id]
+        return entity_areas
+
+    async def _load_registries(self) -> None:
+        self._entity_areas = await self._fetch_entity_areas()
+        for entity in self.entities.values():
+            entity["area"] = self._entity_areas.get(entity["entity_id"])
+        self._docs = None
+
+    def _on_event(self, event: dict) -> None:
+        self.events += 1
+        if self._buffer is not None:
+            self._buffer.append(event)
+        else:
+            self._apply_event(event)
+
+    def _is_newer(self, entity_id: str, state: Optional[dict]) -> bool:
+        """Whether `state` is not older than the mirrored one, by last_updated."""
+        current = self.entities.get(entity_id)
+        if current is None or not state:
+            return True
+        updated = state.get("last_updated") or state.get("last_changed") or ""
+        return updated >= (current["last_updated"] or "")
+
+    def _apply_event(self, event: dict, newer_only: bool = False) -> None:
+        if event.get("event_type") == "state_changed":
+            data = event["data"]
+            new_state = data.get("new_state")
+            if new_state is None:
+                entity_id = data["entity_id"]
+                if newer_only and not self._is_newer(entity_id, data.get("old_state")):
+                    return
+                if self.entities.pop(entity_id, None) is not None:
+                    self._docs = None
+            elif not newer_only or self._is_newer(new_state["entity_id"], new_state):
+                self.update_state(new_state)
+        elif event.get("event_type") in REGISTRY_EVENTS:
+            asyncio.create_task(self._reload_registries())
+
+    async def _reload_registries(self) -> None:
+        try:
+            await self._load_registries()
+        except Exception as e:
+            logger.warning(f"Could not reload the Home Assistant registries: {e}")
+
+    def load_states(self, states: list[dict]) -> None:
+        """Replace the mirrored entities with a `get_states` snapshot."""
+        entities = {}
+        for state in states:
+            entity = self._entity(state)
+            if entity is not None:
+                entities[entity["entity_id"]] = entity
+        self.entities = entities
+        self._docs = None
+
+    def _entity(self, state: dict) -> Optional[dict]:
+        entity_id = state["entity_id"]
+        domain, object_id = entity_id.split(".", 1)
+        if domain in self.exclude_domains:
+            return None
+        attributes = state.get("attributes", {})
+        name = attributes.get("friendly_name") or object_id.replace("_", " ")
+        return {
+            "entity_id": entity_id,
+            "domain": domain,
+            "name": name,
+            "area": self._entity_areas.get(entity_id),
+            "state": state["state"],
+            "attributes": {
+                k: attributes[k] for k in KEPT_ATTRIBUTES if k in attributes
+            },
+            "last_changed": state.get("last_changed"),
+            "last_updated": state.get("last_updated") or state.get("last_changed"),
+        }
+
+    def update_state(self, state: dict) -> None:
+        entity = self._entity(state)
+        if entity is None:
+            return
+        previous = self.entities.get(entity["entity_id"])
+        self.entities[entity["entity_id"]] = entity
+        if previous is None or previous["name"] != entity["name"]:
+            self._docs = None
+
+    # Lookups
+
+    def _index(self) -> tuple[list[str], list[str], set[str]]:
+        if self._docs is None:
+            ids, docs = [], []
+            for entity_id, entity in self.entities.items():
+                words = [
+                    entity["name"],
+                    entity["area"] or "",
+                    entity_id.split(".", 1)[1].replace("_", " "),
+                    DOMAIN_WORDS.get(entity["domain"], entity["domain"]),
+                    entity["attributes"].get("device_class", ""),
+                ]
+                ids.append(entity_id)
+                docs.append(" ".join(words))
+            vocabulary = {word for doc in docs for word in terms(doc)}
+            self._docs = (ids, docs, vocabulary)
+        return self._docs
+
+    def relevant(self, text: str, limit: int = HA_STATE_CONTEXT_ENTITIES) -> list[dict]:
+        """
+        The entities a command most likely refers to, best first, ranked with BM25
+        over their names, areas and device kinds. Words that are not in any entity
+        (mistranscriptions, typos) are replaced by the closest one that is.
+        """
+        ids, docs, vocabulary = self._index()
+        words = []
+        for word in terms(text):
+            if word not in vocabulary:
+                close = get_close_matches(word, vocabulary, n=1, cutoff=0.7)
+                if not close:
+                    continue
+                word = close[0]
+            words.append(word)
+        scores = bm25_scores(" ".join(words), docs)
+        if not scores.size or scores.max() <= 0:
+            return []
+        cutoff = scores.max() * RELEVANCE_CUTOFF
+        ranked = sorted(range(len(ids)), key=lambda i: -scores[i])
+        return [self.entities[ids[i]] for i in ranked[:limit] if scores[i] >= cutoff]
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    async def wait_ready(self, timeout: float = HA_STATE_WAIT) -> bool:
+        """
+        Whether the mirror is connected and seeded. Only the first connection is
+        waited for, up to `timeout`: after it succeeded or failed, this answers at
+        once (a reconnection in progress or Home Assistant down are a False).
+        """
+        self.start()
+        if not self._settled.is_set():
+            try:
+                await asyncio.wait_for(self._settled.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return False
+        return self.ready
+
+    async def close(self) -> None:
+        self._closing = True
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "entities": len(self.entities),
+            "connects": self.connects,
+            "events": self.events,
+            "last_error": self.last_error,
+        }
+
+
+_mirrors: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, HAStateMirror]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_ha_state_mirror() -> HAStateMirror:
+    """The Home Assistant state mirror of the running event loop."""
+    loop = asyncio.get_running_loop()
+    mirror = _mirrors.get(loop)
+    if mirror is None:
+        mirror = _mirrors[loop] = HAStateMirror(
+            os.environ["HA_URL"], os.environ["HA_TOKEN"]
+        )
+        mirror.start()
+    return mirror
@@ -0,0 +1,146 @@
+import logging
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from functools import cache
+
+from dotenv import load_dotenv
+
+from ..data.intent_corpus import intent_corpus
+from ..data.preestablished_commands import party_commands
+from ..utils.schemas import LocalClassification, QuestionType
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.8"))
+
+# Keyword rules. They do not decide on their own: a rule that fires adds a feature
+# to the command vector, weighted like any other term by the centroid model, so the
+# confidence of a rule hit is the model's (see scripts/evaluate_intent_classifier.py)
+KEYWORD_RULES = {
+    QuestionType.api_call: re.compile(
+        r"\b(weather|forecast|rain(ing|y)?|sunny|cloudy|umbrella|snow(ing)?|windy|"
+        r"temperature|hang(ing)? the clothes|tend the clothes)\b"
+    ),
+    QuestionType.spotify: re.compile(
+        r"\b(spotify|playlist|album|(next|previous|skip)( the)? (song|track)|"
+        r"volume (up|down)|(turn|put) (up|down) the (volume|music)|pause( the music)?$)"
+    ),
+    # General questions ("how do you...", "when did...") are usually knowledge ones
+    QuestionType.knowledge: re.compile(
+        r"^(how (do|does|did|many|much)|why|who|when (did|was|were)|"
+        r"what (is|was|are|were) (a|an)\b)"
+    ),
+    QuestionType.homeassistant: re.compile(
+        r"\b(turn|switch) (on|off)\b.*\b(light|lights|lamp|fan|plug|socket|heating|tv)\b|"
+        r"\b(thermostat|blinds|shutters|potus)\b"
+    ),
+}
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def tokenize(text: str) -> list[str]:
+    words = re.findall(r"\w+", normalize(text))
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def rule_features(text: str) -> list[str]:
+    normalized = normalize(text)
+    return [
+        f"rule:{question_type.value}"
+        for question_type, rule in KEYWORD_RULES.items()
+        if rule.search(normalized)
+    ]
+
+
+def features(text: str) -> list[str]:
+    """Unigrams, bigrams and the keyword rules that fire."""
+    return tokenize(text) + rule_features(text)
+
+
+class LocalIntentClassifier:
+    """
+    In-process TF-IDF nearest-centroid classifier over words, bigrams and keyword
+    rule hits.
+
+    Confidence is a softmax over the cosine similarities to each class centroid, so
+    it is only high when one class clearly wins.
+    """
+
+    def __init__(
+        self,
+        corpus: dict[QuestionType, list[str]],
+        party_triggers: list[str] = (),
+        temperature: float = 0.1,
+    ):
+        self.temperature = temperature
+        self.party_triggers = [normalize(t) for t in party_triggers]
+
+        documents = [features(text) for texts in corpus.values() for text in texts]
+        document_frequency = Counter(term for doc in documents for term in set(doc))
+        n_documents = len(documents)
+        self.idf = {
+            term: math.log((1 + n_documents) / (1 + df)) + 1
+            for term, df in document_frequency.items()
+        }
+
+        self.centroids: dict[QuestionType, dict[str, float]] = {}
+        for question_type, texts in corpus.items():
+            centroid = Counter()
+            for text in texts:
+                for term, weight in self.vectorize(text).items():
+                    centroid[term] += weight / len(texts)
+            self.centroids[question_type] = self._unit(centroid)
+
+    @staticmethod
+    def _unit(vector: dict[str, float]) -> dict[str, float]:
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {t: v / norm for t, v in vector.items()} if norm else {}
+
+    def vectorize(self, text: str) -> dict[str, float]:
+        counts = Counter(t for t in features(text) if t in self.idf)
+        return self._unit({t: c * self.idf[t] for t, c in counts.items()})
+
+    def scores(self, text: str) -> dict[QuestionType, float]:
+        vector = self.vectorize(text)
+        return {
+            question_type: sum(w * centroid.get(t, 0.0) for t, w in vector.items())
+            for question_type, centroid in self.centroids.items()
+        }
+
+    def classify(self, text: str) -> LocalClassification:
+        normalized = normalize(text)
+        if any(f" {t} " in f" {normalized} " for t in self.party_triggers):
+            return LocalClassification(classification=QuestionType.party, confidence=1.0)
+
+        scores = self.scores(text)
+        if not any(scores.values()):
+            return LocalClassification(
+                classification=QuestionType.knowledge, confidence=0.0
+            )
+        exps = {qt: math.exp(s / self.temperature) for qt, s in scores.items()}
+        total = sum(exps.values())
+        best = max(exps, key=exps.get)
+        return LocalClassification(classification=best, confidence=exps[best] / total)
+
+
+@cache
+def get_intent_classifier() -> LocalIntentClassifier:
+    return LocalIntentClassifier(intent_corpus, party_triggers=list(party_commands))
+
+
+def classify_locally(english_command: str) -> LocalClassification:
+    result = get_intent_classifier().classify(english_command)
+    logger.info(
+        f"Local classification: {result.classification} ({result.confidence:.2f})"
+    )
+    return result
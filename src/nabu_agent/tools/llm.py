@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+# Requests beyond this wait for a free connection in the pool
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "120"))
+# HTTP/2 needs `h2`, pinned through the httpx[http2] dependency
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true") == "true"
+
+
+class PoolStats:
+    def __init__(self):
+        self.requests = 0
+        self.responses = 0
+        self.errors = 0
+        self.failures = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def on_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+
+    def on_response(self, response: httpx.Response) -> None:
+        with self._lock:
+            self.responses += 1
+            self.in_flight -= 1
+            if response.status_code >= 400:
+                self.errors += 1
+
+    def on_failure(self) -> None:
+        """No response: connect error, timeout or the caller was cancelled."""
+        with self._lock:
+            self.failures += 1
+            self.in_flight -= 1
+
+
+class CountingTransport(httpx.HTTPTransport):
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        _stats.on_request()
+        try:
+            response = super().handle_request(request)
+        except BaseException:
+            _stats.on_failure()
+            raise
+        _stats.on_response(response)
+        return response
+
+
+class AsyncCountingTransport(httpx.AsyncHTTPTransport):
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        _stats.on_request()
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            _stats.on_failure()
+            raise
+        _stats.on_response(response)
+        return response
+
+
+_stats = PoolStats()
+_sync_client: Optional[httpx.Client] = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+_sync_models: dict = {}
+_loop_models: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = (
+    weakref.WeakKeyDictionary()
+)
+_lock = threading.Lock()
+
+
+def _transport_options() -> dict:
+    return {
+        "http2": LLM_HTTP2,
+        "limits": httpx.Limits(
+            max_connections=LLM_MAX_CONCURRENCY,
+            max_keepalive_connections=LLM_MAX_CONCURRENCY,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+
+def get_http_client() -> httpx.Client:
+    global _sync_client
+    with _lock:
+        if _sync_client is None:
+            _sync_client = httpx.Client(
+                transport=CountingTransport(**_transport_options()),
+                timeout=_timeout(),
+            )
+        return _sync_client
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_async_http_client() -> Optional[httpx.AsyncClient]:
+    """Async clients are bound to the event loop their connections were opened on."""
+    loop = _running_loop()
+    if loop is None:
+        return None
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                transport=AsyncCountingTransport(**_transport_options()),
+                timeout=_timeout(),
+            )
+            _async_clients[loop] = client
+        return client
+
+
+def get_model(timeout: Optional[float] = None, **overrides) -> ChatOpenAI:
+    """
+    Shared ChatOpenAI for the current event loop (or for sync callers), reusing warm
+    keep-alive connections to LLM_BASE_URL across every node.
+    """
+    loop = _running_loop()
+    settings = {"temperature": 0.1, "top_p": 0.5, **overrides}
+    key = (timeout, tuple(sorted(settings.items())))
+    with _lock:
+        models = _sync_models if loop is None else _loop_models.setdefault(loop, {})
+        model = models.get(key)
+    if model is not None:
+        return model
+
+    model = ChatOpenAI(
+        model=os.environ["LLM_MODEL"],
+        api_key=os.environ["LLM_API_KEY"],
+        base_url=os.environ["LLM_BASE_URL"],
+        timeout=timeout or LLM_TIMEOUT,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+        **settings,
+    )
+    with _lock:
+        models[key] = model
+    return model
+
+
+def _pool_connections(client) -> Optional[dict]:
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is None:
+        return None
+    idle = sum(1 for c in connections if c.is_idle())
+    return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+def llm_pool_stats() -> dict:
+    with _lock:
+        async_pools = [_pool_connections(c) for c in _async_clients.values()]
+        models = len(_sync_models) + sum(len(m) for m in _loop_models.values())
+    return {
+        "http2": LLM_HTTP2,
+        "max_concurrency": LLM_MAX_CONCURRENCY,
+        "models": models,
+        "requests": _stats.requests,
+        "responses": _stats.responses,
+        "in_flight": _stats.in_flight,
+        "error_responses": _stats.errors,
+        "failed_requests": _stats.failures,
+        "sync_pool": _pool_connections(_sync_client) if _sync_client else None,
+        "async_pools": async_pools,
+    }
@@ -1,10 +1,11 @@
 from typing import Literal
 
-import openmeteo_requests
 from dotenv import load_dotenv
-from geopy.geocoders import Nominatim
 from langchain.tools import tool
 
+from ..tools.forecast import get_forecast_store
+from ..tools.geocode import geocode
+
 load_dotenv()
 WEATHER_CODES = {
     0: "Clear",
@@ -39,80 +40,33 @@ WEATHER_CODES = {
 
 
 def get_todays_forecast(lon: float, lat: float) -> str:
-    openmeteo = openmeteo_requests.Client()
-    url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "current": [
-            "temperature_2m",
-            "precipitation",
-            "weather_code",
-            "cloud_cover",
-            "wind_speed_10m",
-        ],
-        "timezone": "Europe/Berlin",
-    }
-    responses = openmeteo.weather_api(url, params=params)
-    response = responses[0]
-    current = response.Current()
-    current_temperature_2m = current.Variables(0).Value()
-    current_precipitation = current.Variables(1).Value()
-    current_weather_code = current.Variables(2).Value()
-    current_cloud_cover = current.Variables(3).Value()
-    current_wind_speed_10m = current.Variables(4).Value()
+    current = get_forecast_store().get(lat=lat, lon=lon)["current"]
     summary = f"""
-    temperature: {current_temperature_2m}
-    precipitation: {current_precipitation}
-    weather_code: {WEATHER_CODES[current_weather_code]}
-    cloud_cover: {current_cloud_cover}
-    wind_speed: {current_wind_speed_10m}
+    temperature: {current["temperature_2m"]}
+    precipitation: {current["precipitation"]}
+    weather_code: {WEATHER_CODES[current["weather_code"]]}
+    cloud_cover: {current["cloud_cover"]}
+    wind_speed: {current["wind_speed_10m"]}
     """
     return summary
 
 
 def get_tomorrows_forecast(lon: float, lat: float):
-    openmeteo = openmeteo_requests.Client()
-    url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "daily": [
-            "weather_code",
-            "temperature_2m_max",
-            "temperature_2m_min",
-            "precipitation_sum",
-            "precipitation_probability_max",
-            "precipitation_hours",
-        ],
-        "timezone": "Europe/Berlin",
-        "forecast_days": 3,
-    }
-    responses = openmeteo.weather_api(url, params=params)
-    response = responses[0]
-    daily = response.Daily()
-
-    daily_weather_code = daily.Variables(0).ValuesAsNumpy().tolist()
-    daily_temperature_2m_max = daily.Variables(1).ValuesAsNumpy().tolist()
-    daily_temperature_2m_min = daily.Variables(2).ValuesAsNumpy().tolist()
-    daily_precipitation_sum = daily.Variables(3).ValuesAsNumpy().tolist()
-    daily_precipitation_probability_max = daily.Variables(4).ValuesAsNumpy().tolist()
-
+    daily = get_forecast_store().get(lat=lat, lon=lon)["daily"]
     summary = f"""
-    temperature_max: {daily_temperature_2m_max[1]}
-    temperature_min:{daily_temperature_2m_min[1]}
-    precipitation: {daily_precipitation_sum[1]}
-    precipitation_probability:{daily_precipitation_probability_max[1]}
-    weather_code: {WEATHER_CODES[daily_weather_code[1]]}
+    temperature_max: {daily["temperature_2m_max"][1]}
+    temperature_min:{daily["temperature_2m_min"][1]}
+    precipitation: {daily["precipitation_sum"][1]}
+    precipitation_probability:{daily["precipitation_probability_max"][1]}
+    weather_code: {WEATHER_CODES[daily["weather_code"][1]]}
     """
     return summary
 
 
 def get_coords(city_name):
-    geolocator = Nominatim(user_agent="city_locator")
-    location = geolocator.geocode(city_name)
-    if location:
-        return {"lat": location.latitude, "lon": location.longitude}
+    coords = geocode(city_name)
+    if coords:
+        return coords
     else:
         raise ValueError(f"Could not find coordinates for city: {city_name}")
 
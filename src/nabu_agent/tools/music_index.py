@@ -0,0 +1,270 @@
+import logging
+import os
+import threading
+import time
+from difflib import SequenceMatcher
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from ..tools.intent import normalize
+from ..utils.cache import PersistentCache
+from ..utils.schemas import SpotifyType
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the library is fetched again in the background
+MUSIC_INDEX_REFRESH = float(os.getenv("MUSIC_INDEX_REFRESH", str(6 * 3600)))
+# Seconds before a refresh fetches every saved album again (removed or renamed ones)
+MUSIC_INDEX_FULL_REFRESH = float(
+    os.getenv("MUSIC_INDEX_FULL_REFRESH", str(7 * 24 * 3600))
+)
+# Fuzzy score (0-1) a library entry needs to be played without searching Spotify
+MUSIC_INDEX_MIN_SCORE = float(os.getenv("MUSIC_INDEX_MIN_SCORE", "0.85"))
+# Shorter queries ("queen", "la catedral") only match names with exactly their words
+MUSIC_INDEX_FUZZY_MIN_WORDS = int(os.getenv("MUSIC_INDEX_FUZZY_MIN_WORDS", "3"))
+MUSIC_RESOLUTION_MAX_AGE = float(
+    os.getenv("MUSIC_RESOLUTION_MAX_AGE", str(30 * 24 * 3600))
+)
+
+
+def _pages(client, page: Optional[dict], key: Optional[str] = None):
+    """Items of a paginated Spotify response, following `next` links."""
+    while page:
+        if key:
+            page = page[key]
+        yield from page["items"]
+        page = client.next(page) if page.get("next") else None
+
+
+def _entry(item: dict, kind: str) -> Optional[dict]:
+    if not item or not item.get("uri"):
+        return None
+    artists = [a["name"] for a in item.get("artists", [])]
+    owner = (item.get("owner") or {}).get("display_name")
+    return {
+        "uri": item["uri"],
+        "type": kind,
+        "name": item["name"],
+        "artists": artists or ([owner] if owner else []),
+    }
+
+
+def names(entry: dict) -> list[str]:
+    """Normalized ways of naming an entry, alone or with its artist."""
+    name = normalize(entry["name"])
+    candidates = [name] + [f"{name} {normalize(a)}" for a in entry["artists"]]
+    return candidates + [f"{normalize(a)} {name}" for a in entry["artists"]]
+
+
+def score(query: str, entry: dict) -> float:
+    """How well a normalized query names an entry, alone or with its artist."""
+    return max(SequenceMatcher(None, query, c).ratio() for c in names(entry))
+
+
+def same_words(query: str, entry: dict) -> bool:
+    words = sorted(query.split())
+    return any(sorted(name.split()) == words for name in names(entry))
+
+
+class MusicIndex:
+    """
+    Searchable copy of the user's library: playlists, followed artists, saved albums
+    and top tracks.
+
+    The library is saved with `store` and fetched again in a background thread when
+    older than `refresh_seconds`; saved albums come newest first, so a refresh stops
+    at the first album it already has, except every `full_refresh_seconds` when all
+    of them are fetched again. Queries are matched accent-insensitively, by their
+    words when short and with a fuzzy ratio otherwise. Exact resolutions (from the
+    index or from a Spotify search) are remembered in `resolutions`, fuzzy ones are
+    not, so they follow the library as it changes.
+    """
+
+    def __init__(
+        self,
+        store: PersistentCache,
+        resolutions: PersistentCache,
+        refresh_seconds: float = MUSIC_INDEX_REFRESH,
+        min_score: float = MUSIC_INDEX_MIN_SCORE,
+        full_refresh_seconds: float = MUSIC_INDEX_FULL_REFRESH,
+        fuzzy_min_words: int = MUSIC_INDEX_FUZZY_MIN_WORDS,
+    ):
+        self.store = store
+        self.resolutions = resolutions
+        self.refresh_seconds = refresh_seconds
+        self.min_score = min_score
+        self.full_refresh_seconds = full_refresh_seconds
+        self.fuzzy_min_words = fuzzy_min_words
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+        library = store.get("library") or {}
+        self.entries: list[dict] = library.get("entries", [])
+        self.updated_at: float = library.get("updated_at", 0.0)
+        self.full_refreshed_at: float = library.get("full_refreshed_at", 0.0)
+        self._keys = [normalize(e["name"]) for e in self.entries]
+
+        self.index_hits = 0
+        self.cache_hits = 0
+        self.misses = 0
+
+    # Building
+
+    def fetch_library(self, client, full: bool = False) -> list[dict]:
+        old_albums = [] if full else [e for e in self.entries if e["type"] == "album"]
+        known_albums = {e["uri"] for e in old_albums}
+        entries = []
+        for item in _pages(client, client.current_user_playlists(limit=50)):
+            entries.append(_entry(item, "playlist"))
+        followed = client.current_user_followed_artists(limit=50)
+        for item in _pages(client, followed, key="artists"):
+            entries.append(_entry(item, "artist"))
+        for time_range in ("short_term", "medium_term", "long_term"):
+            top = client.current_user_top_tracks(limit=50, time_range=time_range)
+            for item in top["items"]:
+                entries.append(_entry(item, "track"))
+
+        new_albums = []
+        for item in _pages(client, client.current_user_saved_albums(limit=50)):
+            if item["album"]["uri"] in known_albums:
+                break
+            new_albums.append(_entry(item["album"], "album"))
+        entries += new_albums + old_albums
+
+        unique = {}
+        for entry in entries:
+            if entry is not None:
+                unique.setdefault((entry["type"], entry["uri"]), entry)
+        return list(unique.values())
+
+    def refresh(self, client, full: Optional[bool] = None) -> None:
+        start = time.perf_counter()
+        if full is None:
+            full = time.time() - self.full_refreshed_at > self.full_refresh_seconds
+        entries = self.fetch_library(client, full=full)
+        with self._lock:
+            self.entries = entries
+            self._keys = [normalize(e["name"]) for e in entries]
+            self.updated_at = time.time()
+            if full:
+                self.full_refreshed_at = self.updated_at
+        self.store.set(
+            "library",
+            {
+                "entries": entries,
+                "updated_at": self.updated_at,
+                "full_refreshed_at": self.full_refreshed_at,
+            },
+        )
+        logger.info(
+            f"Music index {'fully ' if full else ''}refreshed: {len(entries)} "
+            f"entries in {time.perf_counter() - start:.1f}s"
+        )
+
+    def refresh_in_background(self, client, force: bool = False) -> None:
+        with self._lock:
+            stale = time.time() - self.updated_at > self.refresh_seconds
+            if self._refreshing or not (stale or force):
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh(client)
+            except Exception as e:
+                logger.warning(f"Music index refresh failed: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    # Lookups
+
+    @staticmethod
+    def resolution_key(query: str, criteria_type: SpotifyType) -> str:
+        return f"{SpotifyType(criteria_type).value}|{normalize(query)}"
+
+    def match(
+        self, query: str, criteria_type: SpotifyType
+    ) -> Optional[tuple[dict, bool]]:
+        """
+        Best library entry of the requested type and whether it is an exact match
+        (same name, or same words as its name with or without the artist). Short
+        queries only match exactly, longer ones also above min_score.
+        """
+        query = normalize(query)
+        fuzzy = len(query.split()) >= self.fuzzy_min_words
+        if criteria_type == SpotifyType.RADIO:
+            kinds, query = ("playlist",), f"this is {query}"
+        else:
+            kinds = (SpotifyType(criteria_type).value,)
+        with self._lock:
+            candidates = [
+                (entry, key)
+                for entry, key in zip(self.entries, self._keys)
+                if entry["type"] in kinds
+            ]
+        for entry, key in candidates:
+            if key == query:
+                return entry, True
+        for entry, _ in candidates:
+            if same_words(query, entry):
+                return entry, True
+        if not fuzzy or not candidates:
+            return None
+        best_score, best = max(
+            ((score(query, entry), entry) for entry, _ in candidates),
+            key=lambda pair: pair[0],
+        )
+        return (best, False) if best_score >= self.min_score else None
+
+    def resolve(self, query: str, criteria_type: SpotifyType) -> Optional[str]:
+        key = self.resolution_key(query, criteria_type)
+        uri = self.resolutions.get(key)
+        if uri is not None:
+            self.cache_hits += 1
+            return uri
+        found = self.match(query, criteria_type)
+        if found is not None:
+            entry, exact = found
+            self.index_hits += 1
+            logger.info(f"'{query}' resolved from the music index: {entry['name']}")
+            if exact:
+                self.resolutions.set(key, entry["uri"])
+            return entry["uri"]
+        self.misses += 1
+        return None
+
+    def remember(self, query: str, criteria_type: SpotifyType, uri: str) -> None:
+        self.resolutions.set(self.resolution_key(query, criteria_type), uri)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "updated_at": self.updated_at,
+            "index_hits": self.index_hits,
+            "cache_hits": self.cache_hits,
+            "misses": self.misses,
+        }
+
+
+_index: Optional[MusicIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_music_index() -> MusicIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = MusicIndex(
+                PersistentCache("music_index", memory_size=1),
+                PersistentCache(
+                    "music_resolutions",
+                    memory_size=512,
+                    max_age=MUSIC_RESOLUTION_MAX_AGE,
+                ),
+            )
+        return _index
@@ -0,0 +1,364 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from functools import cache
+from typing import Optional
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+from ..utils.cache import CACHE_DIR
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_DIR = os.path.expanduser(
+    os.getenv("PAGE_CACHE_DIR", os.path.join(CACHE_DIR, "pages"))
+)
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_MB", "200")) * 1024 * 1024
+# Seconds a page is served without asking the origin again
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "3600"))
+# Past its TTL a page is still served this long, revalidated in the background
+PAGE_CACHE_STALE = float(os.getenv("PAGE_CACHE_STALE", "86400"))
+# Seconds between sweeps of the expired pages, the size limit is checked on every store
+PAGE_CACHE_SWEEP_INTERVAL = float(os.getenv("PAGE_CACHE_SWEEP_INTERVAL", "300"))
+
+
+def parse_domain_ttls(value: str) -> dict[str, float]:
+    """'wikipedia.org=604800,bbc.com=600' -> {'wikipedia.org': 604800.0, ...}"""
+    ttls = {}
+    for item in value.split(","):
+        domain, _, ttl = item.partition("=")
+        if domain.strip() and ttl.strip():
+            ttls[domain.strip().lower()] = float(ttl)
+    return ttls
+
+
+PAGE_CACHE_DOMAIN_TTLS = parse_domain_ttls(os.getenv("PAGE_CACHE_DOMAIN_TTLS", ""))
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class PageCache:
+    """
+    Disk cache of fetched pages: raw HTML and extracted text, keyed by URL.
+
+    Bodies are stored once per content hash as zlib-compressed blobs under
+    `directory`, and a SQLite index maps each URL to its blobs, its ETag and
+    Last-Modified validators and its freshness. A page is fresh for the TTL of its
+    domain (the longest matching suffix in `domain_ttls`, else `ttl`), then usable
+    for `stale` more seconds while it is revalidated. Blobs are evicted by least
+    recent access once they take more than `max_bytes`, and expired pages are swept
+    every `sweep_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        directory: str = PAGE_CACHE_DIR,
+        max_bytes: int = PAGE_CACHE_MAX_BYTES,
+        ttl: float = PAGE_CACHE_TTL,
+        stale: float = PAGE_CACHE_STALE,
+        domain_ttls: Optional[dict[str, float]] = None,
+        sweep_interval: float = PAGE_CACHE_SWEEP_INTERVAL,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale = stale
+        self.domain_ttls = (
+            PAGE_CACHE_DOMAIN_TTLS if domain_ttls is None else domain_ttls
+        )
+        self.sweep_interval = sweep_interval
+
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(directory, "index.sqlite"), check_same_thread=False
+        )
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                html_hash TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                fresh_until REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access);
+            CREATE INDEX IF NOT EXISTS pages_html_hash ON pages (html_hash);
+            CREATE INDEX IF NOT EXISTS pages_text_hash ON pages (text_hash);
+            """
+        )
+        self._db.commit()
+        # Compressed size of every blob, kept up to date instead of summed per store
+        self._bytes = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM blobs"
+        ).fetchone()[0]
+        self._last_sweep = time.time()
+
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ttl_for(self, url: str) -> float:
+        host = (urlsplit(url).hostname or "").lower()
+        matches = [
+            domain
+            for domain in self.domain_ttls
+            if host == domain or host.endswith("." + domain)
+        ]
+        return self.domain_ttls[max(matches, key=len)] if matches else self.ttl
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest[:2], digest)
+
+    def _write_blob(self, data: bytes) -> str:
+        digest = content_hash(data)
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            compressed = zlib.compress(data)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp, path)
+            previous = self._db.execute(
+                "SELECT size FROM blobs WHERE hash = ?", (digest,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?)", (digest, len(compressed))
+            )
+            self._bytes += len(compressed) - (previous[0] if previous else 0)
+        return digest
+
+    def _remove_blob(self, digest: str) -> None:
+        try:
+            os.remove(self._blob_path(digest))
+        except FileNotFoundError:
+            pass
+        row = self._db.execute(
+            "SELECT size FROM blobs WHERE hash = ?", (digest,)
+        ).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM blobs WHERE hash = ?", (digest,))
+            self._bytes -= row[0]
+
+    def _release(self, *digests: str) -> None:
+        """Remove the blobs no page refers to any more."""
+        for digest in set(digests):
+            used = self._db.execute(
+                "SELECT 1 FROM pages WHERE html_hash = ? OR text_hash = ? LIMIT 1",
+                (digest, digest),
+            ).fetchone()
+            if used is None:
+                self._remove_blob(digest)
+
+    def _delete_page(self, url: str) -> None:
+        row = self._db.execute(
+            "SELECT html_hash, text_hash FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self._release(*row)
+
+    def _read_blob(self, digest: str) -> Optional[str]:
+        try:
+            with open(self._blob_path(digest), "rb") as f:
+                return zlib.decompress(f.read()).decode("utf-8")
+        except (OSError, zlib.error):
+            return None
+
+    def lookup(self, url: str) -> Optional[dict]:
+        """
+        The cached page for `url` with its `text`, validators and state: "fresh",
+        "stale" (serve it and revalidate) or "expired" (revalidate before using it).
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT html_hash, text_hash, etag, last_modified, fetched_at, "
+                "fresh_until FROM pages WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            html_hash, text_hash, etag, last_modified, fetched_at, fresh_until = row
+            text = self._read_blob(text_hash)
+            if text is None:
+                self._delete_page(url)
+                self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute(
+                "UPDATE pages SET last_access = ? WHERE url = ?", (now, url)
+            )
+            self._db.commit()
+
+            if now < fresh_until:
+                state = "fresh"
+                self.fresh_hits += 1
+            elif now < fresh_until + self.stale:
+                state = "stale"
+                self.stale_hits += 1
+            else:
+                state = "expired"
+                self.misses += 1
+        return {
+            "url": url,
+            "text": text,
+            "html_hash": html_hash,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": fetched_at,
+            "state": state,
+        }
+
+    def html(self, entry: dict) -> Optional[str]:
+        return self._read_blob(entry["html_hash"])
+
+    @staticmethod
+    def validators(entry: Optional[dict]) -> dict:
+        """Conditional request headers for a cached entry."""
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(
+        self,
+        url: str,
+        html: str,
+        text: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        now = time.time()
+        with self._lock:
+            replaced = self._db.execute(
+                "SELECT html_hash, text_hash FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            html_hash = self._write_blob(html.encode("utf-8"))
+            text_hash = self._write_blob(text.encode("utf-8"))
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    html_hash,
+                    text_hash,
+                    etag,
+                    last_modified,
+                    now,
+                    now + self.ttl_for(url),
+                    now,
+                ),
+            )
+            if replaced is not None:
+                self._release(*replaced)
+            self._db.commit()
+            if (
+                self._bytes > self.max_bytes
+                or now - self._last_sweep >= self.sweep_interval
+            ):
+                self._evict(now)
+
+    def revalidated(
+        self,
+        url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """The origin answered 304 Not Modified: the page is fresh again."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE pages SET fetched_at = ?, fresh_until = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) "
+                "WHERE url = ?",
+                (now, now + self.ttl_for(url), etag, last_modified, url),
+            )
+            self._db.commit()
+            self.revalidations += 1
+
+    def _drop_orphan_blobs(self) -> None:
+        orphans = self._db.execute(
+            "SELECT hash FROM blobs WHERE hash NOT IN "
+            "(SELECT html_hash FROM pages UNION SELECT text_hash FROM pages)"
+        ).fetchall()
+        for (digest,) in orphans:
+            self._remove_blob(digest)
+
+    def _evict(self, now: float, sweep: bool = False) -> None:
+        removed = 0
+        if sweep or now - self._last_sweep >= self.sweep_interval:
+            expired = self._db.execute(
+                "SELECT url FROM pages WHERE fresh_until + ? <= ?", (self.stale, now)
+            ).fetchall()
+            for (url,) in expired:
+                self._delete_page(url)
+            removed += len(expired)
+            self._last_sweep = now
+        while self._bytes > self.max_bytes:
+            row = self._db.execute(
+                "SELECT url FROM pages ORDER BY last_access LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._delete_page(row[0])
+            removed += 1
+        self._db.commit()
+        self.evictions += removed
+
+    def evict(self) -> None:
+        with self._lock:
+            self._evict(time.time(), sweep=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM pages")
+            self._drop_orphan_blobs()
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pages = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            blobs = self._db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+            size = self._bytes
+        lookups = self.fresh_hits + self.stale_hits + self.misses
+        return {
+            "pages": pages,
+            "blobs": blobs,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "fresh_hits": self.fresh_hits,
+            "stale_hits": self.stale_hits,
+            "revalidations": self.revalidations,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.fresh_hits + self.stale_hits) / lookups
+            if lookups
+            else 0.0,
+        }
+
+
+@cache
+def get_page_cache() -> PageCache:
+    return PageCache()
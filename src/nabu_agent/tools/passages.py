@@ -0,0 +1,156 @@
+import logging
+import os
+import re
+
+import numpy as np
+from dotenv import load_dotenv
+
+from ..tools.intent import normalize
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Tokens of page text given to the knowledge agent for one search, across all sources
+SEARCH_CONTEXT_TOKENS = int(os.getenv("SEARCH_CONTEXT_TOKENS", "700"))
+# Paragraphs longer than this are split into groups of sentences
+PASSAGE_MAX_TOKENS = int(os.getenv("PASSAGE_MAX_TOKENS", "90"))
+PASSAGE_MIN_TOKENS = 12
+CHARS_PER_TOKEN = 4
+
+STOPWORDS = frozenset(
+    "a an and are as at be by de del did do does el en es for from has have how i in "
+    "is it its la las los of on or que the their there this to um was what when where "
+    "which who why will with y".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count, about four characters per token."""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def terms(text: str) -> list[str]:
+    return [w for w in normalize(text).split() if w not in STOPWORDS]
+
+
+def _sentences(paragraph: str, max_tokens: int) -> list[str]:
+    max_chars = (max_tokens + 1) * CHARS_PER_TOKEN - 1
+    sentences = []
+    for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+        if len(sentence) <= max_chars:
+            if sentence:
+                sentences.append(sentence)
+            continue
+        # Run-on text without punctuation is cut between words, in one pass
+        words = sentence.split()
+        start, length = 0, len(words[0])
+        for i in range(1, len(words)):
+            if length + 1 + len(words[i]) > max_chars:
+                sentences.append(" ".join(words[start:i]))
+                start, length = i, len(words[i])
+            else:
+                length += 1 + len(words[i])
+        sentences.append(" ".join(words[start:]))
+    return sentences
+
+
+def split_passages(
+    text: str,
+    max_tokens: int = PASSAGE_MAX_TOKENS,
+    min_tokens: int = PASSAGE_MIN_TOKENS,
+) -> list[str]:
+    """
+    Paragraphs of extracted page text, with long paragraphs cut between sentences
+    and short lines (headings, captions) merged into the paragraph that follows.
+    """
+    passages = []
+    pending = ""
+    for paragraph in text.splitlines():
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        paragraph = f"{pending} {paragraph}".strip() if pending else paragraph
+        pending = ""
+        if estimate_tokens(paragraph) < min_tokens:
+            pending = paragraph
+            continue
+
+        chunk = ""
+        for sentence in _sentences(paragraph, max_tokens):
+            if chunk and estimate_tokens(f"{chunk} {sentence}") > max_tokens:
+                passages.append(chunk)
+                chunk = sentence
+            else:
+                chunk = f"{chunk} {sentence}".strip()
+        if chunk:
+            passages.append(chunk)
+    if pending:
+        passages.append(pending)
+    return passages
+
+
+def bm25_scores(
+    query: str, passages: list[str], k1: float = 1.5, b: float = 0.75
+) -> np.ndarray:
+    """BM25 score of every passage for `query`, from a passages x query terms matrix."""
+    query_terms = list(dict.fromkeys(terms(query)))
+    if not passages or not query_terms:
+        return np.zeros(len(passages))
+
+    column = {t: i for i, t in enumerate(query_terms)}
+    tf = np.zeros((len(passages), len(query_terms)))
+    lengths = np.zeros(len(passages))
+    for row, passage in enumerate(passages):
+        words = terms(passage)
+        lengths[row] = len(words)
+        for word in words:
+            if word in column:
+                tf[row, column[word]] += 1
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(passages) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0))
+    return (tf * (k1 + 1) / (tf + norm[:, None])) @ idf
+
+
+def select_passages(
+    query: str,
+    pages: list[tuple[str, str]],
+    token_budget: int = SEARCH_CONTEXT_TOKENS,
+) -> list[tuple[str, list[str]]]:
+    """
+    The passages of `pages` (url, text) most relevant to `query` that fit in
+    `token_budget`, ranked with BM25 over all pages together. Each source keeps its
+    passages in page order; pages with nothing relevant are left out. When no
+    passage matches the query at all, the beginning of each page is used instead.
+    """
+    chunks = [
+        (source, position, passage)
+        for source, (_, text) in enumerate(pages)
+        for position, passage in enumerate(split_passages(text))
+    ]
+    scores = bm25_scores(query, [passage for _, _, passage in chunks])
+    if scores.size and scores.max() > 0:
+        order = np.argsort(-scores, kind="stable")
+        order = order[scores[order] > 0]
+    else:
+        # Page order, interleaving sources
+        order = sorted(range(len(chunks)), key=lambda i: (chunks[i][1], chunks[i][0]))
+
+    chosen = []
+    used = 0
+    for i in order:
+        cost = estimate_tokens(chunks[i][2])
+        if used + cost > token_budget:
+            continue
+        chosen.append(i)
+        used += cost
+
+    selected = []
+    for source, (url, _) in enumerate(pages):
+        passages = [chunks[i][2] for i in sorted(chosen) if chunks[i][0] == source]
+        if passages:
+            selected.append((url, passages))
+    logger.debug(f"Selected {len(chosen)}/{len(chunks)} passages, ~{used} tokens")
+    return selected
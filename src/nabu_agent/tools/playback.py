@@ -0,0 +1,78 @@
+import re
+from typing import Optional
+
+from ..tools.intent import normalize
+
+# Closed set of playback controls, in English and in the Catalan/Spanish of the
+# transcription. Phrases are matched against the whole normalized command (lower
+# case, no accents or punctuation) once polite prefixes and suffixes are removed.
+PLAYBACK_PHRASES = {
+    "pause": [
+        r"pause( (the )?(music|song|track|playback|spotify))?",
+        r"stop( (the )?(music|song|track|playback|spotify))?",
+        r"(posa |pon )?pausa( (a )?(la musica|la canco|la cancion|spotify))?",
+        r"(atura|para|deten|detingues)( (la musica|la canco|la cancion|spotify))?",
+    ],
+    "next": [
+        r"(play |put on |go to |skip to )?(the )?next( (song|track|one))?",
+        r"skip( (this|the) (song|track))?",
+        r"(posa |passa a |salta a )?(la )?seguent( canco)?",
+        r"(pon |pasa a |salta a )?(la )?siguiente( cancion)?",
+        r"salta( (aquesta|la) canco| (esta|la) cancion)?",
+        r"(canvia de canco|cambia de cancion)",
+    ],
+    "previous": [
+        r"(play |put on |go (back )?to )?(the )?previous( (song|track|one))?",
+        r"go back( (a|one) (song|track))?",
+        r"(posa |torna a )?(la )?(canco )?anterior( canco)?",
+        r"(pon |vuelve a )?(la )?(cancion )?anterior( cancion)?",
+        r"torna enrere",
+    ],
+    "volume_up": [
+        r"(turn|put|crank) (it|the (volume|music|sound)) up",
+        r"(turn|put) up the (volume|music|sound)",
+        r"(volume up|louder|(increase|raise) the volume)",
+        r"(a)?puja( ho| el volum| la musica| el so)?",
+        r"mes (alt|fort)",
+        r"sube(lo| el volumen| la musica)",
+        r"mas (alto|fuerte)",
+    ],
+    "volume_down": [
+        r"(turn|put) (it|the (volume|music|sound)) down",
+        r"(turn|put) down the (volume|music|sound)",
+        r"(volume down|quieter|(decrease|lower) the volume)",
+        r"(a)?baixa( ho| el volum| la musica| el so)?",
+        r"mes baix(et)?",
+        r"baja(lo| el volumen| la musica)",
+        r"mas bajo",
+    ],
+}
+
+_PREFIX = (
+    r"(?:(?:hey |ok |oye |escolta )?nabu |please |(?:can|could) you |"
+    r"(?:pots|podries|puedes|podrias) |si us plau |por favor )*"
+)
+_SUFFIX = (
+    r"(?: please| si us plau| por favor| (?:on|a|en) spotify| nabu|"
+    r" (?:a (?:little|bit)|una mica|un poco)(?: more| mes| mas)?)*"
+)
+
+PLAYBACK_COMMANDS = {
+    control: re.compile(rf"^{_PREFIX}(?:{'|'.join(phrases)}){_SUFFIX}$")
+    for control, phrases in PLAYBACK_PHRASES.items()
+}
+
+
+def match_playback_command(*texts: Optional[str]) -> Optional[str]:
+    """
+    The playback control ("pause", "next", "previous", "volume_up", "volume_down")
+    that one of `texts` asks for as a whole, or None.
+    """
+    for text in texts:
+        if not text:
+            continue
+        text = normalize(text)
+        for control, pattern in PLAYBACK_COMMANDS.items():
+            if pattern.match(text):
+                return control
+    return None
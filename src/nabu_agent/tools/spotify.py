@@ -1,13 +1,18 @@
 import logging
 import os
 import subprocess
+import threading
+import time
 from typing import Optional
 
 import spotipy
 from dotenv import load_dotenv
 from langchain.tools import tool
+from spotipy.cache_handler import CacheFileHandler
+from spotipy.exceptions import SpotifyException
 from spotipy.oauth2 import SpotifyOAuth
 
+from ..tools.music_index import get_music_index
 from ..utils.schemas import SpotifyType
 
 load_dotenv()
@@ -28,27 +33,224 @@ scope = [
 
 
 DEVICE_ID = os.getenv("SPOTIFY_DEVICE_ID")
+SPOTIFY_TIMEOUT = float(os.getenv("SPOTIFY_TIMEOUT", "5"))
+# Seconds the device list (presence and volume) is trusted before asking again
+SPOTIFY_DEVICE_TTL = float(os.getenv("SPOTIFY_DEVICE_TTL", "30"))
+# The access token is refreshed in the background this many seconds before it expires
+SPOTIFY_TOKEN_REFRESH_MARGIN = float(os.getenv("SPOTIFY_TOKEN_REFRESH_MARGIN", "300"))
+# Command that makes the librespot device show up in Spotify Connect
+SPOTIFY_CONNECT_COMMAND = os.getenv(
+    "SPOTIFY_CONNECT_COMMAND", "./spotify-connect 192.168.0.13 5577"
+).split()
+# How long a command waits for a background activation before retrying
+SPOTIFY_ACTIVATION_WAIT = float(os.getenv("SPOTIFY_ACTIVATION_WAIT", "10"))
 
 
-def init_spotify() -> spotipy.Spotify:
-    spotify_client = spotipy.Spotify(
-        auth_manager=SpotifyOAuth(scope=scope, cache_path=".cache")
-    )
-    device_active = False
-    for device in spotify_client.devices()["devices"]:
-        if device["id"] == DEVICE_ID:
-            device_active = True
-            logger.info("librespot device already active")
-            break
-    if not device_active:
-        logger.info("enabling librespot device")
-        subprocess.run(["./spotify-connect", "192.168.0.13", "5577"])
+class MemoryCacheFileHandler(CacheFileHandler):
+    """Token cache file read once and then kept in memory."""
+
+    def __init__(self, cache_path: str = ".cache"):
+        super().__init__(cache_path=cache_path)
+        self._token_info = super().get_cached_token()
+
+    def get_cached_token(self):
+        return self._token_info
+
+    def save_token_to_cache(self, token_info):
+        self._token_info = token_info
+        super().save_token_to_cache(token_info)
+
+
+class SpotifySession:
+    """
+    Long-lived Spotify client for the librespot device.
+
+    The client keeps one pooled `requests` session, the OAuth token lives in memory
+    and is refreshed by a timer before it expires, and the device list is cached for
+    `device_ttl` seconds. When the device is missing it is activated in a background
+    thread; a command that fails because of that waits for the activation and is
+    retried once.
+    """
 
-    return spotify_client
+    def __init__(
+        self,
+        device_id: Optional[str] = DEVICE_ID,
+        device_ttl: float = SPOTIFY_DEVICE_TTL,
+        refresh_margin: float = SPOTIFY_TOKEN_REFRESH_MARGIN,
+        client: Optional[spotipy.Spotify] = None,
+    ):
+        self.device_id = device_id
+        self.device_ttl = device_ttl
+        self.refresh_margin = refresh_margin
+        if client is None:
+            self.auth_manager = SpotifyOAuth(
+                scope=scope,
+                cache_handler=MemoryCacheFileHandler(".cache"),
+                requests_timeout=SPOTIFY_TIMEOUT,
+            )
+            client = spotipy.Spotify(
+                auth_manager=self.auth_manager, requests_timeout=SPOTIFY_TIMEOUT
+            )
+        else:
+            self.auth_manager = None
+        self.client = client
+
+        self._lock = threading.Lock()
+        self._device: Optional[dict] = None
+        self._device_checked_at = 0.0
+        self._refreshing_devices = False
+        self._activation: Optional[threading.Thread] = None
+        self._refresh_timer: Optional[threading.Timer] = None
+
+        self.api_calls = 0
+        self.activations = 0
+        self.token_refreshes = 0
+
+    # Token
+
+    def start_token_refresh(self) -> None:
+        if self.auth_manager is None:
+            return
+        token_info = self.auth_manager.cache_handler.get_cached_token()
+        if not token_info:
+            logger.warning("No Spotify token cached, run the OAuth flow first")
+            return
+        delay = token_info["expires_at"] - time.time() - self.refresh_margin
+        self._refresh_timer = threading.Timer(max(delay, 0), self._refresh_token)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _refresh_token(self) -> None:
+        try:
+            token_info = self.auth_manager.cache_handler.get_cached_token()
+            self.auth_manager.refresh_access_token(token_info["refresh_token"])
+            self.token_refreshes += 1
+            logger.info("Spotify access token refreshed")
+        except Exception as e:
+            logger.warning(f"Spotify token refresh failed: {e}")
+            time.sleep(30)
+        self.start_token_refresh()
+
+    # Device presence
+
+    def _call(self, method: str, *args, **kwargs):
+        self.api_calls += 1
+        return getattr(self.client, method)(*args, **kwargs)
+
+    def refresh_device(self) -> Optional[dict]:
+        devices = self._call("devices")["devices"]
+        device = next((d for d in devices if d["id"] == self.device_id), None)
+        with self._lock:
+            self._device = device
+            self._device_checked_at = time.monotonic()
+        return device
+
+    def _device_is_fresh(self) -> bool:
+        return time.monotonic() - self._device_checked_at < self.device_ttl
+
+    def device(self) -> Optional[dict]:
+        """The cached device entry (with `volume_percent`), refreshed when stale."""
+        with self._lock:
+            if self._device_is_fresh():
+                return self._device
+        return self.refresh_device()
+
+    def ensure_device(self) -> None:
+        """Check the device and activate it in the background, without blocking."""
+        with self._lock:
+            fresh = self._device_is_fresh()
+            missing = fresh and self._device is None
+            check = not fresh and not self._refreshing_devices
+            if check:
+                self._refreshing_devices = True
+        if check:
+            threading.Thread(target=self._check_device, daemon=True).start()
+        elif missing:
+            self.activate_device()
+
+    def _check_device(self) -> None:
+        try:
+            if self.refresh_device() is None:
+                self.activate_device()
+            else:
+                logger.info("librespot device already active")
+        except Exception as e:
+            logger.warning(f"Could not list Spotify devices: {e}")
+        finally:
+            self._refreshing_devices = False
+
+    def activate_device(self) -> threading.Thread:
+        with self._lock:
+            if self._activation is None or not self._activation.is_alive():
+                self._activation = threading.Thread(
+                    target=self._activate, daemon=True
+                )
+                self._activation.start()
+            return self._activation
+
+    def _activate(self) -> None:
+        logger.info("enabling librespot device")
+        self.activations += 1
+        try:
+            subprocess.run(SPOTIFY_CONNECT_COMMAND, timeout=SPOTIFY_ACTIVATION_WAIT)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Could not activate the librespot device: {e}")
+        with self._lock:
+            self._device_checked_at = 0.0
+
+    # Commands
+
+    def command(self, method: str, *args, **kwargs):
+        """One API call on the device, retried once after activating the device."""
+        try:
+            return self._call(method, *args, device_id=self.device_id, **kwargs)
+        except SpotifyException as e:
+            if e.http_status != 404:
+                raise
+            logger.info(f"Spotify device not found for {method}, activating it")
+            self.activate_device().join(SPOTIFY_ACTIVATION_WAIT)
+            return self._call(method, *args, device_id=self.device_id, **kwargs)
+
+    def change_volume(self, delta: int) -> Optional[int]:
+        device = self.device()
+        if device is None or device.get("volume_percent") is None:
+            return None
+        volume = max(0, min(device["volume_percent"] + delta, 100))
+        self.command("volume", volume)
+        with self._lock:
+            if self._device is device:
+                device["volume_percent"] = volume
+        return volume
+
+    def stats(self) -> dict:
+        return {
+            "device_active": self._device is not None,
+            "device_checked_seconds_ago": time.monotonic() - self._device_checked_at
+            if self._device_checked_at
+            else None,
+            "api_calls": self.api_calls,
+            "activations": self.activations,
+            "token_refreshes": self.token_refreshes,
+        }
+
+
+_session: Optional[SpotifySession] = None
+_session_lock = threading.Lock()
+
+
+def get_spotify_session() -> SpotifySession:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = SpotifySession()
+            _session.start_token_refresh()
+            _session.ensure_device()
+            get_music_index().refresh_in_background(_session.client)
+        return _session
 
 
 def play_music(
-    spotify_client: spotipy.Spotify,
+    session: SpotifySession,
     context_uri: Optional[str] = None,
     uris: Optional[str] = None,
 ) -> None:
@@ -57,40 +259,43 @@ def play_music(
 
     logger.info(f"context uri: {context_uri} - uris {uris}")
     try:
+        session.command("add_to_queue", context_uri or uris)
+        session.command("next_track")
+    except SpotifyException as e:
+        # Nothing is playing on the device, or a context that cannot be queued
+        logger.info(f"Could not queue {context_uri or uris}, starting playback: {e}")
         if context_uri:
-            spotify_client.add_to_queue(device_id=DEVICE_ID, uri=context_uri)
-            spotify_client.next_track(device_id=DEVICE_ID)
-
-        else:
-            spotify_client.add_to_queue(device_id=DEVICE_ID, uri=uris)
-            spotify_client.next_track(device_id=DEVICE_ID)
-
-    except:
-        if context_uri:
-            spotify_client.start_playback(device_id=DEVICE_ID, context_uri=context_uri)
+            session.command("start_playback", context_uri=context_uri)
         else:
-            spotify_client.start_playback(device_id=DEVICE_ID, uris=[uris])
+            session.command("start_playback", uris=[uris])
 
 
 def search_music(
     spotify_client: spotipy.Spotify, criteria_type: SpotifyType, query: str
 ):
     logging.info("--- Searching music ---")
+    music_index = get_music_index()
+    music_index.refresh_in_background(spotify_client)
+    result_id = music_index.resolve(query, criteria_type)
+    if result_id:
+        return result_id
 
+    requested_type, requested_query = criteria_type, query
     if criteria_type == SpotifyType.RADIO:
-        criteria_type = SpotifyType.PLAYLIST
-        query = "this%20is%20" + query
+        criteria_type = SpotifyType.PLAYLIST.value
+        query = "this is " + query
     else:
         criteria_type = criteria_type.value
 
-    print(f"______________ {criteria_type} ____ {query}")
+    logger.info(f"Searching Spotify for {criteria_type}: {query}")
     try:
         result = spotify_client.search(q=query, type=[criteria_type], limit=2)
         result_id = result[criteria_type + "s"]["items"][0]["uri"]
-    except:
+    except (SpotifyException, KeyError, IndexError, TypeError):
         result = spotify_client.search(q=query, type=["track"], limit=2)
         result_id = result["tracks"]["items"][0]["uri"]
 
+    music_index.remember(requested_query, requested_type, result_id)
     return result_id
 
 
@@ -106,11 +311,12 @@ def pause_music():
     """
     logging.info("--- Pausing Music ---")
     try:
-        spotify_client = init_spotify()
-        playback = spotify_client.current_playback()
-        if playback and playback["device"] == DEVICE_ID:
-            spotify_client.pause_playback(device_id=DEVICE_ID)
+        get_spotify_session().command("pause_playback")
         return "Done"
+    except SpotifyException as e:
+        if e.http_status == 403:  # nothing is playing
+            return "Done"
+        return f"{e}"
     except Exception as e:
         return f"{e}"
 
@@ -127,8 +333,7 @@ def next_song():
     """
     logging.info("--- Next Song ---")
     try:
-        spotify_client = init_spotify()
-        spotify_client.next_track(device_id=DEVICE_ID)
+        get_spotify_session().command("next_track")
         return "Done"
     except Exception as e:
         return f"{e}"
@@ -146,8 +351,7 @@ def previous_song():
     """
     logging.info("--- Previous Song ---")
     try:
-        spotify_client = init_spotify()
-        spotify_client.previous_track(device_id=DEVICE_ID)
+        get_spotify_session().command("previous_track")
         return "Done"
     except Exception as e:
         return f"{e}"
@@ -167,12 +371,8 @@ def volume_up():
     """
     logging.info("--- Volume up ---")
     try:
-        spotify_client = init_spotify()
-        playback = spotify_client.current_playback()
-        if playback and playback["device"]:
-            current_volume = playback["device"]["volume_percent"]
-            new_volume = min(current_volume + 10, 100)
-            spotify_client.volume(new_volume, device_id=DEVICE_ID)
+        new_volume = get_spotify_session().change_volume(+10)
+        if new_volume is not None:
             logger.info(f"Volume increased to {new_volume}%")
         else:
             logger.warning("No active playback device found.")
@@ -195,12 +395,8 @@ def volume_down():
     """
     logging.info("--- Volume down ---")
     try:
-        spotify_client = init_spotify()
-        playback = spotify_client.current_playback()
-        if playback and playback["device"]:
-            current_volume = playback["device"]["volume_percent"]
-            new_volume = max(current_volume - 10, 0)
-            spotify_client.volume(new_volume, device_id=DEVICE_ID)
+        new_volume = get_spotify_session().change_volume(-10)
+        if new_volume is not None:
             logger.info(f"Volume decreased to {new_volume}%")
         else:
             logger.warning("No active playback device found.")
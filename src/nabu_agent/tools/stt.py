@@ -0,0 +1,360 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from io import BytesIO
+from typing import AsyncIterator, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from faster_whisper import WhisperModel, decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "auto" lets Whisper detect the language
+STT_LANGUAGE = os.getenv("FASTER_WHISPER_LANGUAGE", "ca")
+if STT_LANGUAGE == "auto":
+    STT_LANGUAGE = None
+# transcribe: original text only, the Translator node translates it
+# translate: english only, straight from Whisper
+# both: original text and Whisper's english translation
+STT_TASK = os.getenv("FASTER_WHISPER_TASK", "transcribe")
+STT_TASKS = ("transcribe", "translate", "both")
+# Silero VAD and the Whisper feature extractor both work on 16 kHz audio
+WHISPER_SAMPLE_RATE = 16000
+# Sample rates accepted from streaming clients, resampled to WHISPER_SAMPLE_RATE
+MIN_STREAM_SAMPLE_RATE = 8000
+MAX_STREAM_SAMPLE_RATE = 48000
+
+
+class STTEngine:
+    """
+    Process-wide Faster Whisper engine.
+
+    The model is loaded once (lazily, or eagerly through `load()`) and shared by every
+    caller. CTranslate2 can serve `num_workers` transcriptions in parallel on the same
+    model, so concurrent callers are gated by a semaphore of that size.
+    """
+
+    def __init__(
+        self,
+        model_size: str,
+        device: str = "cpu",
+        compute_type: str = "int8",
+        cpu_threads: int = 0,
+        num_workers: int = 1,
+    ):
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.num_workers = max(num_workers, 1)
+
+        self._model: Optional[WhisperModel] = None
+        self._load_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.num_workers)
+        self._stats_lock = threading.Lock()
+
+        self.load_seconds: Optional[float] = None
+        self.last_transcribe_seconds: Optional[float] = None
+        self.total_transcribe_seconds = 0.0
+        self.transcriptions = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self) -> WhisperModel:
+        if self._model is not None:
+            return self._model
+        with self._load_lock:
+            if self._model is None:
+                start = time.perf_counter()
+                self._model = WhisperModel(
+                    self.model_size,
+                    device=self.device,
+                    compute_type=self.compute_type,
+                    cpu_threads=self.cpu_threads,
+                    num_workers=self.num_workers,
+                )
+                self.load_seconds = time.perf_counter() - start
+                logger.info(
+                    f"Whisper model '{self.model_size}' loaded on {self.device} "
+                    f"({self.compute_type}) in {self.load_seconds:.2f}s"
+                )
+        return self._model
+
+    def decode(self, audio: bytes) -> np.ndarray:
+        """Decode and resample once so several passes can share the same audio."""
+        sampling_rate = self.load().feature_extractor.sampling_rate
+        return decode_audio(BytesIO(audio), sampling_rate=sampling_rate)
+
+    def transcribe(self, audio, **kwargs):
+        """
+        Transcribe `audio` (raw file bytes, a file-like object or a float32 numpy array).
+
+        Segments are consumed inside the worker slot, so the returned list is already
+        fully decoded and the timing covers the whole transcription.
+        """
+        model = self.load()
+        if isinstance(audio, (bytes, bytearray)):
+            audio = BytesIO(audio)
+        with self._slots:
+            start = time.perf_counter()
+            segments, info = model.transcribe(audio, **kwargs)
+            segments = list(segments)
+            elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.last_transcribe_seconds = elapsed
+            self.total_transcribe_seconds += elapsed
+            self.transcriptions += 1
+        logger.info(f"Transcription took {elapsed:.2f}s")
+        return segments, info
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "model_size": self.model_size,
+                "device": self.device,
+                "compute_type": self.compute_type,
+                "cpu_threads": self.cpu_threads,
+                "num_workers": self.num_workers,
+                "loaded": self.loaded,
+                "load_seconds": self.load_seconds,
+                "last_transcribe_seconds": self.last_transcribe_seconds,
+                "total_transcribe_seconds": self.total_transcribe_seconds,
+                "transcriptions": self.transcriptions,
+            }
+
+
+_engine: Optional[STTEngine] = None
+_engine_lock = threading.Lock()
+
+
+def engine_from_env() -> STTEngine:
+    use_cuda = os.getenv("FASTER_WHISPER_USE_CUDA") == "true"
+    device = os.getenv("FASTER_WHISPER_DEVICE", "cuda" if use_cuda else "cpu")
+    compute_type = os.getenv(
+        "FASTER_WHISPER_COMPUTE_TYPE", "float16" if device == "cuda" else "int8"
+    )
+    return STTEngine(
+        model_size=os.getenv("FASTER_WHISPER_MODEL", "small"),
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=int(os.getenv("FASTER_WHISPER_CPU_THREADS", "0")),
+        num_workers=int(os.getenv("FASTER_WHISPER_NUM_WORKERS", "1")),
+    )
+
+
+def get_stt_engine() -> STTEngine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = engine_from_env()
+    return _engine
+
+
+def transcribe_passes(
+    engine: STTEngine,
+    audio: np.ndarray,
+    keep_original: bool,
+    language: Optional[str] = STT_LANGUAGE,
+    **kwargs,
+):
+    """
+    Whisper's english translation of `audio`, preceded by a plain transcription of
+    the same audio with `keep_original` (whose detected language the translation then
+    uses). Returns (original_text, english_text, info, timings).
+    """
+    timings = {}
+    original_text = None
+    if keep_original:
+        start = time.perf_counter()
+        segments, info = engine.transcribe(audio, language=language, **kwargs)
+        timings["transcribe"] = time.perf_counter() - start
+        original_text = "".join(s.text for s in segments)
+        language = info.language
+
+    start = time.perf_counter()
+    segments, info = engine.transcribe(
+        audio, language=language, task="translate", **kwargs
+    )
+    timings["translate"] = time.perf_counter() - start
+    english_text = "".join(s.text for s in segments)
+    return original_text, english_text, info, timings
+
+
+class StreamResampler:
+    """
+    Linear-interpolation resampler for audio that arrives in chunks: the position of
+    the next output sample and the last input sample are carried over, so chunk
+    boundaries do not add clicks or drift.
+    """
+
+    def __init__(self, source_rate: int, target_rate: int = WHISPER_SAMPLE_RATE):
+        self.step = source_rate / target_rate
+        self.position = 0.0  # of the next output sample, relative to `self.tail`
+        self.tail = np.zeros(0, dtype=np.float32)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.step == 1:
+            return samples
+        data = np.concatenate([self.tail, samples])
+        if len(data) < 2:
+            self.tail = data
+            return np.zeros(0, dtype=np.float32)
+        count = max(0, int(np.ceil((len(data) - 1 - self.position) / self.step)))
+        positions = self.position + np.arange(count) * self.step
+        resampled = np.interp(positions, np.arange(len(data)), data)
+        self.position += count * self.step - (len(data) - 1)
+        self.tail = data[-1:]
+        return resampled.astype(np.float32)
+
+
+class StreamingTranscriber:
+    """
+    Incremental transcription over a stream of raw audio chunks.
+
+    Chunks are 16-bit little-endian mono PCM (the Wyoming protocol default) at
+    `sample_rate`, resampled to 16 kHz as they arrive. Voice activity detection runs
+    on the incoming audio every `vad_step_ms`; every speech segment that is closed
+    by `segment_silence_ms` of silence is transcribed right away on the shared
+    engine while the user keeps talking. Once `end_of_speech_ms` of trailing silence
+    is observed the stream is no longer consumed and only the last open segment is
+    left to decode.
+
+    With `task` "translate" or "both" every segment goes through `transcribe_passes`
+    like the batch path: `english_text` holds Whisper's english, `original_text` the
+    transcription ("both" only) and `timings` the time spent in each pass.
+    """
+
+    def __init__(
+        self,
+        engine: STTEngine,
+        sample_rate: int = 16000,
+        vad_step_ms: int = 300,
+        segment_silence_ms: int = 300,
+        end_of_speech_ms: int = 700,
+        max_seconds: float = 30.0,
+        task: str = "transcribe",
+        **transcribe_kwargs,
+    ):
+        if not MIN_STREAM_SAMPLE_RATE <= sample_rate <= MAX_STREAM_SAMPLE_RATE:
+            raise ValueError(f"Unsupported sample rate {sample_rate}")
+        if task not in STT_TASKS:
+            raise ValueError(f"Unsupported task {task}")
+        self.engine = engine
+        self.task = task
+        self.input_rate = sample_rate
+        # Everything past the resampler, including the buffers, is at 16 kHz
+        self.sample_rate = sample_rate = WHISPER_SAMPLE_RATE
+        self.vad_step = sample_rate * vad_step_ms // 1000
+        self.segment_silence = sample_rate * segment_silence_ms // 1000
+        self.end_of_speech = sample_rate * end_of_speech_ms // 1000
+        self.max_samples = int(sample_rate * max_seconds)
+        self.vad_options = VadOptions(min_silence_duration_ms=segment_silence_ms)
+        self.transcribe_kwargs = {"vad_filter": False, **transcribe_kwargs}
+
+        self.finalize_seconds: Optional[float] = None
+        self.original_text: Optional[str] = None
+        self.english_text: Optional[str] = None
+        self.timings: dict[str, float] = {}
+
+    def _speech(self, audio: np.ndarray) -> list[dict]:
+        return get_speech_timestamps(
+            audio, vad_options=self.vad_options, sampling_rate=self.sample_rate
+        )
+
+    def _transcribe_segment(self, audio: np.ndarray):
+        """(original_text, english_text, info, timings) of one segment."""
+        if self.task == "transcribe":
+            start = time.perf_counter()
+            segments, info = self.engine.transcribe(audio, **self.transcribe_kwargs)
+            text = "".join(segment.text for segment in segments)
+            return text, None, info, {"transcribe": time.perf_counter() - start}
+        return transcribe_passes(
+            self.engine,
+            audio,
+            keep_original=self.task == "both",
+            **self.transcribe_kwargs,
+        )
+
+    def _submit(self, audio: np.ndarray) -> asyncio.Task:
+        return asyncio.create_task(asyncio.to_thread(self._transcribe_segment, audio))
+
+    async def transcribe(self, chunks: AsyncIterator[bytes]):
+        """
+        Consume `chunks` until end of speech and return (text, info): the original
+        transcription, or Whisper's english with the "translate" task.
+        """
+        buffer = np.zeros(0, dtype=np.float32)
+        leftover = b""
+        committed = 0  # samples already handed to the engine
+        last_vad = 0
+        heard_speech = False
+        tasks: list[asyncio.Task] = []
+        resampler = StreamResampler(self.input_rate, self.sample_rate)
+
+        async for chunk in chunks:
+            data = leftover + chunk
+            usable = len(data) - len(data) % 2
+            leftover = data[usable:]
+            samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32)
+            buffer = np.concatenate([buffer, resampler.process(samples / 32768.0)])
+
+            if len(buffer) >= self.max_samples:
+                logger.info("Streaming STT reached the maximum utterance length")
+                break
+            if len(buffer) - last_vad < self.vad_step:
+                continue
+            last_vad = len(buffer)
+
+            pending = buffer[committed:]
+            speech = await asyncio.to_thread(self._speech, pending)
+            if not speech:
+                if heard_speech and len(pending) >= self.end_of_speech:
+                    break
+                continue
+            heard_speech = True
+
+            trailing_silence = len(pending) - speech[-1]["end"]
+            if trailing_silence >= self.end_of_speech:
+                break
+            # The last segment may still be growing unless enough silence follows it
+            closed = speech if trailing_silence >= self.segment_silence else speech[:-1]
+            for segment in closed:
+                tasks.append(
+                    self._submit(pending[segment["start"] : segment["end"]].copy())
+                )
+            if closed:
+                committed += closed[-1]["end"]
+
+        end_of_speech = time.perf_counter()
+        rest = buffer[committed:]
+        if len(rest) and (not tasks or await asyncio.to_thread(self._speech, rest)):
+            tasks.append(self._submit(rest.copy()))
+        if not tasks:
+            return "", None
+
+        results = await asyncio.gather(*tasks)
+        self.finalize_seconds = time.perf_counter() - end_of_speech
+        logger.info(
+            f"Streaming STT: {len(tasks)} segment(s), "
+            f"{self.finalize_seconds:.2f}s from end of speech to transcript"
+        )
+        if self.task != "translate":
+            self.original_text = "".join(r[0] for r in results).strip()
+        if self.task != "transcribe":
+            self.english_text = "".join(r[1] for r in results).strip()
+        self.timings = {}
+        for *_, timings in results:
+            for task, seconds in timings.items():
+                self.timings[task] = self.timings.get(task, 0.0) + seconds
+        if self.original_text is not None:
+            return self.original_text, results[0][2]
+        return self.english_text, results[0][2]
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+WEB_MAX_CONNECTIONS = int(os.getenv("WEB_MAX_CONNECTIONS", "16"))
+WEB_MAX_PER_HOST = int(os.getenv("WEB_MAX_PER_HOST", "4"))
+WEB_KEEPALIVE_EXPIRY = float(os.getenv("WEB_KEEPALIVE_EXPIRY", "60"))
+# Whole time a web search may take, every request timeout comes out of it
+SEARCH_LATENCY_BUDGET = float(os.getenv("SEARCH_LATENCY_BUDGET", "8"))
+# Domains expected to take longer than this are fetched only after faster ones
+SEARCH_SLOW_DOMAIN_SECONDS = float(os.getenv("SEARCH_SLOW_DOMAIN_SECONDS", "3"))
+# What is known about a domain counts half after this many seconds without news, so
+# a domain ranked last (and so rarely fetched) gets tried early again
+SEARCH_DOMAIN_HALF_LIFE = float(os.getenv("SEARCH_DOMAIN_HALF_LIFE", "900"))
+# HTTP/2 needs `h2`, pinned through the httpx[http2] dependency
+WEB_HTTP2 = os.getenv("WEB_HTTP2", "true") == "true"
+USER_AGENT = os.getenv(
+    "USER_AGENT", "Mozilla/5.0 (X11; Linux x86_64) nabu-agent/0.3 (+voice assistant)"
+)
+
+
+class Deadline:
+    """Remaining share of a latency budget."""
+
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise asyncio.TimeoutError("Latency budget exhausted")
+        return min(remaining, cap) if cap else remaining
+
+
+class WebPool:
+    """Pooled AsyncClient plus global and per-host concurrency limits for one loop."""
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            follow_redirects=True,
+            http2=WEB_HTTP2,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(
+                max_connections=WEB_MAX_CONNECTIONS,
+                max_keepalive_connections=WEB_MAX_CONNECTIONS,
+                keepalive_expiry=WEB_KEEPALIVE_EXPIRY,
+            ),
+        )
+        self.slots = asyncio.Semaphore(WEB_MAX_CONNECTIONS)
+        self.host_slots: dict[str, asyncio.Semaphore] = {}
+
+    def host_slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).hostname or ""
+        if host not in self.host_slots:
+            self.host_slots[host] = asyncio.Semaphore(WEB_MAX_PER_HOST)
+        return self.host_slots[host]
+
+
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, WebPool]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_web_pool() -> WebPool:
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = WebPool()
+    return pool
+
+
+async def fetch(
+    url: str,
+    deadline: Optional[Deadline] = None,
+    params: Optional[dict] = None,
+    headers: Optional[dict] = None,
+) -> httpx.Response:
+    """GET `url` through the shared pool, timing out with the latency budget."""
+    deadline = deadline or Deadline(SEARCH_LATENCY_BUDGET)
+    pool = get_web_pool()
+    async with asyncio.timeout(deadline.timeout()):
+        async with pool.slots, pool.host_slot(url):
+            return await pool.client.get(
+                url,
+                params=params,
+                headers=headers,
+                timeout=deadline.timeout(),
+            )
+
+
+async def searx_search(
+    query: str, num_results: int, deadline: Optional[Deadline] = None
+) -> list[dict]:
+    """Non-blocking SearxNG query through its JSON API."""
+    response = await fetch(
+        f"{os.environ['SEARX_HOST'].rstrip('/')}/search",
+        deadline=deadline,
+        params={"q": query, "format": "json"},
+    )
+    response.raise_for_status()
+    results = response.json().get("results", [])[:num_results]
+    return [
+        {"link": r["url"], "title": r.get("title", ""), "snippet": r.get("content", "")}
+        for r in results
+        if r.get("url")
+    ]
+
+
+class DomainTimings:
+    """
+    Exponentially weighted fetch latency and failure rate per domain.
+
+    A fetch cancelled as a straggler only tells how long the domain took at least,
+    so it can raise the latency estimate but does not count as a failure. Estimates
+    fade towards "unknown" with `half_life`, so demoted domains get retried.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.3,
+        slow_seconds: float = SEARCH_SLOW_DOMAIN_SECONDS,
+        half_life: float = SEARCH_DOMAIN_HALF_LIFE,
+    ):
+        self.alpha = alpha
+        self.slow_seconds = slow_seconds
+        self.half_life = half_life
+        self._domains: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def domain(url: str) -> str:
+        host = (urlsplit(url).hostname or "").lower()
+        return host.removeprefix("www.")
+
+    def _current(self, domain: str, now: float) -> Optional[dict]:
+        """The domain's entry with its estimates decayed to `now`."""
+        entry = self._domains.get(domain)
+        if entry is None:
+            return None
+        weight = 0.5 ** ((now - entry["updated"]) / self.half_life)
+        return {
+            **entry,
+            "latency": entry["latency"] * weight,
+            "failure_rate": entry["failure_rate"] * weight,
+        }
+
+    def record(self, url: str, seconds: float, ok: bool = True) -> None:
+        domain = self.domain(url)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._current(domain, now)
+            if entry is None:
+                self._domains[domain] = {
+                    "latency": seconds,
+                    "failure_rate": 0.0 if ok else 1.0,
+                    "samples": 1,
+                    "updated": now,
+                }
+                return
+            a = self.alpha
+            entry["latency"] = a * seconds + (1 - a) * entry["latency"]
+            entry["failure_rate"] = (
+                a * (0.0 if ok else 1.0) + (1 - a) * entry["failure_rate"]
+            )
+            entry["samples"] += 1
+            entry["updated"] = now
+            self._domains[domain] = entry
+
+    def record_cancelled(self, url: str, seconds: float) -> None:
+        domain = self.domain(url)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._current(domain, now)
+            if entry is None:
+                self._domains[domain] = {
+                    "latency": seconds,
+                    "failure_rate": 0.0,
+                    "samples": 1,
+                    "updated": now,
+                }
+            elif seconds > entry["latency"]:
+                a = self.alpha
+                entry["latency"] = a * seconds + (1 - a) * entry["latency"]
+                entry["samples"] += 1
+                entry["updated"] = now
+                self._domains[domain] = entry
+
+    def is_slow(self, url: str) -> bool:
+        with self._lock:
+            entry = self._current(self.domain(url), time.monotonic())
+        return entry is not None and (
+            entry["latency"] > self.slow_seconds or entry["failure_rate"] > 0.5
+        )
+
+    def rank(self, urls: list[str]) -> list[str]:
+        """Keep the search engine's order, with slow or failing domains moved last."""
+        return sorted(urls, key=self.is_slow)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                d: {k: v for k, v in self._current(d, now).items() if k != "updated"}
+                for d in self._domains
+            }
+
+
+_domain_timings = DomainTimings()
+
+
+def get_domain_timings() -> DomainTimings:
+    return _domain_timings
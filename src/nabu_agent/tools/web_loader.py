@@ -1,20 +1,35 @@
 import asyncio
 import logging
 import os
-from typing import List
+import time
+from typing import Optional
 
 import httpx
-import trafilatura
 from dotenv import load_dotenv
 from langchain.tools import tool
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_community.utilities import SearxSearchWrapper
-from playwright.async_api import async_playwright
+
+from ..tools.browser import get_browser_pool
+from ..tools.extraction import extract
+from ..tools.page_cache import get_page_cache
+from ..tools.passages import select_passages
+from ..tools.web_client import (
+    SEARCH_LATENCY_BUDGET,
+    Deadline,
+    fetch,
+    get_domain_timings,
+    searx_search,
+)
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Results fetched in parallel for each search, and how many pages the answer needs
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "5"))
+SEARCH_MIN_RESULTS = int(os.getenv("SEARCH_MIN_RESULTS", "2"))
+# Extractions shorter than this do not count towards SEARCH_MIN_RESULTS
+SEARCH_MIN_CHARS = int(os.getenv("SEARCH_MIN_CHARS", "300"))
+
 
 # def search_and_fetch(query: str, num_results: int = 3, chunk_size: int = 500) -> str:
 #     # search via SearxNG
@@ -47,40 +62,156 @@ load_dotenv()
 
 
 async def fetch_with_playwright(url: str, timeout: int = 15000) -> str:
-    """Use Playwright to render JS-heavy pages."""
+    """Use Playwright to render JS-heavy pages, on the shared browser pool."""
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-            await page.goto(url, timeout=timeout)
-            html = await page.content()
-            await browser.close()
-            return html
+        return await get_browser_pool().fetch_html(url, timeout=timeout)
     except Exception as e:
         logger.warning(f"Playwright fetch failed for {url}: {e}")
         return ""
 
 
-async def fetch_content(url: str, use_playwright_fallback: bool = True) -> str:
-    """Try fetching with httpx + Trafilatura, fallback to Playwright if needed."""
+def _cacheable(resp) -> bool:
+    return resp.status_code == 200 and "no-store" not in resp.headers.get(
+        "cache-control", ""
+    )
+
+
+async def _download(
+    url: str,
+    entry: Optional[dict],
+    use_playwright_fallback: bool,
+    deadline: Deadline,
+) -> str:
+    """Fetch (conditionally, when `entry` has validators), extract and cache `url`."""
+    page_cache = get_page_cache()
+    timings = get_domain_timings()
+    start = time.monotonic()
     try:
-        async with httpx.AsyncClient(follow_redirects=True, timeout=10.0) as client:
-            resp = await client.get(url)
-            html = resp.text
-            text = trafilatura.extract(
-                html, include_comments=False, include_tables=False
+        resp = await fetch(url, deadline=deadline, headers=page_cache.validators(entry))
+        if resp.status_code == 304 and entry is not None:
+            timings.record(url, time.monotonic() - start)
+            await asyncio.to_thread(
+                page_cache.revalidated,
+                url,
+                resp.headers.get("etag"),
+                resp.headers.get("last-modified"),
+            )
+            return entry["text"]
+
+        html = resp.text
+        text = await extract(html, include_comments=False, include_tables=False)
+        if not text and use_playwright_fallback and not deadline.expired:
+            html = await fetch_with_playwright(
+                url, timeout=int(deadline.timeout() * 1000)
             )
-            if text:
-                return text.strip()
-            elif use_playwright_fallback:
-                html = await fetch_with_playwright(url)
-                text = trafilatura.extract(html)
-                return text.strip() if text else ""
+            text = await extract(html)
+    except asyncio.CancelledError:
+        timings.record_cancelled(url, time.monotonic() - start)
+        raise
+    except (httpx.TransportError, TimeoutError):
+        timings.record(url, time.monotonic() - start, ok=False)
+        raise
+    except Exception:
+        # Not the domain's fault (e.g. extraction), only its latency is telling
+        timings.record(url, time.monotonic() - start)
+        raise
+    # A page without extractable text was still served fine
+    timings.record(url, time.monotonic() - start)
+    if text and _cacheable(resp):
+        # SQLite and blob writes stay off the event loop
+        await asyncio.to_thread(
+            page_cache.store,
+            url,
+            html,
+            text,
+            etag=resp.headers.get("etag"),
+            last_modified=resp.headers.get("last-modified"),
+        )
+    return text
+
+
+# Background revalidations in flight, by URL
+_revalidating: dict[str, asyncio.Task] = {}
+
+
+async def _revalidate(url: str, entry: dict) -> None:
+    try:
+        await _download(url, entry, False, Deadline(SEARCH_LATENCY_BUDGET))
+    except Exception as e:
+        logger.info(f"Revalidation of {url} failed: {e}")
+    finally:
+        _revalidating.pop(url, None)
+
+
+async def fetch_content(
+    url: str,
+    use_playwright_fallback: bool = True,
+    deadline: Optional[Deadline] = None,
+) -> str:
+    """
+    Page text from the page cache, or fetched with httpx + Trafilatura with a
+    Playwright fallback. Stale pages are served at once and revalidated in the
+    background.
+    """
+    deadline = deadline or Deadline(SEARCH_LATENCY_BUDGET)
+    entry = await asyncio.to_thread(get_page_cache().lookup, url)
+    if entry is not None and entry["state"] == "fresh":
+        return entry["text"]
+    if entry is not None and entry["state"] == "stale":
+        if url not in _revalidating:
+            _revalidating[url] = asyncio.create_task(_revalidate(url, entry))
+        return entry["text"]
+
+    try:
+        return await _download(url, entry, use_playwright_fallback, deadline)
     except Exception as e:
         logger.warning(f"Failed to fetch {url}: {e}")
     return ""
 
 
+async def race_fetches(
+    urls: list[str],
+    wanted: int,
+    deadline: Deadline,
+    min_chars: int = SEARCH_MIN_CHARS,
+) -> list[tuple[str, str]]:
+    """
+    Fetch every url at once and return as soon as `wanted` pages have at least
+    `min_chars` of text, or when the deadline passes. Pages still loading are
+    cancelled. Results keep the order of `urls`, topped up with shorter pages when
+    there are not enough good ones.
+    """
+    tasks = {
+        asyncio.create_task(fetch_content(url, deadline=deadline)): url for url in urls
+    }
+    contents: dict[str, str] = {}
+    pending = set(tasks)
+    try:
+        good = 0
+        while pending and good < wanted and not deadline.expired:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=deadline.remaining(),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                content = task.result()
+                if content:
+                    contents[tasks[task]] = content
+                    good += len(content) >= min_chars
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    if pending:
+        logger.info(f"Cancelled {len(pending)} slower fetches")
+
+    ranked = [url for url in urls if url in contents]
+    good_urls = [url for url in ranked if len(contents[url]) >= min_chars]
+    short_urls = [url for url in ranked if len(contents[url]) < min_chars]
+    return [(url, contents[url]) for url in (good_urls + short_urls)[:wanted]]
+
+
 @tool
 async def search_internet(query: str) -> str:
     """
@@ -100,21 +231,19 @@ async def search_internet(query: str) -> str:
         str: A summarized snippet of relevant text from multiple web sources,
         including brief source attributions.
     """
-    num_results = 2
-    chunk_size = 1500
-    searx = SearxSearchWrapper(searx_host=os.environ["SEARX_HOST"])
-    results = searx.results(query, num_results=num_results)
-    urls = [r["link"] for r in results]
-
-    tasks = [fetch_content(url) for url in urls]
-    contents = await asyncio.gather(*tasks)
-
-    output_texts = []
-    for url, content in zip(urls, contents):
-        if content:
-            snippet = content[:chunk_size].replace("\n", " ")
-            output_texts.append(f"### Source: {url}\n{snippet}")
-        else:
-            logger.info(f"Url: {url} returned no content.")
+    deadline = Deadline(SEARCH_LATENCY_BUDGET)
+    results = await searx_search(
+        query, num_results=SEARCH_CANDIDATES * 2, deadline=deadline
+    )
+    urls = get_domain_timings().rank([r["link"] for r in results])[:SEARCH_CANDIDATES]
+    pages = await race_fetches(urls, SEARCH_MIN_RESULTS, deadline)
+
+    # BM25 over every passage is CPU work, kept off the event loop
+    selected = await asyncio.to_thread(select_passages, query, pages)
+    output_texts = [
+        f"### Source: {url}\n" + " […] ".join(passages) for url, passages in selected
+    ]
+    if not output_texts:
+        logger.info(f"No content from {len(urls)} results for '{query}'.")
 
     return "\n\n".join(output_texts)
@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.expanduser(os.getenv("NABU_CACHE_DIR", "~/.cache/nabu-agent"))
+
+
+def cache_path(name: str) -> str:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, f"{name}.sqlite")
+
+
+class PersistentCache:
+    """
+    Two-tier key/value cache: an in-memory LRU in front of a SQLite table.
+
+    Values must be JSON serializable. Entries expire after their own `ttl` (if given
+    on `set`) or after `max_age` seconds; the disk tier is trimmed to `max_entries`
+    by least recent access. Hits in the memory tier are written back to the disk
+    tier's access times in batches, at most every `touch_interval` seconds and before
+    every trim. Use `path=":memory:"` for a process-local cache.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        path: Optional[str] = None,
+        memory_size: int = 256,
+        max_entries: int = 10_000,
+        max_age: Optional[float] = None,
+        touch_interval: float = 60.0,
+    ):
+        self.name = name
+        self.path = path or cache_path(name)
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.touch_interval = touch_interval
+
+        self._memory: OrderedDict[str, tuple[Any, Optional[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)"
+        )
+        self._db.commit()
+        self._writes = 0
+        # Memory hits not yet written to entries.last_access
+        self._touched: dict[str, float] = {}
+        self._last_touch_flush = time.time()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expiry(self, now: float, ttl: Optional[float]) -> Optional[float]:
+        limits = [t for t in (ttl, self.max_age) if t is not None]
+        return now + min(limits) if limits else None
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            if key in self._memory:
+                value, expires_at = self._memory[key]
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    self._touched[key] = now
+                    if now - self._last_touch_flush >= self.touch_interval:
+                        self._flush_touched(now)
+                        self._db.commit()
+                    return value
+                del self._memory[key]
+
+            row = self._db.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                self.misses += 1
+                return None
+            self._db.execute(
+                "UPDATE entries SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+            value = json.loads(row[0])
+            self._remember(key, value, row[1])
+            self.disk_hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        expires_at = self._expiry(now, ttl)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value), now, expires_at, now),
+            )
+            self._db.commit()
+            self._remember(key, value, expires_at)
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict(now)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._memory.pop(key, None)
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+
+    def items(self) -> list[tuple[str, Any, float, Optional[float]]]:
+        """(key, value, created_at, expires_at) of every live entry."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, value, created_at, expires_at FROM entries "
+                "WHERE expires_at IS NULL OR expires_at > ? ORDER BY created_at",
+                (time.time(),),
+            ).fetchall()
+        return [(k, json.loads(v), created, expires) for k, v, created, expires in rows]
+
+    def _remember(self, key: str, value: Any, expires_at: Optional[float]) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _flush_touched(self, now: float) -> None:
+        if self._touched:
+            self._db.executemany(
+                "UPDATE entries SET last_access = MAX(last_access, ?) WHERE key = ?",
+                [(accessed, key) for key, accessed in self._touched.items()],
+            )
+            self._touched.clear()
+        self._last_touch_flush = now
+
+    def _evict(self, now: float) -> None:
+        self._flush_touched(now)
+        expired = self._db.execute(
+            "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (now,),
+        ).rowcount
+        overflow = self._db.execute(
+            "DELETE FROM entries WHERE key IN (SELECT key FROM entries "
+            "ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        self._db.commit()
+        self.evictions += expired + overflow
+
+    def evict(self) -> None:
+        with self._lock:
+            self._evict(time.time())
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "name": self.name,
+                "entries": entries,
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups
+                if lookups
+                else 0.0,
+            }
@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Optional
 
 from pydantic import BaseModel, Field
 
@@ -50,6 +51,15 @@ class Classifier(BaseModel):
     )
 
 
+class LocalClassification(BaseModel):
+    classification: QuestionType = Field(
+        description="Question type decided by the in-process classifier."
+    )
+    confidence: float = Field(
+        description="Confidence of the classification, between 0 and 1.", ge=0, le=1
+    )
+
+
 class Evaluator(BaseModel):
     feedback: str = Field(
         description="A short feedback comment to improve the question routing in case it has not been routed correctly.",
@@ -87,3 +97,26 @@ class SpotifyActionClassifier(BaseModel):
         description="PLAY if the action is to play music. Otherwise (pause, next track, etc.) it should be OTHER."
     )
     reasoning: str = Field(description="short reasoning")
+
+
+class Understanding(BaseModel):
+    english_command: str = Field(
+        description="The input command translated to english. Do not translate people's, artists' or albums names.",
+        max_length=500,
+    )
+    classification: QuestionType = Field(
+        description="Classification of the command into one of the question types."
+    )
+    spotify_action: Optional[SpotifyAction] = Field(
+        default=None,
+        description="Only for Spotify commands. PLAY if the action is to play music. Otherwise (pause, next track, etc.) it should be OTHER.",
+    )
+    spotify_type: Optional[SpotifyType] = Field(
+        default=None,
+        description="Only for Spotify PLAY commands. If radio mentioned put radio. if song put track. if its an artist put artist. if album put album.",
+    )
+    key_word: Optional[str] = Field(
+        default=None,
+        description="Only for Spotify PLAY commands. Key artist, track or playlist to search for in Spotify.",
+        max_length=100,
+    )
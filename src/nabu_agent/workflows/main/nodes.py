@@ -1,4 +1,7 @@
+import asyncio
 import logging
+import os
+from typing import Optional
 
 from dotenv import load_dotenv
 
@@ -10,37 +13,89 @@ from ...tools.agents import (
     execute_knowdledge_agent,
     execute_party_sentence,
     execute_stt,
+    execute_stt_translation,
     execute_tool_agent,
     execute_translator,
+    execute_understand_agent,
 )
+from ...tools.intent import LOCAL_CLASSIFIER_THRESHOLD, classify_locally
 from ...tools.misc import get_weather
+from ...tools.stt import STT_TASK
 from ...utils.schemas import (
     Classifier,
     Evaluator,
+    LocalClassification,
     PartySentence,
     QuestionType,
+    SpotifyAction,
     Translator,
+    Understanding,
 )
 from ...workflows.main.state import MainGraphState
+from ...workflows.spotify_agent import nodes as spotify_nodes
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# "combined" replaces Translator, Enrouting Question, Routing Verification and the
+# Spotify classifiers with the single Understand node.
+UNDERSTAND_MODE = os.getenv("UNDERSTAND_MODE", "separate")
+
+# Run the classifier's handler while the evaluator is still verifying the route.
+SPECULATIVE_ROUTING = os.getenv("SPECULATIVE_ROUTING") == "true"
+
+
+def language_from_code(code: str) -> str:
+    if code == "en":
+        return "english"
+    return "spanish" if code == "es" else "catalan"
+
 
 def stt(state: MainGraphState) -> MainGraphState:
     logger.info("--- Whisper Speech To Text --- ")
+    if STT_TASK in ("translate", "both"):
+        return stt_translate(state)
     result, info = execute_stt(input=state["input"])
     state["input"] = None
     final_result = ""
     for i in result:
         final_result += i.text
     state["stt_output"] = final_result
-    state["original_language"] = "spanish" if info.language == "es" else "catalan"
+    state["original_language"] = language_from_code(info.language)
+    if state["original_language"] == "english":
+        # Nothing to translate, the Translator node is skipped
+        state["english_command"] = final_result
     logger.info(f"Transcription from {info.language}: {final_result}")
     return state
 
 
+def stt_translate(state: MainGraphState) -> MainGraphState:
+    original, english, info, timings = execute_stt_translation(
+        input=state["input"], keep_original=STT_TASK == "both"
+    )
+    state["input"] = None
+    return set_stt_translation(state, original, english, info, timings)
+
+
+def set_stt_translation(
+    state: MainGraphState,
+    original: Optional[str],
+    english: str,
+    info,
+    timings: dict,
+) -> MainGraphState:
+    """Whisper's english goes straight to routing, the Translator node is skipped."""
+    state["stt_output"] = original if original is not None else english
+    state["english_command"] = english
+    state["original_language"] = language_from_code(info.language)
+    logger.info(
+        f"Whisper translation from {info.language}: {english} "
+        + ", ".join(f"{task} {seconds:.2f}s" for task, seconds in timings.items())
+    )
+    return state
+
+
 def translate_to_english(state: MainGraphState) -> MainGraphState:
     logger.info("--- Translating to english --- ")
     result: str = execute_translator(
@@ -55,8 +110,43 @@ def translate_to_english(state: MainGraphState) -> MainGraphState:
     return state
 
 
+def understand(state: MainGraphState) -> MainGraphState:
+    logger.info("--- Understand Command (translate + route) ---")
+    result: Understanding = execute_understand_agent(
+        text=state["stt_output"],
+        original_language=state["original_language"],
+        preestablished_commands_schema=party_commands,
+    )
+    state["english_command"] = result.english_command
+    state["question_type"] = result.classification
+    state["routing_ok"] = True
+    if result.classification == QuestionType.spotify and result.spotify_action:
+        state["spotify_action"] = result.spotify_action
+        if (
+            result.spotify_action == SpotifyAction.PLAY
+            and result.spotify_type
+            and result.key_word
+        ):
+            state["spotify_command"] = result.spotify_type
+            state["spotify_query"] = result.key_word
+    logger.info(
+        f"Understood (from {state['original_language']}): {result.english_command} "
+        f"-> {result.classification}"
+    )
+    return state
+
+
 def enroute_question(state: MainGraphState) -> MainGraphState:
     logger.info("--- Enroute Question Node ---")
+    # Fast path: a confident local classification skips both LLM calls.
+    # Retries come with evaluator feedback, those always go to the LLM.
+    if not state.get("feedback"):
+        local: LocalClassification = classify_locally(state["english_command"])
+        if local.confidence >= LOCAL_CLASSIFIER_THRESHOLD:
+            state["question_type"] = local.classification
+            state["routing_ok"] = True
+            return state
+
     result: Classifier = execute_classifier_agent(
         english_command=state["english_command"],
         preestablished_commands_schema=party_commands,
@@ -118,6 +208,9 @@ def finish_action(state: MainGraphState) -> MainGraphState:
     if "final_answer" not in state:
         state["final_answer"] = state["english_command"]
     logger.info(f"Sentence: {state['final_answer']}")
+    if state["original_language"] == "english":
+        state["final_answer_translated"] = state["final_answer"]
+        return state
 
     result: str = execute_translator(
         text=state["final_answer"],
@@ -141,3 +234,69 @@ async def homeassistant(state: MainGraphState) -> MainGraphState:
     state["final_answer"] = search
 
     return state
+
+
+async def _prepare_spotify(state: MainGraphState) -> MainGraphState:
+    # Only the LLM classification stages, playback waits for the commit
+    if state.get("spotify_action") is None and spotify_nodes.match_playback(state):
+        return state
+    if state.get("spotify_action") is None:
+        state = await asyncio.to_thread(spotify_nodes.decide_action, state)
+    if state["spotify_action"] == SpotifyAction.PLAY and not state.get("spotify_query"):
+        state = await asyncio.to_thread(spotify_nodes.decide_music_type, state)
+    return state
+
+
+async def _speculate(state: MainGraphState) -> MainGraphState:
+    # Only side-effect free work: threads outlive a rollback, see below
+    question_type = state.get("question_type")
+    if question_type == QuestionType.knowledge:
+        return await knowledge_answerer(state)
+    if question_type == QuestionType.api_call:
+        return await asyncio.to_thread(api_call, state)
+    if question_type == QuestionType.party:
+        return await asyncio.to_thread(pre_established_commands, state)
+    if question_type == QuestionType.spotify:
+        return await _prepare_spotify(state)
+    # Home Assistant service calls have side effects, nothing runs ahead
+    return state
+
+
+SPECULATIVE_KEYS = ("final_answer", "spotify_action", "spotify_command", "spotify_query")
+
+
+async def speculative_verify_routing(state: MainGraphState) -> MainGraphState:
+    """
+    Verify the routing while the handler for the classifier's choice already runs.
+
+    Side-effect free handlers (knowledge, weather, party) run to completion and their
+    answer is committed only if the evaluator agrees. Side-effecting handlers only run
+    their preparation (Spotify action/query classification); playback and Home
+    Assistant calls happen after the commit, in the regular handler nodes.
+
+    A rollback cancels the speculation, but handlers running in a thread keep going
+    until they return and their result is dropped. This is why `_speculate` must only
+    call side-effect free work: LLM calls and read-only lookups, never the Spotify
+    session or Home Assistant.
+    """
+    speculation = asyncio.create_task(_speculate(dict(state)))
+    state = await asyncio.to_thread(verify_routing, state)
+
+    # Same commit rule as workflow.decide_action
+    if not (state["routing_ok"] or state["retries"] > 2):
+        logger.info(f"Speculation for {state['question_type']} discarded")
+        speculation.cancel()
+        return state
+
+    try:
+        speculative_state = await speculation
+    except Exception as e:
+        logger.warning(f"Speculative handler failed, running it again: {e}")
+        return state
+
+    for key in SPECULATIVE_KEYS:
+        if speculative_state.get(key) is not None:
+            state[key] = speculative_state[key]
+    state["speculation_committed"] = "final_answer" in state
+    logger.info(f"Speculation for {state['question_type']} committed")
+    return state
@@ -9,6 +9,7 @@ class MainGraphState(TypedDict):
     original_language: str
     english_command: str
     routing_ok: bool
+    speculation_committed: bool
     retries: int
     feedback: str
     question_type: QuestionType
@@ -1,7 +1,12 @@
+import logging
+from functools import cache
+from typing import AsyncIterator
+
 from dotenv import load_dotenv
 from langgraph.graph import END, StateGraph
 from langgraph.graph.state import CompiledStateGraph
 
+from ...tools.stt import STT_LANGUAGE, StreamingTranscriber, get_stt_engine
 from ...utils.schemas import QuestionType
 from ...workflows.main import nodes as nodes
 from ...workflows.main.state import MainGraphState
@@ -9,23 +14,55 @@ from ...workflows.spotify_agent.workflow import build_spotify_workflow
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+def decide_understanding(state: MainGraphState) -> str:
+    if nodes.UNDERSTAND_MODE == "combined":
+        return "Understand"
+    # Whisper already produced english (translate task or english speech)
+    if state.get("english_command"):
+        return "Enrouting Question"
+    return "Translator"
+
+
+def decide_entry(state: MainGraphState) -> str:
+    # Streaming callers transcribe before invoking the graph
+    if state.get("stt_output"):
+        return decide_understanding(state)
+    return "STT"
+
 
 def decide_action(state: MainGraphState) -> QuestionType:
     routing_ok = state.get("routing_ok", None)
 
     if routing_ok or state["retries"] > 2:
+        if state.get("speculation_committed"):
+            return "Speculation committed"
         return state["question_type"]
 
     return "Error in routing"
 
 
+def decide_verification(state: MainGraphState) -> str:
+    # Routing already settled by the local classifier
+    if state.get("routing_ok"):
+        return state["question_type"]
+
+    return "Routing Verification"
+
+
 def build_main_workflow() -> CompiledStateGraph:
     workflow = StateGraph(MainGraphState)
 
     workflow.add_node("STT", nodes.stt)
     workflow.add_node("Translator", nodes.translate_to_english)
+    workflow.add_node("Understand", nodes.understand)
     workflow.add_node("Enrouting Question", nodes.enroute_question)
-    workflow.add_node("Routing Verification", nodes.verify_routing)
+    if nodes.SPECULATIVE_ROUTING:
+        workflow.add_node("Routing Verification", nodes.speculative_verify_routing)
+    else:
+        workflow.add_node("Routing Verification", nodes.verify_routing)
     workflow.add_node("Pre-stablished commands", nodes.pre_established_commands)
     workflow.add_node("Knowledge Question", nodes.knowledge_answerer)
     workflow.add_node("API Call", nodes.api_call)
@@ -33,21 +70,35 @@ def build_main_workflow() -> CompiledStateGraph:
     workflow.add_node("Home Assistant Command", nodes.homeassistant)
     workflow.add_node("Finish Action", nodes.finish_action)
 
-    workflow.set_entry_point("STT")
-    workflow.add_edge("STT", "Translator")
+    understanding = {
+        "Translator": "Translator",
+        "Understand": "Understand",
+        "Enrouting Question": "Enrouting Question",
+    }
+    workflow.set_conditional_entry_point(decide_entry, {"STT": "STT", **understanding})
+    workflow.add_conditional_edges("STT", decide_understanding, understanding)
     workflow.add_edge("Translator", "Enrouting Question")
-    workflow.add_edge("Enrouting Question", "Routing Verification")
 
+    handlers = {
+        QuestionType.knowledge.value: "Knowledge Question",
+        QuestionType.api_call.value: "API Call",
+        QuestionType.party.value: "Pre-stablished commands",
+        QuestionType.spotify.value: "Spotify Command",
+        QuestionType.homeassistant.value: "Home Assistant Command",
+    }
+    workflow.add_conditional_edges(
+        "Enrouting Question",
+        decide_verification,
+        {"Routing Verification": "Routing Verification", **handlers},
+    )
+    workflow.add_conditional_edges("Understand", decide_verification, handlers)
     workflow.add_conditional_edges(
         "Routing Verification",
         decide_action,
         {
             "Error in routing": "Enrouting Question",
-            QuestionType.knowledge.value: "Knowledge Question",
-            QuestionType.api_call.value: "API Call",
-            QuestionType.party.value: "Pre-stablished commands",
-            QuestionType.spotify.value: "Spotify Command",
-            QuestionType.homeassistant.value: "Home Assistant Command",
+            "Speculation committed": "Finish Action",
+            **handlers,
         },
     )
     workflow.add_edge("Pre-stablished commands", "Finish Action")
@@ -60,14 +111,76 @@ def build_main_workflow() -> CompiledStateGraph:
     return workflow.compile()
 
 
-global hass
+@cache
+def get_main_workflow() -> CompiledStateGraph:
+    """Compiled main workflow, built once per process and shared by every request."""
+    return build_main_workflow()
+
 
+def draw_main_workflow(
+    app: CompiledStateGraph | None = None,
+    output_file_path: str = "graph.png",
+    full_output_file_path: str = "full_graph.png",
+) -> None:
+    if app is None:
+        app = get_main_workflow()
+    app.get_graph().draw_mermaid_png(output_file_path=output_file_path)
+    app.get_graph(xray=1).draw_mermaid_png(output_file_path=full_output_file_path)
 
-async def execute_main_workflow(audio_input: bytes, graph: bool = False) -> str:
-    app = build_main_workflow()
+
+async def execute_main_workflow(
+    audio_input: bytes, graph: bool = False, app: CompiledStateGraph | None = None
+) -> str:
+    if app is None:
+        app = get_main_workflow()
     if graph:
-        app.get_graph().draw_mermaid_png(output_file_path="graph.png")
-        app.get_graph(xray=1).draw_mermaid_png(output_file_path="full_graph.png")
+        draw_main_workflow(app)
     res = await app.ainvoke({"input": audio_input})
 
     return res["final_answer_translated"]
+
+
+async def execute_main_workflow_stream(
+    audio_chunks: AsyncIterator[bytes],
+    app: CompiledStateGraph | None = None,
+    sample_rate: int = 16000,
+) -> str:
+    """
+    Run the workflow over a stream of 16-bit mono PCM chunks (e.g. a Wyoming satellite).
+
+    Speech is transcribed incrementally while it arrives and the graph starts at the
+    Translator as soon as the end of speech is detected. With FASTER_WHISPER_TASK
+    translate or both, Whisper also translates each segment and the graph starts at
+    the routing, like the batch path.
+    """
+    if app is None:
+        app = get_main_workflow()
+    transcriber = StreamingTranscriber(
+        get_stt_engine(),
+        sample_rate=sample_rate,
+        task=nodes.STT_TASK,
+        beam_size=5,
+        language=STT_LANGUAGE,
+    )
+    text, info = await transcriber.transcribe(audio_chunks)
+    if not text:
+        return ""
+    if transcriber.english_text is not None:
+        state = nodes.set_stt_translation(
+            {},
+            transcriber.original_text,
+            transcriber.english_text,
+            info,
+            transcriber.timings,
+        )
+    else:
+        state = {
+            "stt_output": text,
+            "original_language": nodes.language_from_code(info.language),
+        }
+        if state["original_language"] == "english":
+            state["english_command"] = text
+        logger.info(f"Streaming transcription from {info.language}: {text}")
+    res = await app.ainvoke(state)
+
+    return res["final_answer_translated"]
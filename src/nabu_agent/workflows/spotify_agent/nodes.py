@@ -1,12 +1,14 @@
 import logging
+from typing import Optional
 
 from dotenv import load_dotenv
 
 from ...tools.agents import (execute_spotify_classifier_agent,
                              execute_spotify_decide_action, execute_tool_agent)
-from ...tools.spotify import (init_spotify, next_song, pause_music, play_music,
-                              previous_song, search_music, volume_down,
-                              volume_up)
+from ...tools.playback import match_playback_command
+from ...tools.spotify import (get_spotify_session, next_song, pause_music,
+                              play_music, previous_song, search_music,
+                              volume_down, volume_up)
 from ...utils.schemas import SpotifyAction, SpotifyClassifier, SpotifyType
 from ...workflows.main.state import MainGraphState
 
@@ -23,6 +25,29 @@ def decide_action(state: MainGraphState) -> MainGraphState:
     return state
 
 
+PLAYBACK_TOOLS = {
+    "pause": pause_music,
+    "next": next_song,
+    "previous": previous_song,
+    "volume_up": volume_up,
+    "volume_down": volume_down,
+}
+
+
+def match_playback(state: MainGraphState) -> Optional[str]:
+    return match_playback_command(
+        state.get("english_command"), state.get("stt_output")
+    )
+
+
+def playback_control(state: MainGraphState) -> MainGraphState:
+    control = match_playback(state)
+    logger.info(f"--- Playback Control: {control} ---")
+    state["spotify_action"] = SpotifyAction.OTHER
+    state["final_answer"] = PLAYBACK_TOOLS[control].invoke({})
+    return state
+
+
 def other_functionalities(state: MainGraphState) -> MainGraphState:
     logger.info("--- Other Spotify Commands ---")
     result: str = execute_tool_agent(
@@ -39,7 +64,7 @@ def decide_music_type(state: MainGraphState) -> MainGraphState:
         text=state["english_command"],
     )
     state["spotify_command"] = result.classification
-    state["spotify_query"] = result.key_word.replace(" ", "%20")
+    state["spotify_query"] = result.key_word
 
     logger.info(f"Enrouting to: {result.classification}")
     logger.info(f"Query: {result.key_word}")
@@ -47,10 +72,11 @@ def decide_music_type(state: MainGraphState) -> MainGraphState:
 
 
 def search_and_play_music(state: MainGraphState) -> MainGraphState:
-    spotify_client = init_spotify()
+    session = get_spotify_session()
+    session.ensure_device()
     logger.info("--- Search & Play Song Node ---")
     id = search_music(
-        spotify_client,
+        session.client,
         query=state["spotify_query"],
         criteria_type=state["spotify_command"],
     )
@@ -61,6 +87,6 @@ def search_and_play_music(state: MainGraphState) -> MainGraphState:
         uris = None
         context_uri = id
 
-    play_music(spotify_client, context_uri=context_uri, uris=uris)
+    play_music(session, context_uri=context_uri, uris=uris)
     state["final_answer"] = f"Playing Music: {state['english_command']}"
     return state
@@ -13,8 +13,22 @@ def decide_action(state: MainGraphState) -> SpotifyAction:
     return state["spotify_action"].value
 
 
+def decide_entry(state: MainGraphState) -> str:
+    # Pause, skip and volume commands are matched without any LLM call
+    action = state.get("spotify_action")
+    if action != SpotifyAction.PLAY and nodes.match_playback(state):
+        return "Playback Control"
+    # The combined Understand node may already have decided action, type and query
+    if action is None:
+        return "Decide Action"
+    if action == SpotifyAction.PLAY and state.get("spotify_query"):
+        return "Search and play"
+    return action.value
+
+
 def build_spotify_workflow() -> CompiledStateGraph:
     workflow = StateGraph(MainGraphState)
+    workflow.add_node("Playback Control", nodes.playback_control)
     workflow.add_node("Decide Action", nodes.decide_action)
     workflow.add_node("Other Actions", nodes.other_functionalities)
     workflow.add_node("What to play?", nodes.decide_music_type)
@@ -28,9 +42,19 @@ def build_spotify_workflow() -> CompiledStateGraph:
             SpotifyAction.PLAY.value: "What to play?",
         },
     )
-    workflow.set_entry_point("Decide Action")
+    workflow.set_conditional_entry_point(
+        decide_entry,
+        {
+            "Playback Control": "Playback Control",
+            "Decide Action": "Decide Action",
+            "Search and play": "Search and play",
+            SpotifyAction.OTHER.value: "Other Actions",
+            SpotifyAction.PLAY.value: "What to play?",
+        },
+    )
     workflow.add_edge("What to play?", "Search and play")
     workflow.add_edge("Search and play", END)
     workflow.add_edge("Other Actions", END)
+    workflow.add_edge("Playback Control", END)
 
     return workflow.compile()
@@ -0,0 +1,38 @@
+from src.nabu_agent.tools.answer_cache import KnowledgeCache
+from src.nabu_agent.utils.cache import PersistentCache
+
+
+def get_cache(tmp_path) -> KnowledgeCache:
+    return KnowledgeCache(
+        PersistentCache("test", path=str(tmp_path / "answers.sqlite")), similarity=0.8
+    )
+
+
+def test_knowledge_cache_exact_and_similar_hits(tmp_path):
+    knowledge_cache = get_cache(tmp_path)
+    knowledge_cache.set("Why is the sky blue?", "Rayleigh scattering.", searched=False)
+
+    assert knowledge_cache.get("why is the sky blue")["answer"] == "Rayleigh scattering."
+    assert knowledge_cache.get("Why is the sky blue, really?") is not None
+    assert knowledge_cache.get("Who won the match yesterday?") is None
+
+
+def test_knowledge_cache_ttl_depends_on_search(tmp_path):
+    knowledge_cache = get_cache(tmp_path)
+    knowledge_cache.search_ttl = 0
+    knowledge_cache.set("Who won the match yesterday?", "Barça won.", searched=True)
+    knowledge_cache.set("Who wrote Don Quixote?", "Cervantes.", searched=False)
+
+    assert knowledge_cache.get("Who won the match yesterday?") is None
+    assert knowledge_cache.get("Who wrote Don Quixote?")["answer"] == "Cervantes."
+
+
+def test_knowledge_cache_purge(tmp_path):
+    knowledge_cache = get_cache(tmp_path)
+    knowledge_cache.set("Who wrote Don Quixote?", "Cervantes.", searched=False)
+    knowledge_cache.set("Why is the sky blue?", "Rayleigh scattering.", searched=False)
+
+    assert knowledge_cache.purge("quixote") == 1
+    assert [e["question"] for e in knowledge_cache.entries()] == ["Why is the sky blue?"]
+    assert knowledge_cache.purge() == 1
+    assert knowledge_cache.get("Why is the sky blue?") is None
@@ -0,0 +1,194 @@
+import asyncio
+
+import pytest
+from playwright.async_api import Error as PlaywrightError
+
+from src.nabu_agent.tools import browser
+from src.nabu_agent.tools.browser import BrowserPool
+
+
+class FakePage:
+    def __init__(self, browser: "FakeBrowser"):
+        self.browser = browser
+        self.closed = False
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    async def goto(self, url: str, timeout: int = 0):
+        if self.browser.crash_on_goto:
+            self.browser.crash()
+            raise PlaywrightError("Target page, context or browser has been closed")
+        self.url = url
+
+    async def content(self) -> str:
+        return f"<p>{self.url}</p>"
+
+
+class FakeContext:
+    def __init__(self, browser: "FakeBrowser"):
+        self.browser = browser
+        self.closed = False
+        self.routes = []
+
+    async def route(self, pattern, handler):
+        self.routes.append(pattern)
+
+    async def new_page(self) -> FakePage:
+        self.page = FakePage(self.browser)
+        return self.page
+
+    async def close(self):
+        self.closed = True
+        self.page.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.contexts = []
+        self.handlers = {}
+        self.crash_on_goto = False
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def new_context(self) -> FakeContext:
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    def crash(self):
+        self.connected = False
+        self.handlers["disconnected"](self)
+
+    async def close(self):
+        self.connected = False
+
+
+class FakePlaywright:
+    """Stands in for `async_playwright()`, recording every Chromium it launches."""
+
+    def __init__(self):
+        self.browsers = []
+        self.stopped = False
+        self.chromium = self
+
+    async def start(self) -> "FakePlaywright":
+        return self
+
+    async def launch(self, headless: bool) -> FakeBrowser:
+        self.browsers.append(FakeBrowser())
+        return self.browsers[-1]
+
+    async def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture
+def playwright(monkeypatch):
+    playwright = FakePlaywright()
+    monkeypatch.setattr(browser, "async_playwright", lambda: playwright)
+    return playwright
+
+
+@pytest.mark.asyncio
+async def test_pages_and_contexts_are_reused(playwright):
+    pool = BrowserPool(size=2)
+    try:
+        for n in range(3):
+            assert await pool.fetch_html(f"https://example.com/{n}") == (
+                f"<p>https://example.com/{n}</p>"
+            )
+
+        # Two at once need a second context, which is kept for later too
+        async with pool.page() as first, pool.page() as second:
+            assert first is not second
+
+        assert len(playwright.browsers) == 1
+        contexts = playwright.browsers[0].contexts
+        assert len(contexts) == 2
+        assert contexts[0].routes == ["**/*"]
+        assert not any(context.closed for context in contexts)
+        assert pool.stats() == {
+            "size": 2,
+            "browser_running": True,
+            "idle_pages": 2,
+            "in_use": 0,
+            "launches": 1,
+            "pages_created": 2,
+            "reuses": 3,
+        }
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_page_is_not_reused(playwright):
+    pool = BrowserPool()
+    try:
+        with pytest.raises(ValueError):
+            async with pool.page():
+                raise ValueError("broken page")
+
+        assert playwright.browsers[0].contexts[0].closed
+        assert pool.stats()["idle_pages"] == 0
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_idle_pages_and_browser_are_reaped(playwright):
+    # The reaper checks every max(idle_timeout / 2, 1) seconds
+    pool = BrowserPool(idle_timeout=0.5)
+    await pool.fetch_html("https://example.com/")
+    assert pool.stats()["idle_pages"] == 1
+
+    await asyncio.wait_for(pool._reaper, timeout=3)
+
+    assert playwright.browsers[0].contexts[0].closed
+    assert not playwright.browsers[0].is_connected()
+    assert playwright.stopped
+    assert pool.stats()["browser_running"] is False
+    assert pool.stats()["idle_pages"] == 0
+
+
+@pytest.mark.asyncio
+async def test_crashed_browser_is_relaunched_and_retried(playwright):
+    pool = BrowserPool()
+    try:
+        await pool.fetch_html("https://example.com/")
+        playwright.browsers[0].crash_on_goto = True
+
+        html = await pool.fetch_html("https://example.com/retry")
+
+        assert html == "<p>https://example.com/retry</p>"
+        assert len(playwright.browsers) == 2
+        # The page of the crashed browser is dropped, not reused
+        assert pool.stats()["launches"] == 2
+        assert pool.stats()["idle_pages"] == 1
+        assert playwright.browsers[1].contexts[0].page.url.endswith("/retry")
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_errors_on_a_live_browser_are_not_retried(playwright):
+    pool = BrowserPool()
+    try:
+        await pool.fetch_html("https://example.com/")
+
+        async def goto(url, timeout=0):
+            raise PlaywrightError("net::ERR_NAME_NOT_RESOLVED")
+
+        async with pool.page() as page:
+            page.goto = goto
+        with pytest.raises(PlaywrightError):
+            await pool.fetch_html("https://example.invalid/")
+
+        assert len(playwright.browsers) == 1
+    finally:
+        await pool.close()
@@ -0,0 +1,76 @@
+import sqlite3
+import time
+
+from src.nabu_agent.utils.cache import PersistentCache
+
+
+def test_cache_memory_and_disk_hits(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = PersistentCache("test", path=path, memory_size=1)
+    cache.set("a", "Fet")
+    cache.set("b", "Reproduint música")
+
+    assert cache.get("b") == "Reproduint música"  # memory tier
+    assert cache.get("a") == "Fet"  # evicted from memory, read from disk
+    assert cache.get("c") is None
+
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["disk_hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_cache_persists_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    PersistentCache("test", path=path).set("a", {"lat": 41.5, "lon": 2.4})
+    assert PersistentCache("test", path=path).get("a") == {"lat": 41.5, "lon": 2.4}
+
+
+def test_cache_entries_expire(tmp_path):
+    cache = PersistentCache("test", path=str(tmp_path / "cache.sqlite"))
+    cache.set("a", "value", ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+
+def test_cache_is_trimmed_to_max_entries(tmp_path):
+    cache = PersistentCache(
+        "test", path=str(tmp_path / "cache.sqlite"), memory_size=0, max_entries=2
+    )
+    for key in ["a", "b", "c"]:
+        cache.set(key, key)
+    cache.get("a")
+    cache.evict()
+    assert cache.stats()["entries"] == 2
+    assert cache.get("a") == "a"
+
+
+def test_memory_hits_keep_entries_from_being_trimmed(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = PersistentCache("test", path=path, max_entries=2, touch_interval=3600)
+    cache.set("a", "a")
+    cache.set("b", "b")
+    time.sleep(0.01)
+    assert cache.get("a") == "a"  # memory tier
+    time.sleep(0.01)
+    cache.set("c", "c")
+
+    # The memory hit is written back before trimming, "b" is the least recent
+    cache.evict()
+    reopened = PersistentCache("test", path=path)
+    assert reopened.get("b") is None
+    assert reopened.get("a") == "a"
+
+
+def test_memory_hits_are_written_back_periodically(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = PersistentCache("test", path=path, touch_interval=0)
+    cache.set("a", "a")
+    time.sleep(0.01)
+    cache.get("a")
+
+    db = sqlite3.connect(path)
+    created, accessed = db.execute(
+        "SELECT created_at, last_access FROM entries WHERE key = 'a'"
+    ).fetchone()
+    assert accessed > created
@@ -0,0 +1,40 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from src.nabu_agent.tools import extraction
+from src.nabu_agent.tools.extraction import create_executor, extract, extract_text
+
+HTML = (
+    "<html><body><article><h1>Mataró</h1>"
+    + "<p>Mataró is a city on the coast of the Maresme, north of Barcelona.</p>" * 20
+    + "</article></body></html>"
+)
+
+
+def test_process_pool_does_not_fork():
+    executor = create_executor("process", 1)
+    try:
+        assert executor._mp_context.get_start_method() in ("forkserver", "spawn")
+        assert "Maresme" in executor.submit(extract_text, HTML).result(timeout=60)
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_broken_process_pool_is_replaced(monkeypatch):
+    broken = create_executor("process", 1)
+    monkeypatch.setattr(extraction, "_executor", broken)
+    # A worker dying breaks the whole pool
+    with pytest.raises(BrokenProcessPool):
+        broken.submit(os._exit, 1).result(timeout=60)
+
+    # The page is still extracted, on a thread, and the next call gets a new pool
+    assert "Maresme" in await extract(HTML)
+    replacement = extraction.get_extraction_executor()
+    try:
+        assert replacement is not broken
+        assert "Maresme" in await extract(HTML)
+    finally:
+        replacement.shutdown()
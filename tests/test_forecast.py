@@ -0,0 +1,73 @@
+import numpy as np
+
+from src.nabu_agent.tools import misc
+from src.nabu_agent.tools.forecast import ForecastStore
+from src.nabu_agent.utils.cache import PersistentCache
+
+
+class FakeVariable:
+    def __init__(self, value):
+        self.value = value
+
+    def Value(self):
+        return self.value
+
+    def ValuesAsNumpy(self):
+        return np.array(self.value)
+
+
+class FakeSection:
+    def __init__(self, values):
+        self.values = values
+
+    def Variables(self, i):
+        return FakeVariable(self.values[i])
+
+
+class FakeResponse:
+    def Current(self):
+        return FakeSection([21.5, 0.0, 1.0, 20.0, 9.5])
+
+    def Daily(self):
+        return FakeSection(
+            [
+                [1.0, 61.0, 3.0],
+                [22, 19, 20],
+                [14, 12, 13],
+                [0, 4.2, 0],
+                [5, 80, 10],
+                [0, 3, 0],
+            ]
+        )
+
+
+class FakeClient:
+    def __init__(self):
+        self.requests = []
+
+    def weather_api(self, url, params, **kwargs):
+        self.requests.append(params)
+        return [FakeResponse()]
+
+
+def test_forecast_store_one_request_per_place_and_hour(tmp_path, monkeypatch):
+    client = FakeClient()
+    store = ForecastStore(
+        PersistentCache("forecasts", path=str(tmp_path / "forecasts.sqlite")),
+        client_factory=lambda: client,
+    )
+    monkeypatch.setattr(misc, "get_forecast_store", lambda: store)
+
+    today = misc.get_todays_forecast(lon=2.4445, lat=41.5381)
+    tomorrow = misc.get_tomorrows_forecast(lon=2.4447, lat=41.5379)
+    assert "temperature: 21.5" in today
+    assert "Mostly Clear" in today
+    assert "precipitation_probability:80" in tomorrow
+    assert "Light Rain" in tomorrow
+
+    assert len(client.requests) == 1
+    assert client.requests[0]["current"] and client.requests[0]["daily"]
+    assert client.requests[0]["latitude"] == 41.54
+
+    misc.get_todays_forecast(lon=2.17, lat=41.39)
+    assert len(client.requests) == 2
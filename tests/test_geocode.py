@@ -0,0 +1,73 @@
+from src.nabu_agent.tools import geocode as geocode_module
+from src.nabu_agent.tools.geocode import (
+    Gazetteer,
+    geocode,
+    get_gazetteer,
+    place_keys,
+)
+from src.nabu_agent.utils.cache import PersistentCache
+
+
+class FakeLocation:
+    latitude = 42.1
+    longitude = 2.9
+
+
+class FakeGeolocator:
+    def __init__(self):
+        self.calls = []
+
+    def geocode(self, name):
+        self.calls.append(name)
+        return FakeLocation() if name == "Banyoles" else None
+
+
+def test_gazetteer_normalizes_names_and_aliases():
+    gazetteer = get_gazetteer()
+    expected = gazetteer.lookup("Mataró")
+    assert expected == {"lat": 41.5381, "lon": 2.4445}
+    assert gazetteer.lookup("mataro") == expected
+    assert gazetteer.lookup("MATARÓ, Spain") == expected
+    assert gazetteer.lookup("Lérida") == gazetteer.lookup("Lleida")
+    assert gazetteer.lookup("l'hospitalet") is not None
+    assert gazetteer.lookup("Atlantis") is None
+
+
+def test_only_known_regions_are_dropped():
+    assert place_keys("Mataró, Barcelona, Spain") == [
+        "mataro barcelona spain",
+        "mataro barcelona",
+        "mataro",
+    ]
+    assert place_keys("Paris, Texas") == ["paris texas"]
+    assert place_keys("London, Ontario") == ["london ontario"]
+    assert place_keys(" , ") == []
+
+    gazetteer = get_gazetteer()
+    assert gazetteer.lookup("Paris, France") == gazetteer.lookup("Paris")
+    assert gazetteer.lookup("Paris, Texas") is None
+    assert gazetteer.lookup("London, Ontario") is None
+
+
+def test_gazetteer_file(tmp_path):
+    path = tmp_path / "places.csv"
+    path.write_text("name,lat,lon,aliases\nSant Pol de Mar,41.60,2.62,Sant Pol|St Pol\n")
+    gazetteer = Gazetteer()
+    gazetteer.load_file(str(path))
+    assert gazetteer.lookup("st pol") == {"lat": 41.60, "lon": 2.62}
+
+
+def test_geocode_uses_gazetteer_then_cache(tmp_path, monkeypatch):
+    geolocator = FakeGeolocator()
+    store = PersistentCache("geocode", path=str(tmp_path / "geocode.sqlite"))
+    monkeypatch.setattr(geocode_module, "get_geolocator", lambda: geolocator)
+    monkeypatch.setattr(geocode_module, "get_geocode_cache", lambda: store)
+
+    assert geocode("Barcelona") == {"lat": 41.3874, "lon": 2.1686}
+    assert geocode("Banyoles") == {"lat": 42.1, "lon": 2.9}
+    assert geocode("banyoles") == {"lat": 42.1, "lon": 2.9}
+    assert geocode("Atlantis") is None
+    assert geocode("Atlantis") is None
+    assert geolocator.calls == ["Banyoles", "Atlantis"]
+    geocode("Paris, Texas")
+    assert geolocator.calls[-1] == "Paris, Texas"
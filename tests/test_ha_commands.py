@@ -0,0 +1,278 @@
+import asyncio
+
+import pytest
+from test_ha_mcp import free_port, start_stub
+
+from src.nabu_agent.tools import agents
+from src.nabu_agent.tools.ha_commands import (
+    match_ha_command,
+    parse_ha_command,
+    service_call,
+)
+from src.nabu_agent.tools.ha_state import HAStateMirror
+
+AREAS = {
+    "light.kitchen": "Kitchen",
+    "switch.coffee": "Kitchen",
+    "light.living_room_lamp": "Living room",
+    "light.living_room_ceiling": "Living room",
+    "fan.bedroom": "Bedroom",
+    "lock.front_door": "Hall",
+}
+NAMES = {
+    "light.kitchen": "Kitchen light",
+    "switch.coffee": "Coffee machine",
+    "light.living_room_lamp": "Living room lamp",
+    "light.living_room_ceiling": "Ceiling light",
+    "fan.bedroom": "Fan",
+    "lock.front_door": "Front door",
+}
+
+
+def mirror() -> HAStateMirror:
+    ha = HAStateMirror("http://127.0.0.1:1", "token")
+    ha._entity_areas = AREAS
+    ha.load_states(
+        [
+            {"entity_id": e, "state": "off", "attributes": {"friendly_name": n}}
+            for e, n in NAMES.items()
+        ]
+    )
+    return ha
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Turn on the kitchen light", ("turn_on", "kitchen light", None)),
+        ("turn the kitchen light off please", ("turn_off", "kitchen light", None)),
+        ("Could you toggle the fan?", ("toggle", "fan", None)),
+        ("Dim the living room lamp to 30%", ("set_level", "living room lamp", 30)),
+        (
+            "Set the brightness of the kitchen light to 70 percent",
+            ("set_level", "kitchen light", 70),
+        ),
+        ("Turn off all the lights", None),
+        ("Set the lamp to 300", None),
+        ("Is the kitchen light on?", None),
+    ],
+)
+def test_parse_ha_command(text, expected):
+    command = parse_ha_command(text)
+    if expected is None:
+        assert command is None
+    else:
+        assert (command["action"], command["target"], command["level"]) == expected
+
+
+@pytest.mark.parametrize(
+    "text, entity_id",
+    [
+        ("turn on the kitchen lights", "light.kitchen"),
+        ("switch off the light in the kitchen", "light.kitchen"),
+        ("turn on the cofee machine", "switch.coffee"),
+        ("dim the living room lamp to 30", "light.living_room_lamp"),
+        ("turn on the bedroom fan", "fan.bedroom"),
+        # Two lights in the living room, the agent has to ask or decide
+        ("turn off the living room light", None),
+        # Locks are never operated without the agent
+        ("turn off the front door", None),
+    ],
+)
+def test_match_ha_command(text, entity_id):
+    match = match_ha_command(text, mirror().entities.values())
+    assert (match["entity"] and match["entity"]["entity_id"]) == entity_id
+    assert 0 <= match["confidence"] <= 1
+    assert match["candidates"]
+
+
+def test_service_call():
+    entities = mirror().entities.values()
+    dim = match_ha_command("dim the living room lamp to 30", entities)
+    assert service_call(dim) == ("light", "turn_on", {"brightness_pct": 30})
+    fan = match_ha_command("set the fan to 40 percent", entities)
+    assert service_call(fan) == ("fan", "set_percentage", {"percentage": 40})
+    off = match_ha_command("turn off the coffee machine", entities)
+    assert service_call(off) == ("switch", "turn_off", {})
+
+
+class FakeAgent:
+    def __init__(self):
+        self.calls = []
+
+    async def ainvoke(self, messages):
+        self.calls.append(messages["messages"][0]["content"])
+        return {"messages": [type("Message", (), {"content": "Done by the agent"})]}
+
+
+class FakeSession:
+    def __init__(self):
+        self.fake_agent = FakeAgent()
+
+    async def agent(self):
+        return self.fake_agent
+
+    async def call(self, awaitable):
+        return await awaitable
+
+
+@pytest.mark.asyncio
+async def test_fast_path_against_the_stub(monkeypatch):
+    port = free_port()
+    server = await start_stub(port)
+    ha = HAStateMirror(f"http://127.0.0.1:{port}", "token")
+    session = FakeSession()
+
+    async def ready_mirror():
+        return ha
+
+    monkeypatch.setattr(agents, "ready_ha_state_mirror", ready_mirror)
+    monkeypatch.setattr(agents, "get_ha_mcp_session", lambda factory: session)
+    try:
+        assert await ha.wait_ready(timeout=10)
+        answer = await agents.execute_ha_command("Turn on the kitchen light")
+        assert answer == "Turned on the kitchen light."
+        for _ in range(50):
+            if ha.entities["light.kitchen"]["state"] == "on":
+                break
+            await asyncio.sleep(0.05)
+        assert ha.entities["light.kitchen"]["state"] == "on"
+
+        await agents.execute_ha_command("set the fan to 40 percent")
+        await asyncio.sleep(0.2)
+        assert ha.entities["fan.bedroom"]["attributes"]["percentage"] == 40
+        assert session.fake_agent.calls == []
+
+        # Not a simple command: the agent gets it with the related devices
+        answer = await agents.execute_ha_command("Make the fan spin faster")
+        assert answer == "Done by the agent"
+        assert "fan.bedroom | fan | Bedroom | on" in session.fake_agent.calls[0]
+    finally:
+        await ha.close()
+        server.terminate()
+        server.wait()
+
+
+class FlakySession(FakeSession):
+    """Fails the first `agent()` or the first `call()` with a dropped stream."""
+
+    def __init__(self, fail: str):
+        super().__init__()
+        self.fail = fail
+        self.reconnects = 0
+
+    async def agent(self):
+        if self.fail == "agent" and not self.reconnects:
+            raise ConnectionError("MCP session to homeassistant not connected")
+        return self.fake_agent
+
+    async def call(self, awaitable):
+        result = await awaitable
+        if self.fail == "call":
+            raise ConnectionError("MCP stream to homeassistant broke")
+        return result
+
+    def reconnect(self):
+        self.reconnects += 1
+
+
+@pytest.fixture
+def agent_only(monkeypatch):
+    async def no_mirror():
+        return None
+
+    monkeypatch.setattr(agents, "ready_ha_state_mirror", no_mirror)
+
+    def use(session):
+        monkeypatch.setattr(agents, "get_ha_mcp_session", lambda factory: session)
+        return session
+
+    return use
+
+
+@pytest.mark.asyncio
+async def test_session_failing_before_the_agent_runs_is_retried(agent_only):
+    session = agent_only(FlakySession("agent"))
+
+    assert await agents.execute_ha_command("Open the blinds") == "Done by the agent"
+    assert session.reconnects == 1
+    assert session.fake_agent.calls == ["Open the blinds"]
+
+
+@pytest.mark.asyncio
+async def test_stream_breaking_during_the_agent_run_is_not_retried(agent_only):
+    session = agent_only(FlakySession("call"))
+
+    with pytest.raises(ConnectionError):
+        await agents.execute_ha_command("Open the blinds")
+    # The agent may have called a tool already, running it again could repeat it
+    assert session.reconnects == 0
+    assert session.fake_agent.calls == ["Open the blinds"]
+
+
+class FakeWebsocket:
+    """Answers each sent command according to `reply`, or fails to send it."""
+
+    def __init__(self, ha: HAStateMirror, reply: str):
+        self.ha = ha
+        self.reply = reply
+        self.sent = []
+
+    async def send_json(self, message):
+        if self.reply == "send fails":
+            raise ConnectionResetError("Cannot write to closing transport")
+        self.sent.append(message)
+        future = self.ha._pending[message["id"]]
+        if self.reply == "rejected":
+            future.set_exception(RuntimeError("Service light.turn_on not found"))
+        elif self.reply == "closed":
+            self.ha._fail_pending()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("reply", [None, "send fails"])
+async def test_unsent_fast_path_command_falls_back_to_the_agent(monkeypatch, reply):
+    ha = mirror()
+    if reply is not None:
+        ha._ws = FakeWebsocket(ha, reply)
+    session = FakeSession()
+
+    async def ready_mirror():
+        return ha
+
+    monkeypatch.setattr(agents, "ready_ha_state_mirror", ready_mirror)
+    monkeypatch.setattr(agents, "get_ha_mcp_session", lambda factory: session)
+
+    answer = await agents.execute_ha_command("Turn on the kitchen light")
+
+    assert answer == "Done by the agent"
+    assert len(session.fake_agent.calls) == 1
+    assert ha._pending == {}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "reply, expected",
+    [
+        ("timeout", "but Home Assistant did not confirm it"),
+        ("closed", "but Home Assistant did not confirm it"),
+        ("rejected", "could not do that with the Kitchen light"),
+    ],
+)
+async def test_sent_fast_path_command_is_not_repeated(monkeypatch, reply, expected):
+    ha = mirror()
+    ha.timeout = 0.1
+    ha._ws = FakeWebsocket(ha, reply)
+    session = FakeSession()
+
+    async def ready_mirror():
+        return ha
+
+    monkeypatch.setattr(agents, "ready_ha_state_mirror", ready_mirror)
+    monkeypatch.setattr(agents, "get_ha_mcp_session", lambda factory: session)
+
+    answer = await agents.execute_ha_command("Turn on the kitchen light")
+
+    assert expected in answer
+    assert len(ha._ws.sent) == 1
+    assert session.fake_agent.calls == []
@@ -0,0 +1,143 @@
+import asyncio
+import socket
+import subprocess
+import sys
+
+import anyio
+import pytest
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED, ErrorData
+
+from src.nabu_agent.tools.ha_mcp import MCPSessionManager
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def start_stub(port: int, *args: str) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "benchmarks/stub_ha_mcp.py", "--port", str(port), *args]
+    )
+    for _ in range(100):
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return server
+        except OSError:
+            await asyncio.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("Stub MCP server did not start")
+
+
+@pytest.mark.asyncio
+async def test_session_is_reused_and_reconnects():
+    port = free_port()
+    server = await start_stub(port)
+    built = []
+    manager = MCPSessionManager(
+        {"url": f"http://127.0.0.1:{port}/mcp_server/sse", "transport": "sse"},
+        agent_factory=lambda tools: built.append(tools) or object(),
+        ping_interval=0.3,
+        max_backoff=0.5,
+    )
+    try:
+        agent = await manager.agent()
+        tools = {t.name: t for t in await manager.tools()}
+        assert await manager.agent() is agent
+        assert "Turned on fan" in str(await tools["HassTurnOn"].ainvoke({"name": "fan"}))
+        assert manager.stats()["connects"] == 1
+        assert len(built) == 1
+
+        server.terminate()
+        server.wait()
+        server = await start_stub(port)
+        for _ in range(100):
+            if manager.stats()["connects"] == 2:
+                break
+            await asyncio.sleep(0.1)
+
+        tools = {t.name: t for t in await manager.tools()}
+        assert "fan: off" in str(await tools["GetLiveContext"].ainvoke({}))
+        assert manager.stats()["connects"] == 2
+        assert await manager.agent() is not agent
+    finally:
+        await manager.close()
+        server.terminate()
+        server.wait()
+
+
+@pytest.mark.asyncio
+async def test_call_fails_fast_when_the_server_dies_mid_call():
+    port = free_port()
+    server = await start_stub(port, "--delay-ms", "500")
+    manager = MCPSessionManager(
+        {"url": f"http://127.0.0.1:{port}/mcp_server/sse", "transport": "sse"},
+        agent_factory=lambda tools: object(),
+        ping_interval=30,
+        max_backoff=0.5,
+    )
+    try:
+        tools = {t.name: t for t in await manager.tools()}
+        call = asyncio.create_task(
+            manager.call(tools["HassTurnOn"].ainvoke({"name": "fan"}))
+        )
+        await asyncio.sleep(0.2)
+        server.kill()
+        server.wait()
+
+        # A ConnectionError the caller can retry on, not a call hanging on a dead
+        # stream or an anyio/MCP error
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(call, timeout=5)
+
+        server = await start_stub(port)
+        manager.reconnect()
+        tools = {t.name: t for t in await manager.tools()}
+        result = await manager.call(tools["HassTurnOn"].ainvoke({"name": "fan"}))
+        assert "Turned on fan" in str(result)
+    finally:
+        await manager.close()
+        server.terminate()
+        server.wait()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "error",
+    [
+        anyio.ClosedResourceError(),
+        anyio.BrokenResourceError(),
+        McpError(ErrorData(code=CONNECTION_CLOSED, message="Connection closed")),
+    ],
+)
+async def test_stream_errors_become_connection_errors(error):
+    manager = MCPSessionManager({"url": "http://127.0.0.1:1", "transport": "sse"})
+
+    async def broken():
+        raise error
+
+    with pytest.raises(ConnectionError):
+        await manager.call(broken())
+
+    async def tool_error():
+        raise McpError(ErrorData(code=-32602, message="Invalid params"))
+
+    with pytest.raises(McpError):
+        await manager.call(tool_error())
+
+
+@pytest.mark.asyncio
+async def test_unreachable_server_is_a_connection_error():
+    manager = MCPSessionManager(
+        {"url": f"http://127.0.0.1:{free_port()}/mcp_server/sse", "transport": "sse"},
+        max_backoff=0.5,
+    )
+    try:
+        with pytest.raises(ConnectionError, match="not connected after 0.5s"):
+            await manager.connected_session(timeout=0.5)
+        assert manager.stats()["last_error"] is not None
+    finally:
+        await manager.close()
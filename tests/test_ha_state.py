@@ -0,0 +1,220 @@
+import asyncio
+
+import pytest
+from test_ha_mcp import free_port, start_stub
+
+from src.nabu_agent.tools import agents
+from src.nabu_agent.tools.ha_mcp import MCPSessionManager
+from src.nabu_agent.tools.ha_state import (
+    HAStateMirror,
+    format_entities,
+    is_status_question,
+)
+
+STATES = [
+    {
+        "entity_id": "light.kitchen",
+        "state": "off",
+        "attributes": {"friendly_name": "Kitchen light"},
+    },
+    {
+        "entity_id": "light.living_room_lamp",
+        "state": "on",
+        "attributes": {"friendly_name": "Living room lamp", "brightness": 180},
+    },
+    {
+        "entity_id": "sensor.potus_soil_moisture",
+        "state": "41",
+        "attributes": {
+            "friendly_name": "Potus soil moisture",
+            "unit_of_measurement": "%",
+            "device_class": "moisture",
+            "icon": "mdi:flower",
+        },
+    },
+    {"entity_id": "update.core", "state": "off", "attributes": {}},
+]
+
+
+def seeded_mirror() -> HAStateMirror:
+    mirror = HAStateMirror("http://127.0.0.1:1", "token")
+    mirror.load_states(STATES)
+    return mirror
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Is the Potus watered?", True),
+        ("What is the temperature in the bedroom?", True),
+        ("Are the kitchen lights on?", True),
+        ("Turn off the living room light", False),
+        ("Can you switch on the fan?", False),
+        ("Is it possible to turn on the lamp?", False),
+    ],
+)
+def test_status_questions(text, expected):
+    assert is_status_question(text) is expected
+
+
+def test_relevant_entities():
+    mirror = seeded_mirror()
+    assert "update.core" not in mirror.entities
+    assert mirror.entities["sensor.potus_soil_moisture"]["attributes"] == {
+        "unit_of_measurement": "%",
+        "device_class": "moisture",
+    }
+
+    potus = mirror.relevant("Is the Potus watered?")
+    assert [e["entity_id"] for e in potus] == ["sensor.potus_soil_moisture"]
+    # A mistranscribed name still finds the entity
+    assert mirror.relevant("is the photos watered")[0]["entity_id"] == (
+        "sensor.potus_soil_moisture"
+    )
+    lights = {e["entity_id"] for e in mirror.relevant("turn off all the lamps")}
+    assert lights == {"light.kitchen", "light.living_room_lamp"}
+    assert mirror.relevant("what time is it") == []
+
+    assert format_entities(potus) == (
+        "- sensor.potus_soil_moisture | Potus soil moisture | - | 41%"
+    )
+
+
+def test_events_update_the_mirror():
+    mirror = seeded_mirror()
+    new_state = {**STATES[0], "state": "on"}
+    mirror._on_event(
+        {"event_type": "state_changed", "data": {"new_state": new_state}}
+    )
+    assert mirror.entities["light.kitchen"]["state"] == "on"
+    mirror._on_event(
+        {
+            "event_type": "state_changed",
+            "data": {"entity_id": "light.kitchen", "new_state": None},
+        }
+    )
+    assert "light.kitchen" not in mirror.entities
+    assert mirror.relevant("kitchen light")[0]["entity_id"] != "light.kitchen"
+
+
+T1, T2, T3 = (f"2025-01-01T00:00:0{i}+00:00" for i in (1, 2, 3))
+
+
+def state_changed(entity_id, state, updated):
+    new_state = state and {
+        "entity_id": entity_id,
+        "state": state,
+        "attributes": {},
+        "last_updated": updated,
+    }
+    return {
+        "event_type": "state_changed",
+        "data": {"entity_id": entity_id, "new_state": new_state},
+    }
+
+
+@pytest.mark.asyncio
+async def test_seed_swaps_the_snapshot_and_applies_newer_events():
+    mirror = seeded_mirror()
+    snapshot = [
+        {**STATES[0], "state": "on", "last_updated": T2},
+        {**STATES[1], "last_updated": T2},
+    ]
+    seen_while_seeding = []
+
+    async def call(payload):
+        if payload["type"] == "get_states":
+            # Events arrive while the snapshot is built, the old copy is still in use
+            mirror._on_event(state_changed("light.kitchen", "off", T1))
+            mirror._on_event(state_changed("light.living_room_lamp", "off", T3))
+            mirror._on_event(state_changed("light.porch", "on", T3))
+            seen_while_seeding.append(set(mirror.entities))
+            return snapshot
+        return []
+
+    mirror.call = call
+    await mirror._seed()
+
+    assert seen_while_seeding == [set(seeded_mirror().entities)]
+    # The older event does not regress the snapshot, the newer ones are applied
+    assert mirror.entities["light.kitchen"]["state"] == "on"
+    assert mirror.entities["light.living_room_lamp"]["state"] == "off"
+    assert mirror.entities["light.porch"]["state"] == "on"
+    assert "sensor.potus_soil_moisture" not in mirror.entities
+    assert mirror._buffer is None
+
+
+@pytest.mark.asyncio
+async def test_wait_ready_returns_after_a_failed_connection():
+    mirror = HAStateMirror(f"http://127.0.0.1:{free_port()}", "token")
+    try:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        assert not await mirror.wait_ready(timeout=10)
+        assert not await mirror.wait_ready(timeout=10)
+        assert loop.time() - start < 1
+        assert mirror.stats()["last_error"]
+    finally:
+        await mirror.close()
+
+
+@pytest.mark.asyncio
+async def test_status_question_skips_the_agent(monkeypatch):
+    mirror = seeded_mirror()
+
+    async def ready_mirror():
+        return mirror
+
+    async def answer(question, entities):
+        return f"{entities[0]['name']} is at {entities[0]['state']}%"
+
+    def no_agent(factory):
+        raise AssertionError("the agent should not be used")
+
+    monkeypatch.setattr(agents, "ready_ha_state_mirror", ready_mirror)
+    monkeypatch.setattr(agents, "execute_ha_status_answer", answer)
+    monkeypatch.setattr(agents, "get_ha_mcp_session", no_agent)
+    result = await agents.execute_ha_command("Is the Potus watered?")
+    assert result == "Potus soil moisture is at 41%"
+
+
+@pytest.mark.asyncio
+async def test_mirror_follows_the_stub():
+    port = free_port()
+    server = await start_stub(port)
+    url = f"http://127.0.0.1:{port}"
+    mirror = HAStateMirror(url, "token", max_backoff=0.5)
+    manager = MCPSessionManager(
+        {"url": f"{url}/mcp_server/sse", "transport": "sse"},
+        agent_factory=lambda tools: object(),
+    )
+    try:
+        assert await mirror.wait_ready(timeout=10)
+        kitchen = mirror.entities["light.kitchen"]
+        assert (kitchen["state"], kitchen["area"]) == ("off", "Kitchen")
+
+        tools = {t.name: t for t in await manager.tools()}
+        await tools["HassTurnOn"].ainvoke({"name": "kitchen light"})
+        for _ in range(50):
+            if mirror.entities["light.kitchen"]["state"] == "on":
+                break
+            await asyncio.sleep(0.05)
+        assert mirror.entities["light.kitchen"]["state"] == "on"
+        assert mirror.stats()["events"] >= 1
+
+        # A restarted Home Assistant is reconnected to and the mirror seeded again
+        await manager.close()
+        server.terminate()
+        server.wait()
+        server = await start_stub(port)
+        for _ in range(100):
+            if mirror.stats()["connects"] == 2 and mirror.ready:
+                break
+            await asyncio.sleep(0.1)
+        assert mirror.ready
+        assert mirror.entities["light.kitchen"]["state"] == "off"
+    finally:
+        await manager.close()
+        await mirror.close()
+        server.terminate()
+        server.wait()
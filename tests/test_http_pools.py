@@ -0,0 +1,195 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.nabu_agent.tools import llm
+from src.nabu_agent.tools.web_client import (
+    Deadline,
+    fetch,
+    get_web_pool,
+    searx_search,
+)
+
+SEARX_RESULTS = {
+    "results": [
+        {"url": "https://a.example/", "title": "A", "content": "first"},
+        {"title": "no link"},
+        {"url": "https://b.example/", "title": "B"},
+        {"url": "https://c.example/", "title": "C", "content": "third"},
+    ]
+}
+
+
+class KeepAliveServer:
+    """HTTP/1.1 keep-alive server counting the connections it accepts."""
+
+    def __init__(self):
+        self.connections = 0
+        self.server = None
+
+    async def start(self) -> "KeepAliveServer":
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while request_line := await reader.readline():
+                while (await reader.readline()) not in (b"\r\n", b""):
+                    pass
+                path = request_line.split()[1]
+                if path == b"/slow":
+                    await asyncio.sleep(10)
+                status = b"500 Server Error" if path == b"/error" else b"200 OK"
+                body = b"ok"
+                if path.startswith(b"/search?"):
+                    body = json.dumps(SEARX_RESULTS).encode()
+                writer.write(
+                    b"HTTP/1.1 %s\r\nContent-Length: %d\r\n\r\n%s"
+                    % (status, len(body), body)
+                )
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def stop(self):
+        self.server.close()
+
+
+def in_flight() -> int:
+    return llm.llm_pool_stats()["in_flight"]
+
+
+@pytest.mark.asyncio
+async def test_llm_client_and_models_are_shared_per_loop(monkeypatch):
+    monkeypatch.setenv("LLM_MODEL", "test")
+    monkeypatch.setenv("LLM_API_KEY", "test")
+    monkeypatch.setenv("LLM_BASE_URL", "http://127.0.0.1:1/v1")
+
+    assert llm.get_async_http_client() is llm.get_async_http_client()
+    assert llm.get_model() is llm.get_model()
+    assert llm.get_model(temperature=0.5) is not llm.get_model()
+    assert llm.get_model().http_async_client is llm.get_async_http_client()
+
+
+@pytest.mark.asyncio
+async def test_llm_pool_negotiates_http2():
+    # httpx raises on http2=True without `h2`, so this also checks the pin
+    assert llm.LLM_HTTP2
+    assert llm.get_async_http_client()._transport._pool._http2
+
+
+@pytest.mark.asyncio
+async def test_llm_pool_reuses_connections():
+    server = await KeepAliveServer().start()
+    try:
+        client = llm.get_async_http_client()
+        for _ in range(5):
+            response = await client.get(f"{server.url}/")
+            assert response.status_code == 200
+
+        assert server.connections == 1
+        assert in_flight() == 0
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_llm_in_flight_counts_errors():
+    server = await KeepAliveServer().start()
+    client = llm.get_async_http_client()
+    before = llm.llm_pool_stats()
+    try:
+        assert (await client.get(f"{server.url}/error")).status_code == 500
+        with pytest.raises(httpx.ConnectError):
+            await client.get("http://127.0.0.1:1/")
+        with pytest.raises(httpx.ReadTimeout):
+            await client.get(f"{server.url}/slow", timeout=0.1)
+        task = asyncio.create_task(client.get(f"{server.url}/slow"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    finally:
+        await server.stop()
+
+    stats = llm.llm_pool_stats()
+    assert stats["requests"] - before["requests"] == 4
+    assert stats["error_responses"] - before["error_responses"] == 1
+    assert stats["failed_requests"] - before["failed_requests"] == 3
+    assert stats["in_flight"] == 0
+
+
+def test_llm_sync_client_counts_errors():
+    before = llm.llm_pool_stats()
+    with pytest.raises(httpx.ConnectError):
+        llm.get_http_client().get("http://127.0.0.1:1/")
+
+    stats = llm.llm_pool_stats()
+    assert stats["failed_requests"] - before["failed_requests"] == 1
+    assert stats["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_web_pool_is_shared_per_loop():
+    server = await KeepAliveServer().start()
+    try:
+        assert get_web_pool() is get_web_pool()
+        urls = [f"{server.url}/"] * 3
+        responses = await asyncio.gather(*(fetch(url) for url in urls))
+        assert [r.status_code for r in responses] == [200] * 3
+        await fetch(f"{server.url}/")
+
+        # Concurrent fetches open a few connections, sequential ones reuse them
+        assert server.connections <= 3
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_web_pool_negotiates_http2():
+    assert get_web_pool().client._transport._pool._http2
+
+
+@pytest.mark.asyncio
+async def test_deadline_caps_and_expires():
+    deadline = Deadline(0.2)
+    assert deadline.timeout(cap=0.05) == 0.05
+    assert 0.1 < deadline.timeout() <= 0.2
+    await asyncio.sleep(0.25)
+    assert deadline.expired
+    with pytest.raises(asyncio.TimeoutError):
+        deadline.timeout()
+
+
+@pytest.mark.asyncio
+async def test_fetch_times_out_with_the_deadline():
+    server = await KeepAliveServer().start()
+    try:
+        start = asyncio.get_running_loop().time()
+        with pytest.raises((asyncio.TimeoutError, httpx.TimeoutException)):
+            await fetch(f"{server.url}/slow", deadline=Deadline(0.2))
+        assert asyncio.get_running_loop().time() - start < 1
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_searx_search_reads_the_json_api(monkeypatch):
+    server = await KeepAliveServer().start()
+    monkeypatch.setenv("SEARX_HOST", f"{server.url}/")
+    try:
+        results = await searx_search("nabu", num_results=3)
+    finally:
+        await server.stop()
+
+    # Results without a link are dropped after taking the first num_results
+    assert results == [
+        {"link": "https://a.example/", "title": "A", "snippet": "first"},
+        {"link": "https://b.example/", "title": "B", "snippet": ""},
+    ]
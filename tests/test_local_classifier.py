@@ -0,0 +1,59 @@
+import pytest
+
+from src.nabu_agent.tools.intent import (
+    LOCAL_CLASSIFIER_THRESHOLD,
+    LocalIntentClassifier,
+    classify_locally,
+)
+from src.nabu_agent.utils.schemas import QuestionType
+
+
+def test_local_classifier_weather():
+    result = classify_locally("What is the weather like in Mataró?")
+    assert result.classification == QuestionType.api_call
+
+
+def test_local_classifier_spotify():
+    result = classify_locally("Play a song by Mika")
+    assert result.classification == QuestionType.spotify
+
+
+def test_local_classifier_homeassistant():
+    result = classify_locally("Turn off the living room light")
+    assert result.classification == QuestionType.homeassistant
+
+
+def test_local_classifier_knowledge():
+    result = classify_locally("Why is the sky blue?")
+    assert result.classification == QuestionType.knowledge
+
+
+def test_local_classifier_party():
+    result = classify_locally("Tick-tock")
+    assert result.classification == QuestionType.party
+    assert result.confidence == 1.0
+
+
+def test_local_classifier_unknown_words_have_no_confidence():
+    classifier = LocalIntentClassifier({QuestionType.spotify: ["play music"]})
+    result = classifier.classify("zzz qqq")
+    assert result.confidence == 0.0
+
+
+@pytest.mark.parametrize(
+    "text, wrong",
+    [
+        ("When did Spotify launch?", QuestionType.spotify),
+        ("How many albums has Rosalía released?", QuestionType.spotify),
+        ("What album did Queen release in 1975?", QuestionType.spotify),
+        ("What is the temperature of the sun?", QuestionType.api_call),
+        ("What is the snow leopard?", QuestionType.api_call),
+        ("How do you turn off the light in a fridge?", QuestionType.homeassistant),
+    ],
+)
+def test_keyword_rules_alone_do_not_decide(text, wrong):
+    result = classify_locally(text)
+    assert not (
+        result.classification == wrong
+        and result.confidence >= LOCAL_CLASSIFIER_THRESHOLD
+    )
@@ -0,0 +1,34 @@
+from langchain_core.runnables.graph import Graph
+
+from src.nabu_agent.workflows.main import workflow
+
+
+def test_main_workflow_is_compiled_once(monkeypatch, tmp_path):
+    builds = []
+    drawn = []
+
+    def build_main_workflow():
+        builds.append(1)
+        return original()
+
+    original = workflow.build_main_workflow
+    monkeypatch.setattr(workflow, "build_main_workflow", build_main_workflow)
+    monkeypatch.setattr(
+        Graph,
+        "draw_mermaid_png",
+        lambda self, output_file_path=None, **kwargs: drawn.append(output_file_path),
+    )
+    workflow.get_main_workflow.cache_clear()
+    try:
+        app = workflow.get_main_workflow()
+        assert workflow.get_main_workflow() is app
+
+        workflow.draw_main_workflow(
+            output_file_path=str(tmp_path / "graph.png"),
+            full_output_file_path=str(tmp_path / "full_graph.png"),
+        )
+        workflow.draw_main_workflow(app)
+        assert len(builds) == 1
+        assert len(drawn) == 4
+    finally:
+        workflow.get_main_workflow.cache_clear()
@@ -0,0 +1,132 @@
+from src.nabu_agent.tools.music_index import MusicIndex
+from src.nabu_agent.utils.cache import PersistentCache
+from src.nabu_agent.utils.schemas import SpotifyType
+
+
+def page(items, next_page=None):
+    return {"items": items, "next": "next" if next_page else None, "_next": next_page}
+
+
+class FakeLibrary:
+    def __init__(self, albums):
+        self.albums = albums
+        self.calls = []
+
+    def next(self, result):
+        self.calls.append("next")
+        return result.get("_next") or result["artists"]["_next"]
+
+    def current_user_playlists(self, limit):
+        self.calls.append("playlists")
+        return page(
+            [{"uri": "spotify:playlist:1", "name": "Chill Vibes", "owner": {}}],
+            next_page=page(
+                [{"uri": "spotify:playlist:2", "name": "This Is Mika", "owner": {}}]
+            ),
+        )
+
+    def current_user_followed_artists(self, limit):
+        self.calls.append("artists")
+        return {"artists": page([{"uri": "spotify:artist:1", "name": "Txarango"}])}
+
+    def current_user_top_tracks(self, limit, time_range):
+        self.calls.append("top")
+        track = {
+            "uri": "spotify:track:1",
+            "name": "Bohemian Rhapsody",
+            "artists": [{"name": "Queen"}],
+        }
+        return {"items": [track]}
+
+    def current_user_saved_albums(self, limit):
+        self.calls.append("albums")
+        return page([{"album": album} for album in self.albums])
+
+
+def make_index(tmp_path):
+    return MusicIndex(
+        PersistentCache("music_index", path=str(tmp_path / "index.sqlite")),
+        PersistentCache("resolutions", path=str(tmp_path / "resolutions.sqlite")),
+    )
+
+
+ALBUM = {
+    "uri": "spotify:album:1",
+    "name": "La Catedral",
+    "artists": [{"name": "Oques Grasses"}],
+}
+
+
+def test_music_index_resolves_without_search(tmp_path):
+    index = make_index(tmp_path)
+    index.refresh(FakeLibrary([ALBUM]))
+
+    assert index.resolve("chill vibes", SpotifyType.PLAYLIST) == "spotify:playlist:1"
+    assert index.resolve("la catedral", SpotifyType.ALBUM) == "spotify:album:1"
+    assert index.resolve("TXARANGO", SpotifyType.ARTIST) == "spotify:artist:1"
+    assert index.resolve("mika", SpotifyType.RADIO) == "spotify:playlist:2"
+    assert (
+        index.resolve("bohemian rhapsody by queen", SpotifyType.TRACK)
+        == "spotify:track:1"
+    )
+    assert index.resolve("la catedral oques grases", SpotifyType.ALBUM) is not None
+    assert index.resolve("dark side of the moon", SpotifyType.ALBUM) is None
+
+    index.remember("dark side of the moon", SpotifyType.ALBUM, "spotify:album:2")
+    assert index.resolve("Dark Side of the Moon", SpotifyType.ALBUM) == "spotify:album:2"
+    assert index.stats()["cache_hits"] == 1
+
+
+def test_music_index_persists_and_refreshes_albums_incrementally(tmp_path):
+    make_index(tmp_path).refresh(FakeLibrary([ALBUM]))
+
+    index = make_index(tmp_path)
+    assert len(index.entries) == 5
+    new_album = {"uri": "spotify:album:3", "name": "Ballades", "artists": []}
+    index.refresh(FakeLibrary([new_album, ALBUM]))
+    assert {e["uri"] for e in index.entries if e["type"] == "album"} == {
+        "spotify:album:1",
+        "spotify:album:3",
+    }
+
+
+def test_short_queries_only_match_exactly(tmp_path):
+    index = make_index(tmp_path)
+    index.refresh(FakeLibrary([ALBUM]))
+
+    # Close to "Txarango" or "Chill Vibes", but other artists and playlists
+    assert index.resolve("txarang", SpotifyType.ARTIST) is None
+    assert index.resolve("chill vibe", SpotifyType.PLAYLIST) is None
+    # Same words in another order, or the name with its artist
+    assert index.resolve("rhapsody bohemian", SpotifyType.TRACK) == "spotify:track:1"
+    assert index.resolve("queen bohemian rhapsody", SpotifyType.TRACK) is not None
+
+
+def test_fuzzy_matches_are_not_remembered(tmp_path):
+    index = make_index(tmp_path)
+    index.refresh(FakeLibrary([ALBUM]))
+
+    fuzzy, exact = "la catedral oques grases", "la catedral"
+    assert index.resolve(fuzzy, SpotifyType.ALBUM) is not None
+    assert index.resolve(exact, SpotifyType.ALBUM) is not None
+
+    remembered = index.resolutions.get
+    assert remembered(index.resolution_key(fuzzy, SpotifyType.ALBUM)) is None
+    assert remembered(index.resolution_key(exact, SpotifyType.ALBUM)) == ALBUM["uri"]
+
+
+def test_full_refresh_drops_removed_albums(tmp_path):
+    index = make_index(tmp_path)
+    index.refresh(FakeLibrary([ALBUM]))
+    new_album = {"uri": "spotify:album:3", "name": "Ballades", "artists": []}
+
+    # Incremental refreshes keep the albums saved before
+    index.refresh(FakeLibrary([new_album]))
+    albums = {e["uri"] for e in index.entries if e["type"] == "album"}
+    assert albums == {"spotify:album:1", "spotify:album:3"}
+
+    index.full_refreshed_at -= index.full_refresh_seconds + 1
+    index.refresh(FakeLibrary([new_album]))
+    albums = {e["uri"] for e in index.entries if e["type"] == "album"}
+    assert albums == {"spotify:album:3"}
+    assert make_index(tmp_path).full_refreshed_at == index.full_refreshed_at
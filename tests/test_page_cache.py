@@ -0,0 +1,97 @@
+import os
+
+from src.nabu_agent.tools.page_cache import PageCache, parse_domain_ttls
+
+
+def test_page_cache_stores_html_and_text(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=60)
+    cache.store("https://example.com/a", "<p>Hola</p>", "Hola", etag='"v1"')
+
+    entry = cache.lookup("https://example.com/a")
+    assert entry["state"] == "fresh"
+    assert entry["text"] == "Hola"
+    assert cache.html(entry) == "<p>Hola</p>"
+    assert cache.validators(entry) == {"If-None-Match": '"v1"'}
+    assert cache.lookup("https://example.com/b") is None
+
+
+def test_page_cache_is_content_addressed(tmp_path):
+    cache = PageCache(str(tmp_path))
+    cache.store("https://example.com/a", "<p>Hola</p>", "Hola")
+    cache.store("https://example.com/a?utm=x", "<p>Hola</p>", "Hola")
+    assert cache.stats()["pages"] == 2
+    assert cache.stats()["blobs"] == 2
+
+
+def test_page_cache_stale_and_revalidated(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=0, stale=60)
+    cache.store("https://example.com/a", "<p>Hola</p>", "Hola")
+    assert cache.lookup("https://example.com/a")["state"] == "stale"
+
+    cache.ttl = 60
+    cache.revalidated("https://example.com/a", etag='"v2"')
+    entry = cache.lookup("https://example.com/a")
+    assert entry["state"] == "fresh"
+    assert entry["etag"] == '"v2"'
+
+    cache.stale = 0
+    cache.ttl = 0
+    cache.revalidated("https://example.com/a")
+    assert cache.lookup("https://example.com/a")["state"] == "expired"
+
+
+def test_page_cache_domain_ttls(tmp_path):
+    cache = PageCache(
+        str(tmp_path),
+        ttl=60,
+        domain_ttls=parse_domain_ttls("wikipedia.org=604800, en.wikipedia.org=10"),
+    )
+    assert cache.ttl_for("https://ca.wikipedia.org/wiki/Nabu") == 604800
+    assert cache.ttl_for("https://en.wikipedia.org/wiki/Nabu") == 10
+    assert cache.ttl_for("https://notwikipedia.org/") == 60
+
+
+def test_page_cache_evicts_least_recently_used(tmp_path):
+    pages = {name: os.urandom(100).hex() for name in ["a", "b", "c"]}
+    cache = PageCache(str(tmp_path))
+    cache.store("https://example.com/a", pages["a"], pages["a"][:50])
+    cache.max_bytes = cache.stats()["bytes"] * 2 + 20  # room for two pages
+
+    for name in ["b", "c"]:
+        cache.lookup("https://example.com/a")
+        cache.store(f"https://example.com/{name}", pages[name], pages[name][:50])
+
+    assert cache.lookup("https://example.com/a") is not None
+    assert cache.lookup("https://example.com/b") is None
+    assert cache.lookup("https://example.com/c") is not None
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_page_cache_keeps_a_running_byte_total(tmp_path):
+    cache = PageCache(str(tmp_path))
+    for i in range(5):
+        cache.store(f"https://example.com/{i}", os.urandom(50).hex(), f"text {i}")
+    cache.store("https://example.com/0", "<p>new</p>", "new")  # old blobs released
+    cache.max_bytes = cache.stats()["bytes"] // 2
+    cache.store("https://example.com/5", "<p>five</p>", "five")
+
+    def on_disk():
+        sizes = cache._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs")
+        return sizes.fetchone()[0]
+
+    assert cache.stats()["bytes"] == on_disk() <= cache.max_bytes
+    assert PageCache(str(tmp_path)).stats()["bytes"] == on_disk()
+    cache.clear()
+    assert cache.stats()["bytes"] == on_disk() == 0
+
+
+def test_page_cache_sweeps_expired_pages_periodically(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=0, stale=0, sweep_interval=3600)
+    cache.store("https://example.com/a", "<p>a</p>", "a")
+    cache.store("https://example.com/b", "<p>b</p>", "b")
+    # Within the sweep interval expired pages wait for the next sweep
+    assert cache.stats()["pages"] == 2
+
+    cache.evict()
+    assert cache.stats()["pages"] == 0
+    assert cache.stats()["blobs"] == 0
@@ -0,0 +1,62 @@
+import time
+
+from src.nabu_agent.tools.passages import (
+    bm25_scores,
+    estimate_tokens,
+    select_passages,
+    split_passages,
+)
+
+BOILERPLATE = (
+    "Accept our cookies to continue browsing this website and get personalised "
+    "offers from our partners."
+)
+SUNSET = (
+    "Today the sunset in Barcelona is at 19:45 according to the observatory, one "
+    "minute earlier than yesterday."
+)
+
+
+def test_split_passages_merges_headings_and_cuts_long_paragraphs():
+    text = "Weather\n" + SUNSET + "\n\n" + " ".join([BOILERPLATE] * 10)
+    passages = split_passages(text, max_tokens=40)
+
+    assert passages[0].startswith("Weather Today the sunset")
+    assert len(passages) > 2
+    assert all(estimate_tokens(p) <= 40 for p in passages)
+
+
+def test_split_passages_cuts_text_without_punctuation():
+    passages = split_passages("word " * 400, max_tokens=20)
+    assert len(passages) > 1
+    assert all(estimate_tokens(p) <= 20 for p in passages)
+
+
+def test_split_passages_is_linear_in_run_on_text():
+    text = " ".join(f"word{i}" for i in range(200000))
+    start = time.perf_counter()
+    passages = split_passages(text, max_tokens=20)
+    assert time.perf_counter() - start < 2
+    assert " ".join(passages) == text
+    assert all(estimate_tokens(p) <= 20 for p in passages)
+
+
+def test_bm25_ranks_the_relevant_passage_first():
+    scores = bm25_scores("When is the sunset in Barcelona?", [BOILERPLATE, SUNSET])
+    assert scores[1] > scores[0] == 0
+
+
+def test_select_passages_keeps_relevant_text_within_budget():
+    pages = [
+        ("https://a.com", "\n".join([BOILERPLATE] * 20 + [SUNSET])),
+        ("https://b.com", "\n".join([BOILERPLATE] * 5)),
+    ]
+    selected = select_passages("sunset barcelona", pages, token_budget=60)
+
+    assert selected == [("https://a.com", [SUNSET])]
+
+
+def test_select_passages_falls_back_to_page_starts():
+    pages = [("https://a.com", BOILERPLATE), ("https://b.com", SUNSET)]
+    selected = select_passages("quantum chromodynamics", pages, token_budget=100)
+    assert [url for url, _ in selected] == ["https://a.com", "https://b.com"]
@@ -0,0 +1,78 @@
+import pytest
+
+from src.nabu_agent.tools.playback import match_playback_command
+from src.nabu_agent.workflows.spotify_agent import nodes
+from src.nabu_agent.workflows.spotify_agent.workflow import build_spotify_workflow
+
+
+@pytest.mark.parametrize(
+    "text, control",
+    [
+        ("Pause.", "pause"),
+        ("Pause the music, please", "pause"),
+        ("Stop the music", "pause"),
+        ("Atura la música", "pause"),
+        ("Posa pausa", "pause"),
+        ("Para la música por favor", "pause"),
+        ("Next song", "next"),
+        ("Skip this track", "next"),
+        ("Play the next song", "next"),
+        ("La següent cançó", "next"),
+        ("Passa a la següent", "next"),
+        ("Pon la siguiente canción", "next"),
+        ("Previous song", "previous"),
+        ("Go back to the previous track", "previous"),
+        ("Posa la cançó anterior", "previous"),
+        ("Vuelve a la anterior", "previous"),
+        ("Turn up the volume", "volume_up"),
+        ("Can you turn the music up a little?", "volume_up"),
+        ("Puja el volum", "volume_up"),
+        ("Puja-ho una mica", "volume_up"),
+        ("Súbelo", "volume_up"),
+        ("Més fort", "volume_up"),
+        ("Turn it down", "volume_down"),
+        ("Baixa el volum, si us plau", "volume_down"),
+        ("Abaixa la música", "volume_down"),
+        ("Baja el volumen", "volume_down"),
+        ("Más bajo", "volume_down"),
+    ],
+)
+def test_playback_commands(text, control):
+    assert match_playback_command(text) == control
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Play the next album by Queen",
+        "Play Stop by the Spice Girls",
+        "Turn up the heating",
+        "What is the next match of Barça?",
+        "Posa música de Txarango",
+        "",
+    ],
+)
+def test_other_commands_are_not_matched(text):
+    assert match_playback_command(text) is None
+
+
+def test_playback_control_skips_the_llm(monkeypatch):
+    calls = []
+
+    class FakeTool:
+        def invoke(self, args):
+            calls.append("next")
+            return "Done"
+
+    def no_llm(*args, **kwargs):
+        raise AssertionError("LLM called")
+
+    monkeypatch.setitem(nodes.PLAYBACK_TOOLS, "next", FakeTool())
+    monkeypatch.setattr(nodes, "execute_spotify_decide_action", no_llm)
+    monkeypatch.setattr(nodes, "execute_tool_agent", no_llm)
+
+    state = build_spotify_workflow().invoke(
+        {"english_command": "Next song", "stt_output": "La següent cançó"}
+    )
+    assert calls == ["next"]
+    assert state["final_answer"] == "Done"
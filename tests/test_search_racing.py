@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import httpx
+
+from src.nabu_agent.tools import web_loader
+from src.nabu_agent.tools.page_cache import PageCache
+from src.nabu_agent.tools.web_client import Deadline, DomainTimings
+
+
+def test_race_returns_first_good_pages_and_cancels_the_rest(monkeypatch):
+    delays = {"https://a.com": 0.01, "https://b.com": 5, "https://c.com": 0.02}
+    cancelled = []
+
+    async def fake_fetch_content(url, deadline=None):
+        try:
+            await asyncio.sleep(delays[url])
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+        return url * 100
+
+    monkeypatch.setattr(web_loader, "fetch_content", fake_fetch_content)
+
+    start = time.monotonic()
+    pages = asyncio.run(web_loader.race_fetches(list(delays), 2, Deadline(10)))
+    assert time.monotonic() - start < 1
+    assert [url for url, _ in pages] == ["https://a.com", "https://c.com"]
+    assert cancelled == ["https://b.com"]
+
+
+def test_race_stops_at_the_deadline(monkeypatch):
+    async def fake_fetch_content(url, deadline=None):
+        if url == "https://slow.com":
+            await asyncio.sleep(5)
+        return "short"
+
+    monkeypatch.setattr(web_loader, "fetch_content", fake_fetch_content)
+
+    urls = ["https://slow.com", "https://fast.com"]
+    start = time.monotonic()
+    pages = asyncio.run(web_loader.race_fetches(urls, 2, Deadline(0.2)))
+    assert time.monotonic() - start < 1
+    assert pages == [("https://fast.com", "short")]
+
+
+def test_slow_domains_are_ranked_last():
+    timings = DomainTimings(slow_seconds=2)
+    for _ in range(3):
+        timings.record("https://www.slow.com/a", 6)
+        timings.record("https://fast.com/a", 0.3)
+        timings.record("https://broken.com/a", 0.1, ok=False)
+    timings.record_cancelled("https://fast.com/b", 0.2)
+
+    urls = [
+        "https://slow.com/x",
+        "https://broken.com/x",
+        "https://new.com",
+        "https://fast.com/x",
+    ]
+    assert timings.rank(urls) == [
+        "https://new.com",
+        "https://fast.com/x",
+        "https://slow.com/x",
+        "https://broken.com/x",
+    ]
+
+
+def test_demoted_domains_are_retried_once_their_record_fades():
+    timings = DomainTimings(slow_seconds=2, half_life=0.05)
+    timings.record("https://broken.com/a", 0.1, ok=False)
+    timings.record("https://slow.com/a", 6)
+    assert timings.is_slow("https://broken.com/x")
+    assert timings.is_slow("https://slow.com/x")
+
+    time.sleep(0.3)
+    assert not timings.is_slow("https://broken.com/x")
+    assert not timings.is_slow("https://slow.com/x")
+    # New evidence counts in full again
+    timings.record("https://broken.com/a", 0.1, ok=False)
+    timings.record("https://broken.com/a", 0.1, ok=False)
+    assert timings.is_slow("https://broken.com/x")
+
+
+def test_only_transport_errors_count_as_failures(monkeypatch, tmp_path):
+    timings = DomainTimings()
+    monkeypatch.setattr(web_loader, "get_domain_timings", lambda: timings)
+    monkeypatch.setattr(web_loader, "get_page_cache", lambda: PageCache(str(tmp_path)))
+
+    async def fake_fetch(url, deadline=None, headers=None):
+        if "down.com" in url:
+            raise httpx.ConnectError("refused")
+        return httpx.Response(200, text="<html><body><script></script></body></html>")
+
+    async def fake_extract(html, **kwargs):
+        return ""
+
+    monkeypatch.setattr(web_loader, "fetch", fake_fetch)
+    monkeypatch.setattr(web_loader, "extract", fake_extract)
+
+    async def fetch_both():
+        empty = await web_loader.fetch_content("https://empty.com/a", False)
+        down = await web_loader.fetch_content("https://down.com/a", False)
+        return empty, down
+
+    assert asyncio.run(fetch_both()) == ("", "")
+    stats = timings.stats()
+    assert stats["empty.com"]["failure_rate"] == 0.0
+    assert stats["down.com"]["failure_rate"] > 0.99
@@ -0,0 +1,284 @@
+import asyncio
+import json
+
+import pytest
+
+from src.nabu_agent import server as server_module
+from src.nabu_agent.server import NabuServer
+
+
+async def start_server(monkeypatch, **kwargs) -> NabuServer:
+    async def warm_up(self):
+        self.app = object()
+
+    monkeypatch.setattr(NabuServer, "warm_up", warm_up)
+    server = NabuServer(port=0, **kwargs)
+    await server.start()
+    server.port = server._server.sockets[0].getsockname()[1]
+    return server
+
+
+async def http(server: NabuServer, raw: bytes) -> tuple[int, dict, dict]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    writer.write(raw)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, body = response.split(b"\r\n\r\n", 1)
+    lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:])
+    return int(lines[0].split(" ")[1]), headers, json.loads(body)
+
+
+def post(path: str, body: bytes, headers: str = "") -> bytes:
+    return (
+        f"POST {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n{headers}\r\n"
+    ).encode() + body
+
+
+def chunked(path: str, chunks: list[bytes]) -> bytes:
+    body = b"".join(b"%x\r\n%s\r\n" % (len(c), c) for c in chunks) + b"0\r\n\r\n"
+    return f"POST {path} HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n".encode() + body
+
+
+@pytest.mark.asyncio
+async def test_health(monkeypatch):
+    server = await start_server(monkeypatch)
+    try:
+        status, _, payload = await http(server, b"GET /health HTTP/1.1\r\n\r\n")
+        assert status == 200
+        assert payload["status"] == "ok"
+        assert payload["queue_size"] == server.queue_size
+        assert payload["stt"]["loaded"] is False
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_answers_503(monkeypatch):
+    release = asyncio.Event()
+
+    async def execute_main_workflow(audio, app=None):
+        await release.wait()
+        return audio.decode()
+
+    monkeypatch.setattr(server_module, "execute_main_workflow", execute_main_workflow)
+    server = await start_server(monkeypatch, queue_size=1, workers=1)
+    try:
+        # One command in the worker, one in the queue, the third is rejected
+        first = asyncio.create_task(http(server, post("/command", b"first")))
+        await asyncio.sleep(0.1)
+        second = asyncio.create_task(http(server, post("/command", b"second")))
+        await asyncio.sleep(0.1)
+        status, headers, payload = await http(server, post("/command", b"third"))
+        assert status == 503
+        assert headers["Retry-After"] == "1"
+        assert server.rejected == 1
+
+        release.set()
+        assert (await first)[2] == {"final_answer_translated": "first"}
+        assert (await second)[2] == {"final_answer_translated": "second"}
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_chunked_stream(monkeypatch):
+    received = []
+
+    async def execute_main_workflow_stream(chunks, app=None, sample_rate=16000):
+        async for chunk in chunks:
+            received.append(chunk)
+        return f"{sum(map(len, received))} bytes at {sample_rate} Hz"
+
+    monkeypatch.setattr(
+        server_module, "execute_main_workflow_stream", execute_main_workflow_stream
+    )
+    server = await start_server(monkeypatch)
+    try:
+        chunks = [b"\x00\x01" * 100, b"\x02\x03" * 50, b"\x04\x05"]
+        status, _, payload = await http(server, chunked("/stream?rate=16000", chunks))
+        assert status == 200
+        assert payload == {"final_answer_translated": "302 bytes at 16000 Hz"}
+        assert received == chunks
+
+        status, _, _ = await http(server, post("/stream", b"not chunked"))
+        assert status == 400
+        for rate in ("abc", "96000", "100"):
+            raw = chunked(f"/stream?rate={rate}", chunks)
+            status, _, payload = await http(server, raw)
+            assert status == 400
+            assert "rate" in payload["error"]
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_malformed_framing_is_a_bad_request(monkeypatch):
+    async def execute_main_workflow_stream(chunks, app=None, sample_rate=16000):
+        async for _ in chunks:
+            pass
+        return ""
+
+    monkeypatch.setattr(
+        server_module, "execute_main_workflow_stream", execute_main_workflow_stream
+    )
+    server = await start_server(monkeypatch)
+    try:
+        raw = b"POST /command HTTP/1.1\r\nContent-Length: ten\r\n\r\n"
+        status, _, payload = await http(server, raw)
+        assert status == 400
+        assert payload["error"] == "Malformed Content-Length"
+
+        raw = (
+            b"POST /stream HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"zz\r\nabc\r\n0\r\n\r\n"
+        )
+        status, _, payload = await http(server, raw)
+        assert status == 400
+        assert payload["error"] == "Malformed chunk size"
+
+        # Chunk data not followed by CRLF, and a chunk-size line past the limit
+        raw = (
+            b"POST /stream HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"3\r\nabcXX0\r\n\r\n"
+        )
+        status, _, payload = await http(server, raw)
+        assert status == 400
+        assert payload["error"] == "Malformed chunk"
+
+        raw = (
+            b"POST /stream HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+            + b"1" * (server_module.MAX_HEADER_BYTES + 1)
+            + b"\r\n"
+        )
+        status, _, payload = await http(server, raw)
+        assert status == 400
+        assert payload["error"] == "Malformed chunk size"
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_admin_endpoints_need_the_token(monkeypatch):
+    server = await start_server(monkeypatch, admin_token="secret")
+    try:
+        request = b"GET /admin/knowledge-cache HTTP/1.1\r\n\r\n"
+        status, _, _ = await http(server, request)
+        assert status == 403
+        request = (
+            b"DELETE /admin/knowledge-cache HTTP/1.1\r\n"
+            b"Authorization: Bearer wrong\r\n\r\n"
+        )
+        status, _, _ = await http(server, request)
+        assert status == 403
+    finally:
+        await server.stop()
+
+
+def test_admin_endpoints_without_token_are_local_only():
+    server = NabuServer()
+
+    def request(peer):
+        return server_module.Request("GET", "/admin/x", {}, b"", peer=peer)
+
+    assert server._admin_allowed(request("127.0.0.1"))
+    assert server._admin_allowed(request("::1"))
+    assert server._admin_allowed(request(None))
+    assert not server._admin_allowed(request("192.168.1.20"))
+
+
+@pytest.mark.asyncio
+async def test_streams_share_the_worker_slots(monkeypatch):
+    release = asyncio.Event()
+    running = []
+
+    async def execute_main_workflow(audio, app=None):
+        running.append("command")
+        await release.wait()
+        return "command"
+
+    async def execute_main_workflow_stream(chunks, app=None, sample_rate=16000):
+        running.append("stream")
+        async for _ in chunks:
+            pass
+        return "stream"
+
+    monkeypatch.setattr(server_module, "execute_main_workflow", execute_main_workflow)
+    monkeypatch.setattr(
+        server_module, "execute_main_workflow_stream", execute_main_workflow_stream
+    )
+    server = await start_server(monkeypatch, queue_size=4, workers=1)
+    try:
+        command = asyncio.create_task(http(server, post("/command", b"audio")))
+        await asyncio.sleep(0.1)
+        stream = asyncio.create_task(http(server, chunked("/stream", [b"\x00\x01"])))
+        await asyncio.sleep(0.2)
+        # The only worker slot is taken, the stream waits for it
+        assert running == ["command"]
+
+        release.set()
+        assert (await command)[2] == {"final_answer_translated": "command"}
+        assert (await stream)[2] == {"final_answer_translated": "stream"}
+        assert running == ["command", "stream"]
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_timeout_counts_from_the_start_and_cancels_the_job(monkeypatch):
+    events = []
+
+    async def execute_main_workflow(audio, app=None):
+        events.append(f"{audio.decode()} started")
+        try:
+            await asyncio.sleep(float(audio.split(b" ")[1]))
+        except asyncio.CancelledError:
+            events.append(f"{audio.decode()} cancelled")
+            raise
+        return audio.decode()
+
+    monkeypatch.setattr(server_module, "execute_main_workflow", execute_main_workflow)
+    server = await start_server(
+        monkeypatch, queue_size=4, workers=1, request_timeout=0.5
+    )
+    try:
+        # The second one waits 0.4 s in the queue, then runs within its 0.5 s
+        first = asyncio.create_task(http(server, post("/command", b"first 0.4")))
+        await asyncio.sleep(0.05)
+        second = await http(server, post("/command", b"second 0.3"))
+        assert (await first)[0] == 200
+        assert second[0] == 200
+
+        status, _, _ = await http(server, post("/command", b"slow 10"))
+        assert status == 504
+        await asyncio.sleep(0.05)
+        assert events[-1] == "slow 10 cancelled"
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_abandoned_commands_are_skipped(monkeypatch):
+    release = asyncio.Event()
+    started = []
+
+    async def execute_main_workflow(audio, app=None):
+        started.append(audio)
+        await release.wait()
+        return audio.decode()
+
+    monkeypatch.setattr(server_module, "execute_main_workflow", execute_main_workflow)
+    server = await start_server(monkeypatch, queue_size=4, workers=1)
+    try:
+        first = asyncio.create_task(server.submit(b"first"))
+        await asyncio.sleep(0.05)
+        abandoned = asyncio.create_task(server.submit(b"abandoned"))
+        await asyncio.sleep(0.05)
+        abandoned.cancel()
+        release.set()
+        assert await first == "first"
+        assert await server.submit(b"third") == "third"
+        assert started == [b"first", b"third"]
+    finally:
+        await server.stop()
@@ -0,0 +1,169 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.nabu_agent.utils.schemas import (
+    Classifier,
+    Evaluator,
+    LocalClassification,
+    QuestionType,
+    SpotifyAction,
+)
+from src.nabu_agent.workflows.main import nodes
+from src.nabu_agent.workflows.main.workflow import build_main_workflow
+from src.nabu_agent.workflows.spotify_agent import nodes as spotify_nodes
+
+
+class ScriptedRouting:
+    """Classifier and evaluator answers in order, instead of the LLM agents."""
+
+    def __init__(self, classifications, verdicts):
+        self.classifications = list(classifications)
+        self.verdicts = list(verdicts)
+        self.feedback = []
+
+    def classify(self, english_command, preestablished_commands_schema, feedback):
+        self.feedback.append(feedback)
+        return Classifier(classification=self.classifications.pop(0))
+
+    def evaluate(self, original_command, question_type):
+        is_correct = self.verdicts.pop(0)
+        return Evaluator(is_correct=is_correct, feedback=f"not {question_type.value}")
+
+
+@pytest.fixture
+def workflow(monkeypatch):
+    calls = []
+
+    def setup(classifications, verdicts, knowledge_delay=0.0):
+        routing = ScriptedRouting(classifications, verdicts)
+
+        async def knowledge(english_command):
+            calls.append("knowledge started")
+            try:
+                await asyncio.sleep(knowledge_delay)
+            except asyncio.CancelledError:
+                calls.append("knowledge cancelled")
+                raise
+            calls.append("knowledge done")
+            return "Knowledge answer"
+
+        def tool_agent(english_command, tools):
+            calls.append("weather")
+            return "Weather answer"
+
+        async def ha_command(english_command):
+            calls.append("home assistant")
+            return "Home Assistant answer"
+
+        def spotify_decide_action(text):
+            # Runs in a thread, which a rollback cannot stop
+            time.sleep(0.3)
+            calls.append("spotify classified")
+            return SpotifyAction.OTHER
+
+        def spotify_side_effect(*args, **kwargs):
+            calls.append("spotify side effect")
+            return SimpleNamespace(client=None, ensure_device=lambda: None)
+
+        def evaluate(**kwargs):
+            calls.append("evaluator")
+            return routing.evaluate(**kwargs)
+
+        monkeypatch.setattr(nodes, "SPECULATIVE_ROUTING", True)
+        monkeypatch.setattr(nodes, "execute_translator", lambda text, **kwargs: text)
+        monkeypatch.setattr(
+            nodes,
+            "classify_locally",
+            lambda text: LocalClassification(
+                classification=QuestionType.knowledge, confidence=0.0
+            ),
+        )
+        monkeypatch.setattr(nodes, "execute_classifier_agent", routing.classify)
+        monkeypatch.setattr(nodes, "execute_evaluator_agent", evaluate)
+        monkeypatch.setattr(nodes, "execute_knowdledge_agent", knowledge)
+        monkeypatch.setattr(nodes, "execute_tool_agent", tool_agent)
+        monkeypatch.setattr(nodes, "execute_ha_command", ha_command)
+        monkeypatch.setattr(
+            spotify_nodes, "execute_spotify_decide_action", spotify_decide_action
+        )
+        for name in ("get_spotify_session", "play_music", "search_music"):
+            monkeypatch.setattr(spotify_nodes, name, spotify_side_effect)
+        return build_main_workflow(), routing
+
+    setup.calls = calls
+    return setup
+
+
+async def run(app, command: str) -> dict:
+    return await app.ainvoke(
+        {
+            "stt_output": command,
+            "english_command": command,
+            "original_language": "english",
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_speculation_is_committed(workflow):
+    app, _ = workflow([QuestionType.knowledge], [True])
+
+    result = await run(app, "Why is the sky blue?")
+
+    assert result["final_answer_translated"] == "Knowledge answer"
+    assert result["speculation_committed"] is True
+    # The handler ran once, ahead of the verdict, and was not run again
+    assert workflow.calls.count("knowledge started") == 1
+    assert workflow.calls.count("knowledge done") == 1
+
+
+@pytest.mark.asyncio
+async def test_speculation_is_rolled_back(workflow):
+    app, routing = workflow(
+        [QuestionType.knowledge, QuestionType.api_call],
+        [False, True],
+        knowledge_delay=5,
+    )
+
+    result = await run(app, "Will it rain tomorrow?")
+
+    assert result["final_answer_translated"] == "Weather answer"
+    assert result["question_type"] == QuestionType.api_call
+    # The wrong handler was cancelled and its answer never reached the state
+    assert "knowledge cancelled" in workflow.calls
+    assert "knowledge done" not in workflow.calls
+    assert workflow.calls.count("weather") == 1
+    # The retry was classified with the evaluator's feedback
+    assert routing.feedback == [None, "not Knowledge Question"]
+
+
+@pytest.mark.asyncio
+async def test_side_effects_wait_for_the_commit(workflow):
+    app, _ = workflow(
+        [QuestionType.homeassistant, QuestionType.homeassistant], [False, True]
+    )
+
+    result = await run(app, "Turn off the living room light")
+
+    assert result["final_answer_translated"] == "Home Assistant answer"
+    assert not result.get("speculation_committed")
+    # Nothing ran ahead of the verdicts, the handler node ran once after the commit
+    assert workflow.calls == ["evaluator", "evaluator", "home assistant"]
+
+
+@pytest.mark.asyncio
+async def test_rollback_leaves_no_side_effects(workflow):
+    app, _ = workflow([QuestionType.spotify, QuestionType.knowledge], [False, True])
+
+    result = await run(app, "Play something by the fridge")
+    await asyncio.sleep(0.5)  # let the abandoned thread finish
+
+    assert result["final_answer_translated"] == "Knowledge answer"
+    assert result.get("spotify_action") is None
+    # The Spotify classification kept running after the rollback, but speculation
+    # only classifies: the Spotify session and playback were never touched
+    assert "spotify classified" in workflow.calls
+    assert "spotify side effect" not in workflow.calls
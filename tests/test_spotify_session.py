@@ -0,0 +1,157 @@
+import time
+
+from spotipy.exceptions import SpotifyException
+
+from src.nabu_agent.tools import spotify
+from src.nabu_agent.tools.spotify import SpotifySession
+from src.nabu_agent.utils.schemas import SpotifyType
+from src.nabu_agent.workflows.spotify_agent import nodes as spotify_nodes
+
+
+class FakeSpotify:
+    def __init__(self, device_present=True):
+        self.calls = []
+        self.device_present = device_present
+
+    def devices(self):
+        self.calls.append("devices")
+        devices = [{"id": "other", "volume_percent": 10}]
+        if self.device_present:
+            devices.append({"id": "librespot", "volume_percent": 50})
+        return {"devices": devices}
+
+    def _command(self, name, device_id):
+        self.calls.append(name)
+        if not self.device_present:
+            raise SpotifyException(404, -1, "Device not found")
+
+    def pause_playback(self, device_id=None):
+        self._command("pause_playback", device_id)
+
+    def next_track(self, device_id=None):
+        self._command("next_track", device_id)
+
+    def volume(self, volume_percent, device_id=None):
+        self._command(f"volume {volume_percent}", device_id)
+
+
+def make_session(monkeypatch, client):
+    session = SpotifySession(device_id="librespot", client=client)
+    monkeypatch.setattr(spotify, "get_spotify_session", lambda: session)
+    return session
+
+
+def test_controls_cost_one_call_each(monkeypatch):
+    client = FakeSpotify()
+    session = make_session(monkeypatch, client)
+    session.refresh_device()
+    client.calls.clear()
+
+    assert spotify.pause_music.invoke({}) == "Done"
+    assert spotify.next_song.invoke({}) == "Done"
+    assert spotify.volume_up.invoke({}) == "Done"
+    assert spotify.volume_up.invoke({}) == "Done"
+    assert client.calls == ["pause_playback", "next_track", "volume 60", "volume 70"]
+
+
+def test_missing_device_is_activated_and_command_retried(monkeypatch):
+    client = FakeSpotify(device_present=False)
+    session = make_session(monkeypatch, client)
+
+    monkeypatch.setattr(
+        session, "_activate", lambda: setattr(client, "device_present", True)
+    )
+
+    assert spotify.next_song.invoke({}) == "Done"
+    assert client.calls == ["next_track", "next_track"]
+
+
+def test_ensure_device_does_not_block(monkeypatch):
+    client = FakeSpotify(device_present=False)
+    session = make_session(monkeypatch, client)
+    activations = []
+    monkeypatch.setattr(session, "_activate", lambda: activations.append(1))
+
+    start = time.monotonic()
+    session.ensure_device()
+    assert time.monotonic() - start < 0.1
+    for _ in range(50):
+        if activations:
+            break
+        time.sleep(0.01)
+    assert activations == [1]
+    assert session.stats()["device_active"] is False
+
+
+class IdleSpotify(FakeSpotify):
+    """librespot is listed but idle: Spotify has no active playback to queue on."""
+
+    def add_to_queue(self, uri, device_id=None):
+        self.calls.append(f"add_to_queue {uri}")
+        raise SpotifyException(404, -1, "Player command failed: No active device found")
+
+    def start_playback(self, device_id=None, context_uri=None, uris=None):
+        self.calls.append(f"start_playback {context_uri or uris} on {device_id}")
+
+
+def test_play_on_inactive_device_starts_playback(monkeypatch):
+    client = IdleSpotify()
+    session = make_session(monkeypatch, client)
+    monkeypatch.setattr(session, "_activate", lambda: None)
+
+    spotify.play_music(session, context_uri="spotify:album:1")
+    spotify.play_music(session, uris="spotify:track:2")
+
+    assert [c for c in client.calls if c.startswith("start_playback")] == [
+        "start_playback spotify:album:1 on librespot",
+        "start_playback ['spotify:track:2'] on librespot",
+    ]
+    assert "next_track" not in client.calls
+
+
+def test_play_queues_when_something_is_playing(monkeypatch):
+    client = FakeSpotify()
+    session = make_session(monkeypatch, client)
+    client.add_to_queue = lambda uri, device_id=None: client.calls.append(
+        f"add_to_queue {uri} on {device_id}"
+    )
+
+    spotify.play_music(session, uris="spotify:track:2")
+
+    assert client.calls == ["add_to_queue spotify:track:2 on librespot", "next_track"]
+
+
+def test_search_and_play_uses_one_session(monkeypatch):
+    client = FakeSpotify()
+    session = SpotifySession(device_id="librespot", client=client)
+    sessions, searched, played = [], [], []
+
+    def get_spotify_session():
+        sessions.append(session)
+        return session
+
+    monkeypatch.setattr(session, "ensure_device", lambda: None)
+    monkeypatch.setattr(spotify_nodes, "get_spotify_session", get_spotify_session)
+    monkeypatch.setattr(
+        spotify_nodes,
+        "search_music",
+        lambda spotify_client, **kwargs: searched.append(spotify_client)
+        or "spotify:album:1",
+    )
+    monkeypatch.setattr(
+        spotify_nodes,
+        "play_music",
+        lambda session, **kwargs: played.append((session, kwargs)),
+    )
+
+    spotify_nodes.search_and_play_music(
+        {
+            "english_command": "Play the album Abbey Road",
+            "spotify_command": SpotifyType.ALBUM,
+            "spotify_query": "Abbey Road",
+        }
+    )
+
+    assert len(sessions) == 1
+    assert searched == [client]
+    assert played == [(session, {"context_uri": "spotify:album:1", "uris": None})]
@@ -0,0 +1,57 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from src.nabu_agent.tools import stt
+from src.nabu_agent.tools.stt import STTEngine
+
+
+class FakeWhisperModel:
+    """Slow to build and to transcribe, records how many calls overlap."""
+
+    constructions = 0
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def __init__(self, model_size, **kwargs):
+        time.sleep(0.1)
+        with self.lock:
+            FakeWhisperModel.constructions += 1
+        self.kwargs = kwargs
+
+    def transcribe(self, audio, **kwargs):
+        with self.lock:
+            FakeWhisperModel.running += 1
+            FakeWhisperModel.max_running = max(self.max_running, self.running)
+
+        def segments():
+            time.sleep(0.05)
+            with self.lock:
+                FakeWhisperModel.running -= 1
+            yield SimpleNamespace(text=" hola")
+
+        return segments(), SimpleNamespace(language="ca")
+
+
+def test_model_is_loaded_once_and_calls_are_capped(monkeypatch):
+    monkeypatch.setattr(stt, "WhisperModel", FakeWhisperModel)
+    engine = STTEngine("small", num_workers=2)
+    assert not engine.loaded
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: engine.transcribe(b"audio"), range(8)))
+
+    assert FakeWhisperModel.constructions == 1
+    assert engine.load().kwargs["num_workers"] == 2
+    # The segments are consumed inside the slot, so at most 2 calls overlap
+    assert FakeWhisperModel.max_running == 2
+    assert all(segments[0].text == " hola" for segments, _ in results)
+
+    stats = engine.stats()
+    assert stats["loaded"] is True
+    assert stats["transcriptions"] == 8
+    assert stats["load_seconds"] >= 0.1
+    assert stats["total_transcribe_seconds"] >= 8 * 0.05
+    assert stats["last_transcribe_seconds"] is not None
@@ -0,0 +1,77 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from faster_whisper import decode_audio
+
+from src.nabu_agent.tools.stt import StreamingTranscriber, StreamResampler
+
+SAMPLE = "tests/samples/test.m4a"
+
+
+class FakeEngine:
+    """Records the audio handed to Whisper instead of transcribing it."""
+
+    def __init__(self):
+        self.segments: list[np.ndarray] = []
+
+    def transcribe(self, audio, **kwargs):
+        self.segments.append(audio)
+        return [SimpleNamespace(text=f" {len(audio)}")], SimpleNamespace(language="ca")
+
+
+def pcm_chunks(audio: np.ndarray, rate: int, chunk_ms: int = 20) -> list[bytes]:
+    pcm = (np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes()
+    size = rate * chunk_ms // 1000 * 2
+    return [pcm[i : i + size] for i in range(0, len(pcm), size)]
+
+
+async def stream(chunks: list[bytes]):
+    for chunk in chunks:
+        yield chunk
+        await asyncio.sleep(0)
+
+
+def test_resampler_matches_one_shot_interpolation():
+    source = np.sin(2 * np.pi * 440 * np.arange(44100) / 44100).astype(np.float32)
+    resampler = StreamResampler(44100, 16000)
+    rng = np.random.default_rng(0)
+    pieces, start = [], 0
+    while start < len(source):
+        size = int(rng.integers(1, 2000))
+        pieces.append(resampler.process(source[start : start + size]))
+        start += size
+    streamed = np.concatenate(pieces)
+
+    positions = np.arange(len(streamed)) * 44100 / 16000
+    expected = np.interp(positions, np.arange(len(source)), source)
+    assert abs(len(streamed) - 16000) <= 1
+    assert np.allclose(streamed, expected, atol=1e-4)
+    assert StreamResampler(16000).process(source) is source
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("rate", [8000, 16000, 22050, 44100])
+async def test_stream_is_resampled_before_vad(rate):
+    audio = decode_audio(SAMPLE, sampling_rate=rate)
+    silence = np.zeros(rate, dtype=np.float32)
+    engine = FakeEngine()
+    transcriber = StreamingTranscriber(engine, sample_rate=rate)
+
+    text, info = await transcriber.transcribe(
+        stream(pcm_chunks(np.concatenate([audio, silence]), rate))
+    )
+
+    assert info.language == "ca"
+    assert engine.segments
+    # The speech handed to Whisper is 16 kHz whatever the stream rate was
+    speech = sum(len(segment) for segment in engine.segments)
+    reference = decode_audio(SAMPLE, sampling_rate=16000)
+    assert 0.5 * len(reference) < speech <= len(reference) + 16000
+    assert text == " ".join(str(len(s)) for s in engine.segments)
+
+
+def test_unsupported_sample_rate():
+    with pytest.raises(ValueError):
+        StreamingTranscriber(FakeEngine(), sample_rate=96000)
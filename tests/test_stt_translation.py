@@ -0,0 +1,145 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from faster_whisper import decode_audio
+from test_stt_stream import SAMPLE, pcm_chunks, stream
+
+from src.nabu_agent.tools import agents
+from src.nabu_agent.tools.stt import StreamingTranscriber
+from src.nabu_agent.utils.schemas import LocalClassification, QuestionType
+from src.nabu_agent.workflows.main import nodes
+from src.nabu_agent.workflows.main import workflow as main_workflow
+
+ORIGINAL = " Encén el llum de la cuina"
+ENGLISH = " Turn on the kitchen light"
+
+
+class TranslatingEngine:
+    """Answers in catalan, or in english for the translate task."""
+
+    def __init__(self):
+        self.decoded = []
+        self.calls = []
+
+    def decode(self, audio: bytes) -> np.ndarray:
+        self.decoded.append(audio)
+        return np.zeros(16000, dtype=np.float32)
+
+    def transcribe(self, audio, **kwargs):
+        self.calls.append(kwargs)
+        text = ENGLISH if kwargs.get("task") == "translate" else ORIGINAL
+        return [SimpleNamespace(text=text)], SimpleNamespace(language="ca")
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = TranslatingEngine()
+    monkeypatch.setattr(agents, "get_stt_engine", lambda: engine)
+    monkeypatch.setattr(main_workflow, "get_stt_engine", lambda: engine)
+    return engine
+
+
+def test_translation_alone_is_one_pass(engine):
+    original, english, info, timings = agents.execute_stt_translation(
+        b"audio", keep_original=False
+    )
+
+    assert (original, english, info.language) == (None, ENGLISH, "ca")
+    assert [call.get("task") for call in engine.calls] == ["translate"]
+    assert list(timings) == ["translate"]
+
+
+def test_both_decodes_once_and_translates_from_the_detected_language(engine):
+    original, english, info, timings = agents.execute_stt_translation(
+        b"audio", keep_original=True
+    )
+
+    assert (original, english) == (ORIGINAL, ENGLISH)
+    assert engine.decoded == [b"audio"]
+    assert [call.get("task") for call in engine.calls] == [None, "translate"]
+    assert engine.calls[1]["language"] == "ca"
+    assert list(timings) == ["transcribe", "translate"]
+
+
+@pytest.fixture
+def translated(monkeypatch):
+    translations = []
+
+    def execute_translator(text, destination_language, original_language="english"):
+        translations.append(destination_language)
+        return "Fet"
+
+    async def knowledge(english_command):
+        return f"Answer to: {english_command.strip()}"
+
+    monkeypatch.setattr(nodes, "UNDERSTAND_MODE", "separate")
+    monkeypatch.setattr(nodes, "SPECULATIVE_ROUTING", False)
+    monkeypatch.setattr(nodes, "execute_translator", execute_translator)
+    monkeypatch.setattr(nodes, "execute_knowdledge_agent", knowledge)
+    monkeypatch.setattr(
+        nodes,
+        "classify_locally",
+        lambda text: LocalClassification(
+            classification=QuestionType.knowledge, confidence=1.0
+        ),
+    )
+    return translations
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("task", ["translate", "both"])
+async def test_whisper_translation_skips_the_translator(
+    monkeypatch, engine, translated, task
+):
+    monkeypatch.setattr(nodes, "STT_TASK", task)
+
+    result = await main_workflow.build_main_workflow().ainvoke({"input": b"audio"})
+
+    assert result["english_command"] == ENGLISH
+    assert result["stt_output"] == (ORIGINAL if task == "both" else ENGLISH)
+    assert result["original_language"] == "catalan"
+    # Only the answer is translated, back to catalan
+    assert translated == ["catalan"]
+
+
+@pytest.mark.asyncio
+async def test_streaming_segments_go_through_both_passes(engine):
+    audio = decode_audio(SAMPLE, sampling_rate=16000)
+    silence = np.zeros(16000, dtype=np.float32)
+    transcriber = StreamingTranscriber(engine, task="both", language="ca")
+
+    text, info = await transcriber.transcribe(
+        stream(pcm_chunks(np.concatenate([audio, silence]), 16000))
+    )
+
+    segments = len(engine.calls) // 2
+    assert segments >= 1
+    assert [call.get("task") for call in engine.calls].count("translate") == segments
+    assert text == transcriber.original_text == (ORIGINAL * segments).strip()
+    assert transcriber.english_text == (ENGLISH * segments).strip()
+    assert set(transcriber.timings) == {"transcribe", "translate"}
+    assert info.language == "ca"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("task", ["transcribe", "translate"])
+async def test_streamed_audio_follows_the_stt_task(
+    monkeypatch, engine, translated, task
+):
+    monkeypatch.setattr(nodes, "STT_TASK", task)
+    audio = decode_audio(SAMPLE, sampling_rate=16000)
+    silence = np.zeros(16000, dtype=np.float32)
+
+    answer = await main_workflow.execute_main_workflow_stream(
+        stream(pcm_chunks(np.concatenate([audio, silence]), 16000)),
+        app=main_workflow.build_main_workflow(),
+    )
+
+    assert answer == "Fet"
+    if task == "translate":
+        assert all(call["task"] == "translate" for call in engine.calls)
+        assert translated == ["catalan"]
+    else:
+        # The Translator node translates the transcription to english first
+        assert translated == ["english", "catalan"]
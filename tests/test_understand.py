@@ -0,0 +1,133 @@
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from src.nabu_agent.tools import agents
+from src.nabu_agent.utils.cache import PersistentCache
+from src.nabu_agent.utils.schemas import (
+    Classifier,
+    Evaluator,
+    LocalClassification,
+    QuestionType,
+    SpotifyAction,
+    SpotifyActionClassifier,
+    SpotifyClassifier,
+    SpotifyType,
+    Translator,
+    Understanding,
+)
+from src.nabu_agent.workflows.main import nodes
+from src.nabu_agent.workflows.main.workflow import build_main_workflow
+from src.nabu_agent.workflows.spotify_agent import nodes as spotify_nodes
+
+COMMAND = "Posa la cançó Bohemian Rhapsody"
+ENGLISH = "Play the song Bohemian Rhapsody"
+
+
+class StructuredModel:
+    """Answers `with_structured_output` calls from a schema -> answer table."""
+
+    def __init__(self, answers: dict):
+        self.answers = answers
+        self.calls = []
+
+    def with_structured_output(self, schema):
+        def answer(prompt):
+            self.calls.append(schema.__name__)
+            return self.answers[schema](prompt.to_string())
+
+        return RunnableLambda(answer)
+
+
+def translate(prompt: str) -> Translator:
+    if "from english to catalan" in prompt:
+        return Translator(translated_command="Reproduint Bohemian Rhapsody")
+    return Translator(translated_command=ENGLISH)
+
+
+ANSWERS = {
+    Translator: translate,
+    Classifier: lambda _: Classifier(classification=QuestionType.spotify),
+    Evaluator: lambda _: Evaluator(is_correct=True, feedback=""),
+    SpotifyActionClassifier: lambda _: SpotifyActionClassifier(
+        classification=SpotifyAction.PLAY, reasoning="a song"
+    ),
+    SpotifyClassifier: lambda _: SpotifyClassifier(
+        classification=SpotifyType.TRACK, key_word="Bohemian Rhapsody"
+    ),
+    Understanding: lambda _: Understanding(
+        english_command=ENGLISH,
+        classification=QuestionType.spotify,
+        spotify_action=SpotifyAction.PLAY,
+        spotify_type=SpotifyType.TRACK,
+        key_word="Bohemian Rhapsody",
+    ),
+}
+
+
+@pytest.fixture
+def run(monkeypatch):
+    model = StructuredModel(ANSWERS)
+    played = []
+
+    def search_and_play_music(state):
+        played.append((state["spotify_command"], state["spotify_query"]))
+        state["final_answer"] = f"Playing Music: {state['english_command']}"
+        return state
+
+    monkeypatch.setenv("LLM_MODEL", "test")
+    monkeypatch.setattr(agents, "get_model", lambda **kwargs: model)
+    monkeypatch.setattr(
+        agents,
+        "get_translation_cache",
+        lambda: PersistentCache("translations", path=":memory:"),
+    )
+    monkeypatch.setattr(
+        nodes,
+        "classify_locally",
+        lambda text: LocalClassification(
+            classification=QuestionType.knowledge, confidence=0.0
+        ),
+    )
+    monkeypatch.setattr(nodes, "SPECULATIVE_ROUTING", False)
+    monkeypatch.setattr(spotify_nodes, "search_and_play_music", search_and_play_music)
+
+    async def invoke(mode: str) -> dict:
+        # UNDERSTAND_MODE is read from the environment when nodes is imported
+        monkeypatch.setattr(nodes, "UNDERSTAND_MODE", mode)
+        return await build_main_workflow().ainvoke(
+            {"stt_output": COMMAND, "original_language": "catalan"}
+        )
+
+    invoke.model = model
+    invoke.played = played
+    return invoke
+
+
+@pytest.mark.asyncio
+async def test_separate_mode_translates_routes_and_classifies(run):
+    result = await run("separate")
+
+    assert run.model.calls == [
+        "Translator",
+        "Classifier",
+        "Evaluator",
+        "SpotifyActionClassifier",
+        "SpotifyClassifier",
+        "Translator",
+    ]
+    assert result["english_command"] == ENGLISH
+    assert run.played == [(SpotifyType.TRACK, "Bohemian Rhapsody")]
+    assert result["final_answer_translated"] == "Reproduint Bohemian Rhapsody"
+
+
+@pytest.mark.asyncio
+async def test_combined_mode_understands_in_one_call(run):
+    result = await run("combined")
+
+    # Translator, router, evaluator and the Spotify classifiers are all skipped;
+    # only the answer is translated back
+    assert run.model.calls == ["Understanding", "Translator"]
+    assert result["english_command"] == ENGLISH
+    assert result["question_type"] == QuestionType.spotify
+    assert run.played == [(SpotifyType.TRACK, "Bohemian Rhapsody")]
+    assert result["final_answer_translated"] == "Reproduint Bohemian Rhapsody"